@@ -0,0 +1,83 @@
+"""
+Flujo asíncrono submit -> worker -> poll contra S3/SQS/Textract/Bedrock locales.
+
+Compara la latencia que percibe el cliente en el POST síncrono con la del
+POST asíncrono (solo guarda en S3 y encola) y comprueba que el GET devuelve
+el resultado escrito por el worker.
+
+Uso:
+    python benchmarks/bench_async_jobs.py [--bedrock-latency 2.0]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+os.environ.setdefault('JOBS_QUEUE_URL', 'local-jobs-queue')
+
+import app
+from fakes import FakeS3, FakeSQS, FakeTextract, FakeBedrock
+
+
+def install_fakes(args):
+    app.s3 = FakeS3(latency=args.s3_latency)
+    app.sqs = FakeSQS(latency=args.s3_latency)
+    app.textract = FakeTextract(latency=args.textract_latency)
+    app.bedrock = FakeBedrock(latency=args.bedrock_latency)
+    # Todas las rutas del router apuntan al mismo fake
+    app.bedrock_client = lambda region: app.bedrock
+    app.extraction_cache.s3 = app.s3
+    app.ocr_store.s3 = app.s3
+    # Sin poppler en local: se simula un PDF escaneado de una página
+    app.extract_document_text = lambda textract, pdf_bytes, *args: (
+        app.merge_textract_pages([textract.detect_document_text(Document={'Bytes': pdf_bytes})]),
+        app.EXTRACTION_PATH_TEXTRACT_PDF
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--textract-latency', type=float, default=1.0)
+    parser.add_argument('--bedrock-latency', type=float, default=2.0)
+    parser.add_argument('--s3-latency', type=float, default=0.02)
+    args = parser.parse_args()
+    install_fakes(args)
+
+    def post(payload):
+        return app.lambda_handler({'httpMethod': 'POST', 'body': json.dumps(payload)}, None)
+
+    file_b64 = base64.b64encode(b'%PDF-1.4 sync sample').decode()
+    start = time.perf_counter()
+    sync_response = post({'file': file_b64})
+    sync_time = time.perf_counter() - start
+    assert sync_response['statusCode'] == 200
+
+    file_b64 = base64.b64encode(b'%PDF-1.4 async sample').decode()
+    start = time.perf_counter()
+    submit = post({'file': file_b64, 'async': True})
+    submit_time = time.perf_counter() - start
+    job_id = json.loads(submit['body'])['job_id']
+
+    poll = app.lambda_handler({'httpMethod': 'GET', 'pathParameters': {'id': job_id}}, None)
+    assert poll['statusCode'] == 202
+
+    start = time.perf_counter()
+    app.job_worker_handler(app.sqs.drain(app.JOBS_QUEUE_URL), None)
+    worker_time = time.perf_counter() - start
+
+    poll = app.lambda_handler({'httpMethod': 'GET', 'pathParameters': {'id': job_id}}, None)
+    result = json.loads(poll['body'])
+    assert poll['statusCode'] == 200 and result['status'] == app.JOB_STATUS_COMPLETED
+
+    print(f"sync POST          {sync_time:6.2f} s (client waits for the whole pipeline)")
+    print(f"async POST         {submit_time:6.2f} s (client gets job_id {job_id})")
+    print(f"worker processing  {worker_time:6.2f} s")
+    print(f"GET result         status={result['status']} fields={sorted(result['personalInfo'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Streaming de Bedrock con cierre temprano del JSON frente a la lectura completa.
+
+Reproduce chunks grabados de invoke_model_with_response_stream (Nova) desde
+benchmarks/fixtures/nova_stream_chunks.json a través de un FakeBedrock y mide
+el tiempo hasta el primer campo, hasta el objeto completo y los eventos leídos.
+
+Uso:
+    python benchmarks/bench_bedrock_stream.py [--latency 3.0]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+from fakes import FakeBedrock, FakeEventStream
+from llm_stream import chunk_text
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'nova_stream_chunks.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=3.0, help='total stream duration (s)')
+    args = parser.parse_args()
+
+    with open(FIXTURE) as f:
+        payloads = json.load(f)
+
+    # Lectura completa: equivalente a esperar toda la respuesta de invoke_model
+    stream = FakeEventStream(payloads, args.latency / len(payloads))
+    start = time.perf_counter()
+    full_text = ''.join(chunk_text(event) for event in stream)
+    full_time = time.perf_counter() - start
+    expected = json.loads(full_text[full_text.index('{'):full_text.rindex('}') + 1])
+
+    app.bedrock = FakeBedrock(latency=args.latency)
+    # Todas las rutas del router apuntan al mismo fake
+    app.bedrock_client = lambda region: app.bedrock
+    app.bedrock.stream_payloads = payloads
+    first_field = []
+    start = time.perf_counter()
+    text = app.call_bedrock_stream(
+        'CV text',
+        on_partial=lambda fields: first_field or first_field.append(time.perf_counter() - start)
+    )
+    stream_time = time.perf_counter() - start
+    assert json.loads(text) == expected
+
+    print(f"full read        {full_time:6.2f} s  events={len(payloads)}")
+    print(f"streamed         {stream_time:6.2f} s  events={app.bedrock.last_stream.consumed}"
+          f"  first field after {first_field[0]:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
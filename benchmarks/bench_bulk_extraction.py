@@ -0,0 +1,88 @@
+"""
+Extracción masiva frente a una llamada por documento.
+
+Simula Bedrock con una latencia fija por llamada más un coste por token y
+responde con los valores esperados del corpus sintético. Una fracción de los
+elementos del array se corrompe o se omite para comprobar que solo se
+reintentan esos documentos.
+
+Uso:
+    python benchmarks/bench_bulk_extraction.py [--size 1000] [--corrupt 0.05]
+"""
+import os
+import re
+import sys
+import json
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from corpus import generate_corpus
+from bulk_extraction import extract_bulk
+from prompt_builder import build_prompt_text, estimate_tokens
+
+FIELDS = ['fullname', 'phone_number', 'address', 'email', 'zip_code']
+DOCUMENT_ID_PATTERN = re.compile(r'^### DOCUMENT (\S+)$', re.MULTILINE)
+
+
+class SimulatedModel:
+    """Modelo simulado: cuenta llamadas y acumula una latencia estimada"""
+
+    def __init__(self, expected, call_latency, token_latency, corrupt, seed=7):
+        self.expected = expected
+        self.call_latency = call_latency
+        self.token_latency = token_latency
+        self.corrupt = corrupt
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.seconds = 0.0
+
+    def invoke(self, system_prompt, text, max_new_tokens):
+        items = []
+        for document_id in DOCUMENT_ID_PATTERN.findall(text):
+            roll = self.rng.random()
+            if roll < self.corrupt / 2:
+                continue
+            item = dict(self.expected[document_id], document_id=document_id)
+            if roll < self.corrupt:
+                item = json.dumps(item)[:-5]
+                items.append(item)
+                continue
+            items.append(json.dumps(item))
+        response = '[' + ', '.join(items) + ']'
+        self.calls += 1
+        self.seconds += self.call_latency + self.token_latency * (
+            estimate_tokens(system_prompt + text) + estimate_tokens(response)
+        )
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=1000)
+    parser.add_argument('--corrupt', type=float, default=0.05)
+    parser.add_argument('--call-latency', type=float, default=0.8)
+    parser.add_argument('--token-latency', type=float, default=0.0002)
+    parser.add_argument('--max-documents', type=int, default=40)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size)
+    documents = [(str(i), build_prompt_text(cv['textract_response'], 600)) for i, cv in enumerate(corpus)]
+    expected = {str(i): cv['expected'] for i, cv in enumerate(corpus)}
+
+    print(f"{'mode':>12} {'calls':>6} {'model time':>11} {'extracted':>10} {'correct':>8}")
+    for mode, max_documents in (('per-document', 1), ('bulk', args.max_documents)):
+        model = SimulatedModel(expected, args.call_latency, args.token_latency, args.corrupt)
+        results, failed = extract_bulk(
+            documents, model.invoke, FIELDS,
+            max_input_tokens=100000, output_tokens_per_document=120,
+            max_output_tokens=5000, max_documents=max_documents, max_retries=2
+        )
+        correct = sum(results[document_id] == expected[document_id] for document_id in results)
+        print(f"{mode:>12} {model.calls:>6} {model.seconds:>10.1f}s "
+              f"{len(results) / len(documents):>10.1%} {correct / len(documents):>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Arranque en frío vs en caliente de los clientes boto3.
+
+Levanta un endpoint HTTP local que responde '{}' a cualquier POST y mide
+por invocación el coste de crear un cliente nuevo (comportamiento anterior
+del handler) frente a reutilizar el de aws_clients.get_client.
+
+Uso:
+    python benchmarks/bench_client_init.py [--invocations 50]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+os.environ.setdefault('AWS_ACCESS_KEY_ID', 'testing')
+os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'testing')
+
+import boto3
+from aws_clients import get_client, reset_clients
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Respuesta en un solo write y sin Nagle para no medir el delayed ACK de TCP
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        body = b'{"Blocks": []}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-amz-json-1.1')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def invoke(client):
+    client.detect_document_text(Document={'Bytes': b'stub'})
+
+
+def measure(label, make_client, invocations):
+    timings = []
+    for _ in range(invocations):
+        start = time.perf_counter()
+        invoke(make_client())
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{label:>22} first={timings[0]:7.1f} ms  "
+          f"p50={statistics.median(timings):6.1f} ms  max={max(timings):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--invocations', type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = f'http://127.0.0.1:{server.server_address[1]}'
+
+    measure('client per invocation',
+            lambda: boto3.client('textract', endpoint_url=endpoint),
+            args.invocations)
+
+    reset_clients()
+    measure('shared client',
+            lambda: get_client('textract', endpoint_url=endpoint),
+            args.invocations)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Coste de aceptar imágenes directamente frente a exigir un PDF.
+
+Antes solo se aceptaban PDFs: una foto o un escaneo en PNG/JPEG/TIFF había que
+envolverlo en un PDF, que en el servidor volvía a pasar por pdftotext, pdfinfo
+y Textract (o rasterizado si tenía varias páginas). Ahora se detecta el formato
+por los bytes mágicos y la imagen va tal cual a Textract.
+
+Para expense_test.png y fotos sintéticas en JPEG/TIFF se mide:
+    as_is       detect_document_format + bytes sin tocar (camino nuevo)
+    pdf_wrap    decodificar con PIL y envolver en PDF (lo que hacía falta antes)
+    pdf_render  además, rasterizar ese PDF de vuelta con poppler (solo si está instalado)
+con el tamaño del payload que llega a Textract. Pillow guarda el PDF de una
+imagen RGB con compresión JPEG, así que el PDF puede pesar menos que un PNG a
+costa de recomprimir con pérdida.
+
+Uso:
+    python benchmarks/bench_image_input.py [--repeat 5]
+"""
+import os
+import io
+import sys
+import time
+import shutil
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+# app.py crea clientes boto3 al importarse; no hace falta red, solo región
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+from PIL import Image, ImageDraw
+
+EXPENSE_IMAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'expense_test.png')
+# Foto de una hoja A4 a 300 dpi, como la de un móvil
+PHOTO_SIZE = (2480, 3508)
+
+
+def synthetic_photo():
+    image = Image.new('RGB', PHOTO_SIZE, (236, 232, 224))
+    draw = ImageDraw.Draw(image)
+    for line in range(120):
+        draw.text((160, 160 + line * 26), f'Line {line} Jane Doe jane.doe@example.com +34 600 000 000 28001',
+                  fill='black')
+    return image
+
+
+def encode(image, fmt, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def build_inputs():
+    photo = synthetic_photo()
+    with open(EXPENSE_IMAGE, 'rb') as f:
+        inputs = {'expense_test.png': f.read()}
+    inputs['photo.jpg'] = encode(photo, 'JPEG', quality=85)
+    inputs['photo.tiff'] = encode(photo.convert('L'), 'TIFF', compression='tiff_lzw')
+    return inputs
+
+
+def as_is(document):
+    app.detect_document_format(document)
+    return document
+
+
+def pdf_wrap(document):
+    with Image.open(io.BytesIO(document)) as image:
+        return encode(image.convert('RGB'), 'PDF', resolution=72)
+
+
+def pdf_render(document):
+    return app.convert_pdf_to_images(pdf_wrap(document), max_pages=1)[0]
+
+
+def measure(function, document, repeat):
+    """Tiempo medio y bytes enviados a Textract"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        payload = function(document)
+    return (time.perf_counter() - start) / repeat, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    modes = {'as_is': as_is, 'pdf_wrap': pdf_wrap}
+    if shutil.which('pdftoppm'):
+        modes['pdf_render'] = pdf_render
+    else:
+        print('pdftoppm not found: skipping pdf_render\n')
+
+    print(f"{'input':>18} {'mode':>10} {'time (ms)':>10} {'payload (KB)':>13}")
+    for name, document in build_inputs().items():
+        for mode, function in modes.items():
+            elapsed, payload = measure(function, document, args.repeat)
+            print(f"{name:>18} {mode:>10} {elapsed * 1000:>10.2f} {payload / 1024:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
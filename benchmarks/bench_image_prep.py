@@ -0,0 +1,163 @@
+"""
+Tamaño del payload frente a calidad de OCR de image_prep.prepare_image.
+
+Los fixtures son CVs sintéticos del corpus renderizados como página A4 a --dpi
+(300 por defecto) con texto de 10 pt, en dos variantes:
+    clean  página impresa rasterizada en grises (PDF escaneado limpio)
+    scan   foto/escáner en color con ruido del sensor
+Para cada alto de página y codificación se mide el payload, el tiempo de
+preparación y, como indicadores de calidad de OCR:
+    text px  alto del texto de 10 pt en píxeles; Textract necesita unos 15 px
+    PSNR     pérdida de la codificación frente a la misma página sin comprimir (dB)
+Con --textract se envía cada payload a Textract (credenciales de AWS) y se
+mide el recall de palabras contra el texto del fixture, que es la medida real.
+La fila "full PNG" es lo que hacía el render de la página antes; "prepare_image"
+es la política por defecto (la codificación más pequeña al alto objetivo).
+
+Uso:
+    python benchmarks/bench_image_prep.py [--documents 4] [--dpi 300]
+    python benchmarks/bench_image_prep.py --textract --documents 10
+"""
+import os
+import io
+import re
+import sys
+import math
+import time
+import random
+import argparse
+import statistics
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import image_prep
+from corpus import generate_cv
+from PIL import Image, ImageDraw, ImageFont, ImageChops, ImageStat
+
+A4_INCHES = (8.27, 11.69)
+FONT_POINTS = 10
+LINE_POINTS = 15
+VARIANTS = ('clean', 'scan')
+# Altos de página: ~A4 a 300, 200, 150, 120 y 100 dpi
+HEIGHTS = (3508, 2339, 1754, 1403, 1169)
+ENCODINGS = (('png', None), ('jpeg', 90), ('jpeg', 75), ('jpeg', 50))
+TEXTRACT_MIN_TEXT_PX = 15
+WORD_PATTERN = re.compile(r'[\w@.+-]+')
+
+
+def render_fixture(cv, variant, dpi):
+    """Página A4 del CV y su texto esperado"""
+    lines = [block['Text'] for block in cv['textract_response']['Blocks']]
+    size = (round(A4_INCHES[0] * dpi), round(A4_INCHES[1] * dpi))
+    image = Image.new('L', size, 250)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=FONT_POINTS / 72 * dpi)
+    line_height = LINE_POINTS / 72 * dpi
+    for index, text in enumerate(lines):
+        draw.text((dpi, dpi + index * line_height), text, fill=20, font=font)
+
+    if variant == 'scan':
+        # Ruido del sensor y papel ligeramente amarillento
+        noise = Image.effect_noise(size, 24).point(lambda value: min(255, value + 128))
+        gray = ImageChops.multiply(image, noise)
+        image = Image.merge('RGB', (gray, gray, gray.point(lambda value: value * 0.92)))
+    return image, '\n'.join(lines)
+
+
+def build_fixtures(documents, dpi, seed):
+    rng = random.Random(seed)
+    cvs = [generate_cv(rng) for _ in range(documents)]
+    return [(variant,) + render_fixture(cv, variant, dpi) for variant in VARIANTS for cv in cvs]
+
+
+def psnr(reference, payload):
+    """PSNR en dB de la imagen decodificada frente a la referencia sin comprimir"""
+    with Image.open(io.BytesIO(payload)) as decoded:
+        difference = ImageChops.difference(reference, decoded.convert(reference.mode))
+    mse = statistics.fmean(value ** 2 for value in ImageStat.Stat(difference).rms)
+    return 99.0 if mse == 0 else 10 * math.log10(255 ** 2 / mse)
+
+
+def word_recall(expected, textract_response):
+    """Fracción de palabras del fixture que aparecen en las líneas de Textract"""
+    expected_words = Counter(WORD_PATTERN.findall(expected.lower()))
+    found = Counter(WORD_PATTERN.findall(' '.join(
+        block['Text'] for block in textract_response['Blocks'] if block['BlockType'] == 'LINE'
+    ).lower()))
+    return sum((expected_words & found).values()) / max(1, sum(expected_words.values()))
+
+
+def settings():
+    """(etiqueta, alto, función imagen -> (payload, referencia))"""
+    def fixed(height, encoding, quality):
+        def prepare(image):
+            resized = image_prep.resize_to_height(image.convert('L'), height)
+            if quality is None:
+                return image_prep.encode_image(resized, encoding), resized
+            return image_prep.encode_image(resized, encoding, quality), resized
+        return prepare
+
+    def full_png(image):
+        return image_prep.encode_image(image, 'png'), image
+
+    def policy(image):
+        payload = image_prep.prepare_image(image)
+        with Image.open(io.BytesIO(payload)) as decoded:
+            height = decoded.height
+        return payload, image_prep.resize_to_height(image.convert('L'), height)
+
+    yield 'full PNG', None, full_png
+    for height in HEIGHTS:
+        for encoding, quality in ENCODINGS:
+            label = f"{encoding} q{quality}" if quality else encoding
+            yield label, height, fixed(height, encoding, quality)
+    yield 'prepare_image', image_prep.IMAGE_TARGET_HEIGHT, policy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=4, help='CVs por variante')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--textract', action='store_true', help='Medir el recall de palabras con Textract real')
+    args = parser.parse_args()
+
+    textract = None
+    if args.textract:
+        from aws_clients import get_client
+        textract = get_client('textract')
+
+    fixtures = build_fixtures(args.documents, args.dpi, args.seed)
+    font_px = FONT_POINTS / 72 * args.dpi
+    limit_kb = image_prep.TEXTRACT_SYNC_MAX_BYTES / 1024
+
+    print(f"{len(fixtures)} fixtures at {args.dpi} dpi, sync limit {limit_kb:.0f} KB")
+    print(f"{'variant':>7} {'setting':>14} {'height':>6} {'avg KB':>8} {'max KB':>8} {'ms':>7} "
+          f"{'text px':>7} {'PSNR':>6} {'recall':>7}")
+    for variant in VARIANTS:
+        pages = [(image, text) for kind, image, text in fixtures if kind == variant]
+        for label, height, prepare in settings():
+            sizes, seconds, quality, recall = [], [], [], []
+            for image, text in pages:
+                start = time.perf_counter()
+                payload, reference = prepare(image)
+                seconds.append(time.perf_counter() - start)
+                sizes.append(len(payload))
+                quality.append(psnr(reference, payload))
+                if textract and len(payload) <= image_prep.TEXTRACT_SYNC_MAX_BYTES:
+                    recall.append(word_recall(text, textract.detect_document_text(Document={'Bytes': payload})))
+
+            scaled_height = height or pages[0][0].height
+            text_px = font_px * min(1.0, scaled_height / pages[0][0].height)
+            legible = '' if text_px >= TEXTRACT_MIN_TEXT_PX else '*'
+            recall_text = f"{statistics.fmean(recall):>7.1%}" if recall else f"{'-':>7}"
+            print(f"{variant:>7} {label:>14} {scaled_height:>6} {statistics.fmean(sizes) / 1024:>8.0f} "
+                  f"{max(sizes) / 1024:>8.0f} {statistics.fmean(seconds) * 1000:>7.0f} "
+                  f"{text_px:>6.0f}{legible:1} {statistics.fmean(quality):>6.1f} {recall_text}")
+    print(f"\n* text below the ~{TEXTRACT_MIN_TEXT_PX} px Textract minimum; max KB over {limit_kb:.0f} needs async")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Perfil de arranque en frío de los módulos de las Lambdas con `python -X importtime`.
+
+Cada muestra es un intérprete nuevo que importa el módulo del handler (lo que
+hace Lambda en la fase de init, incluida la creación de los clientes boto3).
+Se informa la mediana del tiempo acumulado, los módulos con más coste propio
+y si se cargaron pdf2image/PIL, que solo hacen falta para rasterizar PDFs.
+La fila "app + pdf2image" equivale a importar todo al arrancar, como antes.
+
+Uso:
+    python benchmarks/bench_import_time.py [--runs 10] [--top 15]
+    python benchmarks/bench_import_time.py --report app   # informe completo de -X importtime
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+TARGETS = {
+    'app': 'import app',
+    'storeData': 'import storeData',
+    'app + pdf2image': 'import pdf2image, app',
+}
+# Dependencias que el handler de CVs solo necesita en algunos caminos
+DEFERRED_MODULES = ('pdf2image', 'PIL')
+
+
+def import_profile(statement):
+    """Ejecuta statement en un intérprete nuevo y devuelve las filas de -X importtime"""
+    env = dict(os.environ, AWS_DEFAULT_REGION=os.environ.get('AWS_DEFAULT_REGION', 'us-west-2'))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        cwd=LAMBDA_DIR, env=env, capture_output=True, text=True, check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us), len(name) - len(name.lstrip())))
+    return rows, result.stderr
+
+
+def total_us(rows):
+    """Suma del acumulado de las importaciones de primer nivel"""
+    top_level = min(depth for _, _, _, depth in rows)
+    return sum(cumulative for _, _, cumulative, depth in rows if depth == top_level)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--report', choices=sorted(TARGETS), help='Imprimir el informe de -X importtime tal cual')
+    args = parser.parse_args()
+
+    if args.report:
+        print(import_profile(TARGETS[args.report])[1], end='')
+        return
+
+    print(f"{'target':>16} {'median (ms)':>12} {'min (ms)':>9}  deferred modules loaded")
+    profiles = {}
+    for target, statement in TARGETS.items():
+        runs = [import_profile(statement)[0] for _ in range(args.runs)]
+        totals = [total_us(rows) / 1000 for rows in runs]
+        loaded = sorted({name.split('.')[0] for name, _, _, _ in runs[0]} & set(DEFERRED_MODULES))
+        print(f"{target:>16} {statistics.median(totals):>12.1f} {min(totals):>9.1f}  {', '.join(loaded) or '-'}")
+        profiles[target] = runs[0]
+
+    for target in ('app', 'storeData'):
+        print(f"\n{target}: top {args.top} modules by self time")
+        for name, self_us, cumulative_us, _ in sorted(profiles[target], key=lambda row: -row[1])[:args.top]:
+            print(f"  {self_us / 1000:>8.1f} ms self {cumulative_us / 1000:>8.1f} ms cumulative  {name}")
+
+
+if __name__ == '__main__':
+    main()
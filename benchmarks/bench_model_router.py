@@ -0,0 +1,117 @@
+"""
+Latencia de la extracción con una sola ruta frente al router con cobertura.
+
+Cada región tiene un fake de bedrock-runtime con latencia lognormal y una cola
+lenta (una fracción de llamadas tarda --tail-latency). Se mide p50/p95/p99 de
+call_bedrock y cuántas peticiones extra generan las coberturas.
+
+Uso:
+    python benchmarks/bench_model_router.py [--requests 200] [--tail-fraction 0.04]
+"""
+import os
+import io
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+from model_router import ModelRoute, ModelRouter
+
+EXTRACTED_INFO = {
+    'fullname': 'Jane Doe',
+    'phone_number': '+34 600 000 000',
+    'address': 'Calle Mayor 1, Madrid',
+    'email': 'jane.doe@example.com',
+    'zip_code': '28001'
+}
+
+
+class RegionBedrock:
+    """bedrock-runtime falso de una región; responde en formato Nova o Claude según el cuerpo"""
+
+    def __init__(self, median, tail_fraction, tail_latency, seed):
+        self.median = median
+        self.tail_fraction = tail_fraction
+        self.tail_latency = tail_latency
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        with self._lock:
+            self.calls += 1
+            slow = self.rng.random() < self.tail_fraction
+            latency = self.tail_latency if slow else self.median * self.rng.lognormvariate(0, 0.25)
+        time.sleep(latency)
+        text = json.dumps(EXTRACTED_INFO)
+        if 'anthropic_version' in json.loads(body):
+            payload = {'content': [{'type': 'text', 'text': text}]}
+        else:
+            payload = {'output': {'message': {'content': [{'text': text}]}}}
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run(router, clients, requests):
+    app.model_router = router
+    app.bedrock_client = lambda region: clients[region]
+    latencies = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        app.call_bedrock('Jane Doe\njane.doe@example.com')
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--median', type=float, default=0.1, help='Latencia mediana de la ruta principal (s)')
+    parser.add_argument('--tail-fraction', type=float, default=0.04)
+    parser.add_argument('--tail-latency', type=float, default=1.0)
+    args = parser.parse_args()
+
+    def routes():
+        return [
+            ModelRoute('nova-lite-us-east-1', app.LITE_MODEL_ID, 'us-east-1', 'nova'),
+            ModelRoute('nova-lite-us-west-2', app.LITE_MODEL_ID, 'us-west-2', 'nova'),
+            ModelRoute('claude-haiku-us-west-2', app.CLAUDE_FALLBACK_MODEL_ID, 'us-west-2-claude', 'claude'),
+        ]
+
+    def clients():
+        return {
+            'us-east-1': RegionBedrock(args.median, args.tail_fraction, args.tail_latency, 1),
+            'us-west-2': RegionBedrock(args.median * 0.8, args.tail_fraction, args.tail_latency, 2),
+            'us-west-2-claude': RegionBedrock(args.median * 1.5, args.tail_fraction / 2, args.tail_latency, 3),
+        }
+
+    print(f"{'mode':>14} {'p50':>7} {'p95':>7} {'p99':>7} {'model calls':>12}")
+    for mode, hedging in (('single route', False), ('hedged', True)):
+        router_clients = clients()
+        router_routes = routes()
+        if not hedging:
+            router_routes = router_routes[:1]
+        router = ModelRouter(router_routes, hedging=hedging, default_delay=args.median * 3,
+                             min_delay=args.median / 2)
+        latencies = run(router, router_clients, args.requests)
+        calls = sum(client.calls for client in router_clients.values())
+        print(f"{mode:>14} {percentile(latencies, 0.5):>6.3f}s {percentile(latencies, 0.95):>6.3f}s "
+              f"{percentile(latencies, 0.99):>6.3f}s {calls / args.requests:>11.2f}x")
+        for route in router_routes:
+            stats = route.stats('invoke')
+            print(f"{'':>14} {route.name:<24} samples={stats['samples']:<4} "
+                  f"p50={stats['p50'] or 0:.3f}s p95={stats['p95'] or 0:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Compara el OCR multipágina secuencial con detect_text_pages.
+
+Usa un FakeTextract con latencia artificial: con el pool de hilos el tiempo
+total debería acercarse al de la página más lenta y no a la suma.
+
+Uso:
+    python benchmarks/bench_multipage.py [--latency 0.3] [--concurrency 4]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+# app.py crea clientes boto3 al importarse; no hace falta red, solo región
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from fakes import FakeTextract
+from app import detect_text_pages, merge_textract_pages, clean_and_format_text
+
+PAGE_COUNTS = [1, 2, 5, 10]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'pages':>5} {'sequential (s)':>15} {'pooled (s)':>11} {'speed-up':>9}")
+    for page_count in PAGE_COUNTS:
+        pages = [b'\x89PNG' + bytes([i]) * 1024 for i in range(page_count)]
+
+        textract = FakeTextract(latency=args.latency)
+        start = time.perf_counter()
+        sequential = [textract.detect_document_text(Document={'Bytes': page}) for page in pages]
+        sequential_time = time.perf_counter() - start
+
+        textract = FakeTextract(latency=args.latency)
+        start = time.perf_counter()
+        pooled = detect_text_pages(textract, pages, max_workers=args.concurrency)
+        pooled_time = time.perf_counter() - start
+
+        # El orden de las líneas debe ser el mismo en ambos modos
+        assert len(clean_and_format_text(merge_textract_pages(pooled)).splitlines()) == \
+            len(clean_and_format_text(merge_textract_pages(sequential)).splitlines())
+
+        print(f"{page_count:>5} {sequential_time:>15.3f} {pooled_time:>11.3f} {sequential_time / pooled_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Micro-benchmark del render de la primera página (convert_pdf_to_images con
+max_pages=1): render completo vs solo página 1.
+
+Genera PDFs de ejemplo de 1, 5 y 20 páginas y mide, en un proceso hijo
+aislado por caso, el tiempo de pared y el pico de RSS (incluyendo pdftoppm).
+
+Uso:
+    python benchmarks/bench_pdf_render.py [--dpi 200] [--repeat 3]
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import resource
+import subprocess
+from io import BytesIO
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+# app.py crea clientes boto3 al importarse; no hace falta red, solo región
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+PAGE_COUNTS = [1, 5, 20]
+
+
+def build_sample_pdf(pages):
+    """
+    Genera un PDF de tamaño A4 con texto en cada página
+    """
+    from PIL import Image, ImageDraw
+
+    images = []
+    for page in range(pages):
+        img = Image.new('RGB', (1240, 1754), 'white')
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            draw.text((80, 80 + line * 26), f'Page {page + 1} - line {line} john.doe@example.com 28001', fill='black')
+        images.append(img)
+
+    buffer = BytesIO()
+    images[0].save(buffer, format='PDF', save_all=True, append_images=images[1:])
+    return buffer.getvalue()
+
+
+def run_case(mode, pdf_path, dpi, repeat):
+    """
+    Ejecuta un caso dentro del proceso actual y devuelve tiempo medio y pico de RSS
+    """
+    from pdf2image import convert_from_bytes
+    from app import convert_pdf_to_images
+
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if mode == 'all_pages':
+            # Comportamiento anterior: rasterizar todo y quedarse con images[0]
+            images = convert_from_bytes(pdf_bytes, dpi=dpi)
+            buffer = BytesIO()
+            images[0].save(buffer, format='PNG')
+        else:
+            convert_pdf_to_images(pdf_bytes, max_pages=1, dpi=dpi)
+    elapsed = (time.perf_counter() - start) / repeat
+
+    peak_kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return {'seconds': elapsed, 'peak_rss_mb': peak_kb / 1024}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--dpi', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--case', nargs=2, metavar=('MODE', 'PDF'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], args.dpi, args.repeat)))
+        return
+
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{'pages':>5} {'mode':>10} {'time (s)':>10} {'peak RSS (MB)':>14}")
+        for pages in PAGE_COUNTS:
+            pdf_path = os.path.join(tmp, f'sample_{pages}.pdf')
+            with open(pdf_path, 'wb') as f:
+                f.write(build_sample_pdf(pages))
+
+            for mode in ('all_pages', 'first_page'):
+                # Un proceso por caso para que el pico de RSS no se contamine
+                output = subprocess.check_output([
+                    sys.executable, __file__, '--dpi', str(args.dpi),
+                    '--repeat', str(args.repeat), '--case', mode, pdf_path
+                ])
+                result = json.loads(output)
+                print(f"{pages:>5} {mode:>10} {result['seconds']:>10.3f} {result['peak_rss_mb']:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
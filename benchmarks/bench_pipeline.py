@@ -0,0 +1,416 @@
+"""
+Benchmark de extremo a extremo del pipeline: app.lambda_handler -> SQS -> storeData.lambda_handler.
+
+Todos los servicios son dobles locales (Textract, Bedrock, S3, SQS y DocumentDB
+sobre mongomock) con latencia lognormal, cola lenta y tasa de errores
+configurables. El corpus son PDFs generados con Pillow a partir de CVs
+sintéticos (con capa de texto y escaneados de una o varias páginas) más fotos
+en JPEG tipo expense_test.png y el propio expense_test.png del repositorio, que
+se envían como imagen y van directas a Textract.
+
+Se mide el tiempo de cada etapa (p50/p95/p99), el throughput de los dos
+handlers y el pico de RSS, y se compara con una línea base guardada: sale con
+código 1 si alguna métrica empeora más de --tolerance.
+
+Sin poppler en local la capa de texto, el número de páginas y el rasterizado
+salen del propio fixture (con --render-latency por página); con poppler
+instalado se usa el camino real.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--documents 60] [--concurrency 4]
+    python benchmarks/bench_pipeline.py --save-baseline
+    python benchmarks/bench_pipeline.py --baseline benchmarks/baselines/pipeline.json
+    python benchmarks/bench_pipeline.py --documents 500 --baseline /tmp/large.json  # compara también p95/p99
+"""
+import os
+import io
+import sys
+import json
+import time
+import base64
+import random
+import shutil
+import argparse
+import resource
+import contextlib
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS_DIR, '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import mongomock
+from PIL import Image, ImageDraw, ImageFont
+from pymongo.errors import AutoReconnect
+
+import app
+import storeData
+from rate_limiter import RateLimitedClient, get_limiter, RATE_LIMITS
+from corpus import generate_cv
+from fakes import (FakeS3, FakeSQS, FakeTextract, FakeBedrock, FaultInjector,
+                   LatencyDistribution, client_error)
+
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baselines', 'pipeline.json')
+EXPENSE_IMAGE = os.path.join(BENCHMARKS_DIR, '..', 'expense_test.png')
+
+# Tipos de documento del corpus y su peso
+DOCUMENT_KINDS = {'text_layer': 50, 'scanned': 35, 'photo': 15}
+SQS_BATCH_SIZE = 10
+PAGE_SIZE = (620, 877)
+QUANTILES = {'p50': 0.5, 'p95': 0.95, 'p99': 0.99}
+QUANTILE_MIN_TAIL = 5
+# Un throughput medido en menos tiempo que esto es ruido del planificador
+MIN_PHASE_SECONDS = 1.0
+LINE_HEIGHT = 14
+# Fuente de mapa de bits: rasterizar con FreeType haría que generar el corpus tardase más que el benchmark
+FONT = ImageFont.load_default_imagefont()
+
+
+class StageTimer:
+    """Acumula duraciones por etapa; wrap() sustituye una función por su versión cronometrada"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def wrap(self, owner, name, stage):
+        original = getattr(owner, name)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+        setattr(owner, name, timed)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(values):
+    return {
+        'count': len(values),
+        'mean': sum(values) / len(values),
+        **{key: percentile(values, q) for key, q in QUANTILES.items()}
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss viene en KiB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def render_page(lines, mode='L', size=PAGE_SIZE):
+    image = Image.new(mode, size, 'white')
+    draw = ImageDraw.Draw(image)
+    for index, text in enumerate(lines):
+        draw.text((30, 20 + index * LINE_HEIGHT), text, fill='black', font=FONT)
+    return image
+
+
+def encode_image(image, fmt, **kwargs):
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, **kwargs)
+    return buffer.getvalue()
+
+
+def build_fixture(cv, kind):
+    """
+    Documento del CV según su tipo (PDF, o JPEG para las fotos), con los bloques
+    LINE esperados por página y los PNG de cada página
+    """
+    blocks_by_page = defaultdict(list)
+    for block in cv['textract_response']['Blocks']:
+        blocks_by_page[block['Page']].append({'BlockType': 'LINE', 'Text': block['Text']})
+    pages = [blocks_by_page[page] for page in sorted(blocks_by_page)]
+
+    if kind == 'photo':
+        # Foto de una hoja impresa: una sola página en color, más grande y en JPEG
+        lines = [block['Text'] for page in pages for block in page]
+        image = render_page(lines, 'RGB', (PAGE_SIZE[0] * 2, LINE_HEIGHT * len(lines) + 40))
+        pages = [[block for page in pages for block in page]]
+        return {'kind': kind, 'document': encode_image(image, 'JPEG', quality=85), 'pages': pages, 'page_images': []}
+
+    images = [render_page([block['Text'] for block in page]) for page in pages]
+
+    document = encode_image(images[0], 'PDF', save_all=True, append_images=images[1:], resolution=72)
+    page_images = [encode_image(image, 'PNG') for image in images]
+    return {'kind': kind, 'document': document, 'pages': pages, 'page_images': page_images}
+
+
+def build_corpus(size, seed):
+    rng = random.Random(seed)
+    kinds = list(DOCUMENT_KINDS)
+    weights = list(DOCUMENT_KINDS.values())
+    fixtures = [build_fixture(generate_cv(rng), rng.choices(kinds, weights)[0]) for _ in range(size)]
+
+    # El escaneo de ejemplo del repositorio: Textract devuelve líneas sintéticas para él
+    with open(EXPENSE_IMAGE, 'rb') as image_file:
+        fixtures.append({'kind': 'photo', 'document': image_file.read(), 'pages': [None], 'page_images': []})
+    return fixtures
+
+
+def build_requests(fixtures, duplicate_fraction, seed):
+    """Un POST por fixture más una fracción de reenvíos de documentos ya vistos (aciertos de caché)"""
+    rng = random.Random(seed)
+    documents = [fixture['document'] for fixture in fixtures]
+    documents += [rng.choice(documents) for _ in range(int(len(documents) * duplicate_fraction))]
+    rng.shuffle(documents)
+    return [{'httpMethod': 'POST', 'body': json.dumps({'file': base64.b64encode(document).decode()})}
+            for document in documents]
+
+
+def install_fake_poppler(fixtures, render_latency):
+    """Capa de texto, número de páginas y rasterizado sacados del fixture"""
+    by_document = {fixture['document']: fixture for fixture in fixtures}
+
+    def extract_pdf_text_layer(pdf_bytes, max_pages=app.MAX_PDF_PAGES):
+        fixture = by_document.get(pdf_bytes)
+        if not fixture or fixture['kind'] != 'text_layer':
+            return ''
+        return '\f'.join('\n'.join(block['Text'] for block in page) for page in fixture['pages'][:max_pages])
+
+    def pdfinfo_from_bytes(pdf_bytes):
+        return {'Pages': len(by_document[pdf_bytes]['pages'])}
+
+    def convert_pdf_to_images(pdf_bytes, max_pages=app.MAX_PDF_PAGES, **kwargs):
+        pages = by_document[pdf_bytes]['page_images'][:max_pages]
+        time.sleep(render_latency * len(pages))
+        return pages
+
+    app.extract_pdf_text_layer = extract_pdf_text_layer
+    app.pdfinfo_from_bytes = pdfinfo_from_bytes
+    app.convert_pdf_to_images = convert_pdf_to_images
+
+
+def install_fakes(args, fixtures):
+    """Sustituye los clientes de app y storeData; devuelve los fakes para leer contadores"""
+    def latency(median, seed):
+        return LatencyDistribution(median, args.sigma, args.tail_fraction, args.tail_multiplier, seed)
+
+    def inject(client, median, error, seed):
+        return FaultInjector(client, latency(median, seed), args.error_rate, error, seed)
+
+    # Textract responde con los bloques del fixture: la imagen o el PDF entero si es de una página, cada PNG si no
+    textract_pages = {}
+    for fixture in fixtures:
+        if fixture['pages'][0] is None:
+            continue
+        if len(fixture['pages']) == 1:
+            textract_pages[fixture['document']] = fixture['pages'][0]
+        for page_image, blocks in zip(fixture['page_images'], fixture['pages']):
+            textract_pages[page_image] = blocks
+
+    textract = inject(FakeTextract(latency=0, pages=textract_pages), args.textract_latency,
+                      client_error('ThrottlingException'), 1)
+    bedrock = inject(FakeBedrock(latency=0), args.bedrock_latency, client_error('ThrottlingException'), 2)
+    queue = FakeSQS()
+    sqs = inject(queue, args.sqs_latency, client_error('ServiceUnavailable'), 3)
+    s3 = inject(FakeS3(), args.s3_latency, client_error('SlowDown'), 4)
+    collection = inject(mongomock.MongoClient()[storeData.DB_NAME][storeData.COLLECTION_NAME],
+                        args.mongo_latency, lambda operation: AutoReconnect('Injected fault'), 5)
+
+    get_limiter('textract').configure(args.textract_tps)
+    get_limiter('bedrock').configure(args.bedrock_tps)
+    app.textract = RateLimitedClient(textract, get_limiter('textract'), ('detect_document_text',))
+    app.bedrock = RateLimitedClient(bedrock, get_limiter('bedrock'),
+                                    ('invoke_model', 'invoke_model_with_response_stream'))
+    # Todas las rutas del router apuntan al mismo fake
+    app.bedrock_client = lambda region: app.bedrock
+    app.s3 = app.extraction_cache.s3 = app.ocr_store.s3 = storeData.s3 = s3
+    app.sqs = storeData.sqs = sqs
+    storeData.get_mongo_client = lambda: {storeData.DB_NAME: {storeData.COLLECTION_NAME: collection}}
+
+    if args.fake_poppler:
+        install_fake_poppler(fixtures, args.render_latency)
+    return SimpleNamespace(textract=textract, bedrock=bedrock, sqs=sqs, queue=queue, s3=s3, mongo=collection)
+
+
+def instrument(timer):
+    timer.wrap(app.extraction_cache, 'get', 'api.cache_lookup')
+    timer.wrap(app, 'extract_text', 'api.ocr')
+    timer.wrap(app, 'extract_pdf_text_layer', 'api.text_layer')
+    timer.wrap(app, 'convert_pdf_to_images', 'api.render')
+    timer.wrap(app.textract, 'detect_document_text', 'api.textract')
+    timer.wrap(app, 'pre_extract_fields', 'api.pre_extract')
+    timer.wrap(app, 'build_prompt_text', 'api.prompt')
+    timer.wrap(app, 'call_bedrock', 'api.bedrock')
+    timer.wrap(app, 'call_bedrock_stream', 'api.bedrock')
+    timer.wrap(app, 'store_result', 'api.store')
+    timer.wrap(storeData, 'fetch_cv_batch', 'store.fetch')
+    timer.wrap(storeData, 'bulk_upsert_documents', 'store.bulk_write')
+
+
+def run_pipeline(events, fakes, timer, concurrency):
+    status_codes = defaultdict(int)
+
+    def invoke_api(event):
+        start = time.perf_counter()
+        response = app.lambda_handler(event, None)
+        timer.record('api.handler', time.perf_counter() - start)
+        return response['statusCode']
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for status_code in executor.map(invoke_api, events):
+            status_codes[str(status_code)] += 1
+    api_seconds = time.perf_counter() - start
+
+    records = fakes.queue.drain(app.QUEUE_URL)['Records']
+    batches = [{'Records': records[i:i + SQS_BATCH_SIZE]} for i in range(0, len(records), SQS_BATCH_SIZE)]
+    context = SimpleNamespace(aws_request_id='bench')
+
+    def invoke_store(batch):
+        start = time.perf_counter()
+        try:
+            return len(storeData.lambda_handler(batch, context)['batchItemFailures'])
+        except Exception:
+            # Fallo de todo el lote: SQS lo reentregaría entero
+            return len(batch['Records'])
+        finally:
+            timer.record('store.handler', time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        failed_items = sum(executor.map(invoke_store, batches))
+    store_seconds = time.perf_counter() - start
+
+    return {
+        'api': {
+            'requests': len(events),
+            'seconds': api_seconds,
+            'throughput': len(events) / api_seconds,
+            'status_codes': dict(status_codes)
+        },
+        'store': {
+            'messages': len(records),
+            'batches': len(batches),
+            'seconds': store_seconds,
+            'throughput': len(records) / store_seconds if store_seconds else 0.0,
+            'failed_items': failed_items
+        }
+    }
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """
+    Lista de regresiones frente a la línea base (latencias, throughput y RSS).
+    Un cuantil solo se compara si hay al menos QUANTILE_MIN_TAIL muestras por
+    encima: con 60 documentos el p99 es una sola llamada y no dice nada.
+    Lo mismo con el throughput de una fase que dura menos de MIN_PHASE_SECONDS.
+    """
+    regressions = []
+    for stage, reference in baseline['stages'].items():
+        current = results['stages'].get(stage)
+        if current is None:
+            continue
+        for key, q in QUANTILES.items():
+            if min(current['count'], reference['count']) * (1 - q) < QUANTILE_MIN_TAIL:
+                continue
+            if current[key] > reference[key] * (1 + tolerance) and current[key] - reference[key] > min_delta:
+                regressions.append(f"{stage} {key}: {reference[key] * 1000:.1f} -> {current[key] * 1000:.1f} ms")
+    for handler in ('api', 'store'):
+        if min(results[handler]['seconds'], baseline[handler]['seconds']) < MIN_PHASE_SECONDS:
+            continue
+        reference = baseline[handler]['throughput']
+        current = results[handler]['throughput']
+        if current < reference * (1 - tolerance):
+            regressions.append(f"{handler} throughput: {reference:.1f} -> {current:.1f} /s")
+    if results['peak_rss_mb'] > baseline['peak_rss_mb'] * (1 + tolerance):
+        regressions.append(f"peak RSS: {baseline['peak_rss_mb']:.0f} -> {results['peak_rss_mb']:.0f} MB")
+    return regressions
+
+
+def print_report(results):
+    api, store = results['api'], results['store']
+    print(f"api:   {api['requests']} requests in {api['seconds']:.2f} s -> {api['throughput']:.1f} req/s "
+          f"status={api['status_codes']}")
+    print(f"store: {store['messages']} messages in {store['seconds']:.2f} s -> {store['throughput']:.1f} msg/s "
+          f"failed={store['failed_items']}")
+    print(f"peak RSS: {results['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':>18} {'count':>6} {'mean':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for stage, stats in sorted(results['stages'].items()):
+        print(f"{stage:>18} {stats['count']:>6} " + ' '.join(
+            f"{stats[key] * 1000:>6.1f}ms" for key in ('mean', 'p50', 'p95', 'p99')))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--documents', type=int, default=60)
+    parser.add_argument('--duplicate-fraction', type=float, default=0.1)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--textract-latency', type=float, default=0.15)
+    parser.add_argument('--bedrock-latency', type=float, default=0.3)
+    parser.add_argument('--s3-latency', type=float, default=0.02)
+    parser.add_argument('--sqs-latency', type=float, default=0.01)
+    parser.add_argument('--mongo-latency', type=float, default=0.01)
+    parser.add_argument('--render-latency', type=float, default=0.05, help='Rasterizado simulado por página (s)')
+    parser.add_argument('--sigma', type=float, default=0.3, help='Dispersión lognormal de las latencias')
+    parser.add_argument('--tail-fraction', type=float, default=0.02)
+    parser.add_argument('--tail-multiplier', type=float, default=5.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fracción de llamadas que fallan en cada servicio')
+    parser.add_argument('--textract-tps', type=float, help='Por defecto TEXTRACT_MAX_TPS x concurrencia')
+    parser.add_argument('--bedrock-tps', type=float, help='Por defecto BEDROCK_MAX_TPS x concurrencia')
+    parser.add_argument('--fake-poppler', action='store_true', help='Usar el fixture aunque poppler esté instalado')
+    parser.add_argument('--output', help='Guardar los resultados en JSON')
+    parser.add_argument('--save-baseline', nargs='?', const=DEFAULT_BASELINE)
+    parser.add_argument('--baseline', nargs='?', const=DEFAULT_BASELINE)
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Empeoramiento relativo admitido')
+    parser.add_argument('--min-delta', type=float, default=0.01, help='Diferencia absoluta mínima (s) para contar')
+    args = parser.parse_args()
+    # Cada contenedor de Lambda tiene su propio limitador; aquí las invocaciones concurrentes comparten proceso
+    args.textract_tps = args.textract_tps or RATE_LIMITS['textract'] * args.concurrency
+    args.bedrock_tps = args.bedrock_tps or RATE_LIMITS['bedrock'] * args.concurrency
+    args.fake_poppler = args.fake_poppler or not shutil.which('pdftoppm')
+
+    fixtures = build_corpus(args.documents, args.seed)
+    events = build_requests(fixtures, args.duplicate_fraction, args.seed)
+    fakes = install_fakes(args, fixtures)
+    timer = StageTimer()
+    instrument(timer)
+
+    # Los registros EMF de tracing van a stdout: se descartan para que no tapen el informe
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        results = run_pipeline(events, fakes, timer, args.concurrency)
+    results['config'] = {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'save_baseline', 'baseline', 'tolerance', 'min_delta')}
+    results['stages'] = {stage: summarize(values) for stage, values in timer.samples.items()}
+    results['peak_rss_mb'] = peak_rss_mb()
+    results['calls'] = {name: getattr(fakes, name).calls for name in ('textract', 'bedrock', 's3', 'sqs', 'mongo')}
+    print_report(results)
+    print(f"service calls: {results['calls']}")
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('config') != results['config']:
+            print('warning: baseline was recorded with a different configuration')
+        regressions = compare(results, baseline, args.tolerance, args.min_delta)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Evaluación offline del pre-extractor de patrones.
+
+Sobre un corpus sintético de CVs mide el coste por CV de pre_extract, la
+precisión por campo frente a los valores esperados (solo de los campos que
+superan el umbral, que son los que se devuelven sin pasar por Bedrock) y la
+fracción de CVs que evitan la llamada al modelo o la reducen a menos campos.
+
+Uso:
+    python benchmarks/bench_pre_extractor.py [--size 5000] [--min-confidence 0.9]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from corpus import generate_corpus
+from pre_extractor import pre_extract
+
+FIELDS = ['fullname', 'phone_number', 'address', 'email', 'zip_code']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=5000)
+    parser.add_argument('--min-confidence', type=float, default=0.9)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size)
+
+    accepted = {field: 0 for field in FIELDS}
+    correct = {field: 0 for field in FIELDS}
+    skipped = 0
+    reduced = 0
+    elapsed = 0.0
+
+    for cv in corpus:
+        start = time.perf_counter()
+        values, confidences = pre_extract(cv['textract_response'], FIELDS)
+        elapsed += time.perf_counter() - start
+
+        confident = [field for field in FIELDS if confidences[field] >= args.min_confidence]
+        for field in confident:
+            accepted[field] += 1
+            correct[field] += values[field] == cv['expected'][field]
+        if len(confident) == len(FIELDS):
+            skipped += 1
+        elif confident:
+            reduced += 1
+
+    print(f"CVs: {len(corpus)}  min confidence: {args.min_confidence}")
+    print(f"pre_extract: {elapsed / len(corpus) * 1e6:.1f} us/CV")
+    print(f"{'field':>14} {'accepted':>9} {'precision':>10}")
+    for field in FIELDS:
+        precision = correct[field] / accepted[field] if accepted[field] else 0.0
+        print(f"{field:>14} {accepted[field] / len(corpus):>9.1%} {precision:>10.2%}")
+    print(f"Bedrock skipped: {skipped / len(corpus):.1%}  "
+          f"fewer fields: {reduced / len(corpus):.1%}  "
+          f"full call: {1 - (skipped + reduced) / len(corpus):.1%}")
+
+
+if __name__ == '__main__':
+    main()
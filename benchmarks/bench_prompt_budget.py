@@ -0,0 +1,56 @@
+"""
+Evaluación offline del prompt con presupuesto de tokens.
+
+Sobre un corpus sintético de CVs compara el texto completo con el recortado
+por build_prompt_text: tokens enviados y cobertura de los valores esperados
+(un campo cuenta como cubierto si su valor aparece literalmente en el texto,
+condición necesaria para que el modelo lo pueda extraer).
+
+Uso:
+    python benchmarks/bench_prompt_budget.py [--size 500] [--budgets 200 400 800]
+"""
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from corpus import generate_corpus
+from prompt_builder import build_prompt_text, estimate_tokens
+
+
+def coverage(text, expected):
+    return sum(1 for value in expected.values() if value in text) / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--size', type=int, default=500)
+    parser.add_argument('--budgets', type=int, nargs='+', default=[200, 400, 800])
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.size)
+
+    full_tokens = 0
+    full_coverage = 0.0
+    for cv in corpus:
+        text = build_prompt_text(cv['textract_response'], 0)
+        full_tokens += estimate_tokens(text)
+        full_coverage += coverage(text, cv['expected'])
+
+    print(f"{'budget':>7} {'avg tokens':>11} {'reduction':>10} {'field coverage':>15}")
+    print(f"{'full':>7} {full_tokens / len(corpus):>11.0f} {'-':>10} {full_coverage / len(corpus):>15.2%}")
+
+    for budget in args.budgets:
+        tokens = 0
+        covered = 0.0
+        for cv in corpus:
+            text = build_prompt_text(cv['textract_response'], budget)
+            tokens += estimate_tokens(text)
+            covered += coverage(text, cv['expected'])
+        print(f"{budget:>7} {tokens / len(corpus):>11.0f} {1 - tokens / full_tokens:>10.1%} "
+              f"{covered / len(corpus):>15.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Limitador adaptativo frente a una cuota fija de Textract/Bedrock.
+
+Varios hilos (peticiones concurrentes del API, páginas de un PDF o workers del
+backfill) llaman a un fake que rechaza con ThrottlingException todo lo que supera
+--max-tps. Sin limitador cada rechazo acaba en un error para el usuario; con el
+limitador las llamadas se espacian, se reintentan con jitter y el ritmo converge
+a la cuota. El script falla si el modo adaptativo deja algún error, si el ritmo
+final queda por encima de --max-tps o si un servicio que limita siempre no acaba
+en ThrottledError al agotar los intentos.
+
+Uso:
+    python benchmarks/bench_rate_limiter.py [--threads 16] [--calls 20] [--max-tps 10]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+from fakes import FakeTextract, FakeThrottlingClient
+from rate_limiter import AdaptiveRateLimiter, RateLimitedClient, ThrottledError
+
+
+def run(client, threads, calls):
+    errors = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(calls):
+            try:
+                client.detect_document_text(Document={'Bytes': b'page'})
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - start, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--max-tps', type=float, default=10)
+    parser.add_argument('--limiter-tps', type=float, default=20,
+                        help='Techo inicial del limitador (por encima de la cuota real)')
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    total = args.threads * args.calls
+
+    print(f"{'mode':>10} {'calls':>6} {'errors':>7} {'throttles':>10} {'time':>7} {'ok/s':>6} {'final rate':>11}")
+
+    service = FakeThrottlingClient(FakeTextract(latency=args.latency), args.max_tps)
+    elapsed, errors = run(service, args.threads, args.calls)
+    print(f"{'none':>10} {total:>6} {errors:>7} {service.throttled:>10} {elapsed:>6.1f}s "
+          f"{(total - errors) / elapsed:>6.1f} {'-':>11}")
+
+    service = FakeThrottlingClient(FakeTextract(latency=args.latency), args.max_tps)
+    limiter = AdaptiveRateLimiter('textract', args.limiter_tps, max_attempts=8)
+    elapsed, errors = run(RateLimitedClient(service, limiter), args.threads, args.calls)
+    print(f"{'adaptive':>10} {total:>6} {errors:>7} {service.throttled:>10} {elapsed:>6.1f}s "
+          f"{(total - errors) / elapsed:>6.1f} {limiter.current_rate:>11.2f}")
+    assert errors == 0, f"adaptive mode left {errors} errors"
+    assert limiter.current_rate <= args.max_tps, \
+        f"final rate {limiter.current_rate:.2f} above quota {args.max_tps}"
+
+    # Cuota cero: todas las llamadas se rechazan y el limitador debe rendirse
+    service = FakeThrottlingClient(FakeTextract(latency=0), 0)
+    limiter = AdaptiveRateLimiter('textract', args.limiter_tps, max_attempts=3, base_delay=0.01)
+    try:
+        RateLimitedClient(service, limiter).detect_document_text(Document={'Bytes': b'page'})
+    except ThrottledError as e:
+        print(f"exhausted: ThrottledError after {service.throttled} attempts (retry after {e.retry_after}s)")
+    else:
+        raise AssertionError('expected ThrottledError once attempts run out')
+    assert service.throttled == limiter.max_attempts
+
+
+if __name__ == '__main__':
+    main()
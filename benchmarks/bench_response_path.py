@@ -0,0 +1,104 @@
+"""
+Latencia de las escrituras posteriores a la extracción (camino de la respuesta).
+
+Compara la secuencia anterior (put_object del archivo en S3, send_message a SQS
+y put del caché, una detrás de otra) con store_result, que envía la extracción en
+línea en el mensaje cuando cabe y después escribe el caché, solo si el guardado ha
+ido bien (antes de volver: en Lambda no hay trabajo en segundo plano tras responder).
+S3 y SQS se simulan con latencias lognormales para que se vea el efecto en la cola (p99).
+
+Uso:
+    python benchmarks/bench_response_path.py [--requests 300] [--text-size 4000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+
+EXTRACTED_INFO = {
+    'fullname': 'Jane Doe',
+    'phone_number': '+34 600 000 000',
+    'address': 'Calle Mayor 1, Madrid',
+    'email': 'jane.doe@example.com',
+    'zip_code': '28001'
+}
+
+
+class JitterService:
+    """S3/SQS falso con latencia lognormal (mediana `median`, cola larga)"""
+
+    def __init__(self, median, sigma, seed):
+        self.median = median
+        self.sigma = sigma
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _sleep(self):
+        with self._lock:
+            self.calls += 1
+            latency = self.median * self.rng.lognormvariate(0, self.sigma)
+        time.sleep(latency)
+
+    def put_object(self, **kwargs):
+        self._sleep()
+        return {}
+
+    def send_message(self, **kwargs):
+        self._sleep()
+        return {'MessageId': 'msg'}
+
+
+def sequential_store(extracted_info, formatted_text, extraction_path, doc_hash):
+    """Secuencia previa: archivo en S3, mensaje a SQS y caché, una detrás de otra"""
+    document_id, s3_key, s3_content = app.build_extraction_record(
+        extracted_info, formatted_text, extraction_path, doc_hash
+    )
+    app.s3.put_object(Bucket=app.S3_BUCKET, Key=s3_key, Body=json.dumps(s3_content))
+    app.sqs.send_message(QueueUrl=app.QUEUE_URL, MessageBody=json.dumps({
+        'document_id': document_id, 's3_bucket': app.S3_BUCKET, 's3_key': s3_key
+    }))
+    app.extraction_cache.put(doc_hash, {'extracted_info': extracted_info, 'document_id': document_id})
+    return document_id
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--text-size', type=int, default=4000, help='Caracteres de raw_text por CV')
+    parser.add_argument('--s3-median', type=float, default=0.03)
+    parser.add_argument('--sqs-median', type=float, default=0.015)
+    parser.add_argument('--sigma', type=float, default=0.6)
+    args = parser.parse_args()
+
+    formatted_text = ('Lorem ipsum dolor sit amet ' * (args.text_size // 27 + 1))[:args.text_size]
+
+    print(f"{'mode':>12} {'p50':>8} {'p99':>8} {'s3 puts':>8}")
+    for mode, store in (('sequential', sequential_store), ('store_result', app.store_result)):
+        app.s3 = JitterService(args.s3_median, args.sigma, 1)
+        app.sqs = JitterService(args.sqs_median, args.sigma, 2)
+        app.extraction_cache.s3 = JitterService(args.s3_median, args.sigma, 3)
+        latencies = []
+        for i in range(args.requests):
+            start = time.perf_counter()
+            store(EXTRACTED_INFO, formatted_text, 'text_layer', f'hash-{i}')
+            latencies.append(time.perf_counter() - start)
+        print(f"{mode:>12} {percentile(latencies, 0.5) * 1000:>6.1f}ms "
+              f"{percentile(latencies, 0.99) * 1000:>6.1f}ms {app.s3.calls:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Tiempo de descarga de un lote de SQS desde S3: secuencial vs fetch_cv_batch.
+
+Usa un FakeS3 con latencia artificial por get_object y barre tamaños de lote.
+
+Uso:
+    python benchmarks/bench_s3_fetch.py [--latency 0.05] [--concurrency 16]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import storeData
+from fakes import FakeS3
+
+BATCH_SIZES = [1, 10, 50, 100]
+BUCKET = 'cv-preprocess-landing'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=storeData.S3_FETCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    storeData.s3 = FakeS3(latency=args.latency)
+    payload = json.dumps({'extracted_info': {}, 'raw_text': 'x' * 2000, 'timestamp': ''})
+
+    print(f"{'batch':>5} {'sequential (s)':>15} {'pooled (s)':>11} {'speed-up':>9}")
+    for size in BATCH_SIZES:
+        bodies = []
+        for i in range(size):
+            key = f'cv_extractions/bench/{i}.json'
+            storeData.s3.objects[(BUCKET, key)] = payload.encode('utf-8')
+            bodies.append({'s3_bucket': BUCKET, 's3_key': key})
+
+        start = time.perf_counter()
+        storeData.fetch_cv_batch(bodies, max_workers=1)
+        sequential = time.perf_counter() - start
+
+        start = time.perf_counter()
+        storeData.fetch_cv_batch(bodies, max_workers=args.concurrency)
+        pooled = time.perf_counter() - start
+
+        print(f"{size:>5} {sequential:>15.3f} {pooled:>11.3f} {sequential / pooled:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
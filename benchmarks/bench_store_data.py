@@ -0,0 +1,87 @@
+"""
+Throughput de storeData.lambda_handler contra un mongod local o mongomock.
+
+Genera lotes SQS sintéticos con sus payloads en un FakeS3 y mide documentos
+por segundo a lo largo de varias invocaciones en caliente. Los fallos de
+escritura vuelven en batchItemFailures (no como excepción): se cuentan y, si
+hay alguno, el script termina con código 1 en vez de dar un ritmo engañoso.
+
+Uso:
+    python benchmarks/bench_store_data.py --mongo-uri mongodb://localhost:27017
+    python benchmarks/bench_store_data.py --mongomock
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+from fakes import FakeS3
+
+BUCKET = 'cv-preprocess-landing'
+
+
+def build_batch(s3, size):
+    records = []
+    for _ in range(size):
+        document_id = str(uuid.uuid4())
+        key = f'cv_extractions/2025/01/01/{document_id}.json'
+        s3.put_object(Bucket=BUCKET, Key=key, Body=json.dumps({
+            'extracted_info': {'fullname': 'Jane Doe', 'email': 'jane@example.com'},
+            'raw_text': 'Jane Doe\njane@example.com',
+            'timestamp': '2025-01-01T00:00:00'
+        }))
+        records.append({
+            'messageId': str(uuid.uuid4()),
+            'body': json.dumps({
+                'document_id': document_id,
+                's3_bucket': BUCKET,
+                's3_key': key,
+                'timestamp': '2025-01-01T00:00:00'
+            })
+        })
+    return {'Records': records}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--mongo-uri', default='mongodb://localhost:27017')
+    parser.add_argument('--mongomock', action='store_true')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--invocations', type=int, default=20)
+    parser.add_argument('--s3-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    os.environ['MONGO_URI'] = args.mongo_uri
+    import storeData
+
+    if args.mongomock:
+        import mongomock
+        storeData.create_mongo_client = mongomock.MongoClient
+
+    storeData.s3 = FakeS3(latency=args.s3_latency)
+    context = SimpleNamespace(aws_request_id='bench')
+    batches = [build_batch(storeData.s3, args.batch_size) for _ in range(args.invocations)]
+
+    failures = 0
+    start = time.perf_counter()
+    for batch in batches:
+        response = storeData.lambda_handler(batch, context)
+        failures += len(response.get('batchItemFailures', []))
+    elapsed = time.perf_counter() - start
+
+    documents = args.batch_size * args.invocations
+    stored = documents - failures
+    print(f"{stored} of {documents} documents stored in {elapsed:.2f} s -> {stored / elapsed:.1f} docs/s")
+    if failures:
+        print(f"{failures} documents failed (batchItemFailures): check --mongo-uri or use --mongomock")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
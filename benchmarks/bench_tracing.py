@@ -0,0 +1,151 @@
+"""
+Coste de la capa de tracing (spans + registro EMF).
+
+1. Micro: coste de un span dentro de una traza, fuera de ella y de emitir el
+   registro EMF de una invocación típica.
+2. Camino caliente: app.lambda_handler con fakes (capa de texto, Bedrock en
+   streaming, guardado en SQS y caché), alternando rondas con TRACING_ENABLED
+   activado y desactivado y quedándose con la mejor de cada modo. Por defecto
+   S3 y SQS tardan 5 ms y Bedrock 50 ms, todavía muy por debajo de producción
+   (Bedrock tarda segundos): es la cifra que se compara con el objetivo del 1%.
+   Con --latency 0 no hay esperas de red y es el peor caso, solo CPU.
+   Como la diferencia entre rondas puede ser menor que el ruido de la máquina,
+   también se estima el coste a partir de los spans por petición y de las
+   medidas micro.
+
+Uso:
+    python benchmarks/bench_tracing.py [--requests 200] [--rounds 6] [--latency 0.005]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+import tracing
+from corpus import generate_corpus
+from fakes import FakeS3, FakeSQS, FakeBedrock
+
+
+def per_call(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations
+
+
+def micro(iterations):
+    trace = tracing.Trace('bench')
+
+    def bare():
+        pass
+
+    def noop_span():
+        with tracing.span('stage', bytes_in=1024):
+            pass
+
+    def recorded_span():
+        trace.spans.clear()
+        with tracing.span('stage', bytes_in=1024) as current:
+            current.set(bytes_out=2048)
+
+    results = {'bare': per_call(bare, iterations), 'span outside trace': per_call(noop_span, iterations)}
+    token = tracing._current_trace.set(trace)
+    try:
+        results['span inside trace'] = per_call(recorded_span, iterations)
+        # Una invocación típica: una decena de spans y un registro EMF
+        trace.spans.clear()
+        for name in ('cache_lookup', 'ocr_store_get', 'text_layer', 'pre_extract', 'prompt',
+                     'bedrock', 'sqs_send', 'cache_put', 'store', 'ocr_store_put'):
+            with tracing.span(name, bytes_in=1024, bytes_out=512):
+                pass
+        results['emit EMF record'] = per_call(trace.emit, max(1, iterations // 20))
+    finally:
+        tracing._current_trace.reset(token)
+    return results
+
+
+def install_fakes(corpus, latency):
+    texts = {}
+    for index, cv in enumerate(corpus):
+        lines = [block['Text'] for block in cv['textract_response']['Blocks']]
+        texts[f'%PDF-1.4 document {index}'.encode()] = '\n'.join(lines)
+
+    app.s3 = app.extraction_cache.s3 = app.ocr_store.s3 = FakeS3(latency=latency)
+    app.sqs = FakeSQS(latency=latency)
+    app.bedrock = FakeBedrock(latency=latency * 10)
+    app.bedrock_client = lambda region: app.bedrock
+    app.extract_pdf_text_layer = lambda pdf_bytes, max_pages=app.MAX_PDF_PAGES: texts[pdf_bytes]
+    app.MIN_TEXT_LAYER_CHARS = 0
+    return [
+        {'httpMethod': 'POST', 'body': json.dumps({'file': base64.b64encode(document).decode(), 'refresh': True})}
+        for document in texts
+    ]
+
+
+def count_spans(events):
+    """Spans registrados en cada invocación"""
+    counts = []
+    emit = tracing.Trace.emit
+
+    def counting_emit(trace):
+        counts.append(len(trace.spans))
+        emit(trace)
+
+    tracing.Trace.emit = counting_emit
+    try:
+        run_round(events)
+    finally:
+        tracing.Trace.emit = emit
+    return sum(counts) / len(counts)
+
+
+def run_round(events):
+    start = time.perf_counter()
+    for event in events:
+        response = app.lambda_handler(event, None)
+        assert response['statusCode'] == 200, response
+    return (time.perf_counter() - start) / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='Latencia de S3/SQS (s); Bedrock tarda 10 veces más. 0: peor caso, solo CPU')
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        micro_results = micro(args.iterations)
+        events = install_fakes(generate_corpus(args.requests), args.latency)
+        run_round(events)  # calentamiento: OCR guardado y caché de clientes
+        timings = {True: [], False: []}
+        for _ in range(args.rounds):
+            for enabled in (False, True):
+                tracing.TRACING_ENABLED = enabled
+                timings[enabled].append(run_round(events))
+        spans_per_request = count_spans(events)
+
+    for name, seconds in micro_results.items():
+        print(f"{name:>20}: {seconds * 1e6:8.2f} us")
+    # La mejor ronda de cada modo: el ruido del planificador solo suma
+    disabled = min(timings[False])
+    enabled = min(timings[True])
+    print(f"{'hot path (off)':>20}: {disabled * 1000:8.3f} ms/request")
+    print(f"{'hot path (on)':>20}: {enabled * 1000:8.3f} ms/request")
+    print(f"{'measured overhead':>20}: {(enabled - disabled) / disabled:8.2%}")
+    estimated = spans_per_request * micro_results['span inside trace'] + micro_results['emit EMF record']
+    print(f"{'estimated overhead':>20}: {estimated / disabled:8.2%} "
+          f"({spans_per_request:.1f} spans + 1 EMF record = {estimated * 1e6:.0f} us/request)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Memoria y latencia de la entrada del documento: JSON con base64 vs subida prefirmada.
+
+Ruta anterior: API Gateway entrega un cuerpo JSON con el PDF en base64 y el
+handler hace json.loads + base64.b64decode. Ruta nueva: el navegador sube el
+PDF a S3 y el handler lee el objeto con load_document({'s3_key': ...}).
+
+Uso:
+    python benchmarks/bench_upload_paths.py [--sizes 1 5 10]
+"""
+import os
+import sys
+import json
+import time
+import base64
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-west-2')
+
+import app
+from fakes import FakeS3
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    document = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return document, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 10], help='MB')
+    parser.add_argument('--s3-latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    app.s3 = FakeS3(latency=args.s3_latency)
+    MB = 1024 * 1024
+
+    print(f"{'size':>5} {'path':>10} {'request (MB)':>13} {'time (ms)':>10} {'peak alloc (MB)':>16}")
+    for size in args.sizes:
+        pdf_bytes = b'%PDF-1.4\n' + os.urandom(size * MB)
+
+        # Ruta anterior: el cuerpo del evento ya llega como string JSON
+        event_body = json.dumps({'file': base64.b64encode(pdf_bytes).decode('ascii')})
+        document, elapsed, peak = measure(lambda: app.load_document(json.loads(event_body)))
+        assert document == pdf_bytes
+        print(f"{size:>4}M {'base64':>10} {len(event_body) / MB:>13.2f} {elapsed * 1000:>10.1f} {peak / MB:>16.2f}")
+        del event_body, document
+
+        # Ruta nueva: solo la clave viaja por API Gateway
+        key = f'{app.JOB_UPLOADS_PREFIX}/bench-{size}'
+        app.s3.objects[(app.S3_BUCKET, key)] = pdf_bytes
+        event_body = json.dumps({'s3_key': key})
+        document, elapsed, peak = measure(lambda: app.load_document(json.loads(event_body)))
+        assert document == pdf_bytes
+        print(f"{size:>4}M {'presigned':>10} {len(event_body) / MB:>13.2f} {elapsed * 1000:>10.1f} {peak / MB:>16.2f}")
+        del document
+
+
+if __name__ == '__main__':
+    main()
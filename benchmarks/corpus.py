@@ -0,0 +1,79 @@
+"""
+Corpus sintético y determinista de CVs en forma de bloques LINE de Textract.
+
+Cada CV trae los valores esperados de los campos de contacto para poder
+evaluar offline el prompt recortado y el pre-extractor sin llamar a Bedrock.
+"""
+import random
+
+FIRST_NAMES = ['María', 'José', 'Lucía', 'Javier', 'Carmen', 'David', 'Ana', 'Pablo', 'Laura', 'Sergio']
+LAST_NAMES = ['García', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Pérez', 'Gómez', 'Ruiz', 'Díaz', 'Moreno']
+STREETS = ['Calle Mayor', 'Avenida de América', 'Calle Alcalá', 'Paseo de Gracia', 'Plaza España']
+CITIES = ['Madrid', 'Barcelona', 'Valencia', 'Sevilla', 'Bilbao']
+ROLES = ['Software Engineer', 'Data Analyst', 'Project Manager', 'Sales Associate', 'Accountant']
+FILLER = [
+    'Led a team of {n} people delivering projects on time and on budget',
+    'Improved process efficiency by {n}% through automation',
+    'Responsible for customer relationships across {n} regional accounts',
+    'Designed and maintained reporting dashboards used by {n} stakeholders',
+    'Collaborated with cross-functional teams in {n} countries',
+]
+
+
+def _block(text, page, top):
+    return {
+        'BlockType': 'LINE',
+        'Text': text,
+        'Page': page,
+        'Geometry': {'BoundingBox': {'Top': round(top, 4), 'Left': 0.1, 'Width': 0.8, 'Height': 0.015}}
+    }
+
+
+def generate_cv(rng):
+    """Genera un CV con los datos de contacto en cabecera, lateral o pie de página"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    email = f"{name.split()[0].lower()}.{rng.randint(1, 999)}@example.com"
+    phone = f"+34 6{rng.randint(10, 99)} {rng.randint(100, 999)} {rng.randint(100, 999)}"
+    zip_code = f"{rng.randint(1, 52):02d}{rng.randint(0, 999):03d}"
+    city = rng.choice(CITIES)
+    address = f"{rng.choice(STREETS)} {rng.randint(1, 200)}"
+
+    contact = [f'Email: {email}', f'Tel: {phone}', address, f'{zip_code} {city}']
+    placement = rng.choices(['header', 'sidebar', 'footer'], weights=[70, 20, 10])[0]
+    pages = rng.randint(1, 3)
+
+    page_lines = {page: [] for page in range(1, pages + 1)}
+    page_lines[1] += [name, rng.choice(ROLES)]
+    if placement == 'header':
+        page_lines[1] += contact
+
+    for page in range(1, pages + 1):
+        for job in range(rng.randint(3, 6)):
+            page_lines[page].append(f'{rng.choice(ROLES)} - Company {rng.randint(1, 500)}')
+            page_lines[page].append(f'{rng.randint(2000, 2015)} - {rng.randint(2016, 2024)}')
+            for _ in range(rng.randint(3, 8)):
+                page_lines[page].append(rng.choice(FILLER).format(n=rng.randint(2, 40)))
+        if page == 1 and placement == 'sidebar':
+            middle = len(page_lines[1]) // 2
+            page_lines[1][middle:middle] = contact
+    if placement == 'footer':
+        page_lines[pages] += contact
+
+    blocks = []
+    for page, lines in page_lines.items():
+        for index, text in enumerate(lines):
+            blocks.append(_block(text, page, 0.03 + 0.94 * index / max(len(lines), 1)))
+
+    expected = {
+        'fullname': name,
+        'phone_number': phone,
+        'address': address,
+        'email': email,
+        'zip_code': zip_code
+    }
+    return {'textract_response': {'Blocks': blocks}, 'expected': expected, 'placement': placement}
+
+
+def generate_corpus(size, seed=42):
+    rng = random.Random(seed)
+    return [generate_cv(rng) for _ in range(size)]
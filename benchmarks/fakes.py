@@ -0,0 +1,292 @@
+"""
+Dobles locales de los servicios AWS que usa el pipeline de CVs.
+
+Cada fake imita solo la parte de la API de boto3 que llama lambda/,
+con una latencia artificial configurable para poder medir concurrencia.
+"""
+import io
+import json
+import time
+import random
+import threading
+
+from botocore.exceptions import ClientError
+
+
+class FakeTextract:
+    """
+    Cliente Textract falso: detect_document_text duerme `latency` segundos
+    y devuelve bloques LINE sintéticos, o los registrados en `pages` para
+    esos bytes exactos (documento o página rasterizada)
+    """
+
+    def __init__(self, latency=0.2, lines_per_page=40, pages=None):
+        self.latency = latency
+        self.lines_per_page = lines_per_page
+        self.pages = pages if pages is not None else {}
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def detect_document_text(self, Document):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+        time.sleep(self.latency)
+        blocks = self.pages.get(Document.get('Bytes'))
+        if blocks is not None:
+            return {'Blocks': blocks}
+        return {
+            'Blocks': [
+                {
+                    'BlockType': 'LINE',
+                    'Text': f'Line {i} of call {call} ({len(Document.get("Bytes", b""))} bytes)'
+                }
+                for i in range(self.lines_per_page)
+            ]
+        }
+
+
+class FakeStreamingBody:
+    """
+    Imita botocore StreamingBody: read() entrega una copia nueva de los bytes,
+    igual que una lectura real de la red
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    def read(self, amt=None):
+        return bytes(memoryview(self._data))
+
+    def close(self):
+        pass
+
+
+class FakeS3:
+    """
+    Cliente S3 falso en memoria con latencia artificial en get_object/put_object
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.objects = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        time.sleep(self.latency)
+        if isinstance(Body, str):
+            Body = Body.encode('utf-8')
+        with self._lock:
+            self.objects[(Bucket, Key)] = Body
+        return {}
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def get_object(self, Bucket, Key, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            body = self.objects.get((Bucket, Key))
+        if body is None:
+            raise ClientError({'Error': {'Code': 'NoSuchKey', 'Message': Key}}, 'GetObject')
+        return {'Body': FakeStreamingBody(body), 'ContentLength': len(body)}
+
+
+class FakeBedrock:
+    """
+    Cliente bedrock-runtime falso: invoke_model devuelve una respuesta con
+    el formato de Nova (output.message.content[0].text) tras `latency` segundos
+    """
+
+    def __init__(self, latency=0.5, extracted_info=None):
+        self.latency = latency
+        self.extracted_info = extracted_info or {
+            'fullname': 'Jane Doe',
+            'phone_number': '+34 600 000 000',
+            'address': 'Calle Mayor 1, Madrid',
+            'email': 'jane.doe@example.com',
+            'zip_code': '28001'
+        }
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        payload = {
+            'output': {'message': {'content': [{'text': json.dumps(self.extracted_info)}]}},
+            'usage': {'inputTokens': len(body) // 4, 'outputTokens': 60}
+        }
+        return {'body': io.BytesIO(json.dumps(payload).encode('utf-8'))}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        """
+        Reproduce los chunks grabados en `stream_payloads` (o genera unos a partir
+        de extracted_info) repartiendo `latency` entre todos los eventos
+        """
+        with self._lock:
+            self.calls += 1
+        payloads = getattr(self, 'stream_payloads', None)
+        if payloads is None:
+            text = json.dumps(self.extracted_info)
+            payloads = [
+                {'contentBlockDelta': {'delta': {'text': text[i:i + 8]}, 'contentBlockIndex': 0}}
+                for i in range(0, len(text), 8)
+            ] + [{'messageStop': {'stopReason': 'end_turn'}}]
+        self.last_stream = FakeEventStream(payloads, self.latency / len(payloads))
+        return {'body': self.last_stream}
+
+
+class FakeEventStream:
+    """
+    Stream de eventos de Bedrock reproducido a partir de chunks grabados,
+    con `latency` segundos entre eventos
+    """
+
+    def __init__(self, payloads, latency=0.0):
+        self.payloads = payloads
+        self.latency = latency
+        self.consumed = 0
+        self.closed = False
+
+    def __iter__(self):
+        for payload in self.payloads:
+            if self.closed:
+                return
+            time.sleep(self.latency)
+            self.consumed += 1
+            yield {'chunk': {'bytes': json.dumps(payload).encode('utf-8')}}
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSQS:
+    """
+    Cola SQS falsa en memoria: send_message guarda los mensajes por QueueUrl
+    y drain() los devuelve con la forma de un evento de Lambda
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.queues = {}
+        self._lock = threading.Lock()
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        time.sleep(self.latency)
+        with self._lock:
+            queue = self.queues.setdefault(QueueUrl, [])
+            message_id = f'msg-{len(queue)}'
+            queue.append({'messageId': message_id, 'body': MessageBody, 'eventSource': 'aws:sqs'})
+        return {'MessageId': message_id}
+
+    def drain(self, QueueUrl):
+        with self._lock:
+            records = self.queues.pop(QueueUrl, [])
+        return {'Records': records}
+
+
+class FakeThrottlingClient:
+    """
+    Envuelve un fake y rechaza con ThrottlingException las llamadas que superan
+    `max_tps` en la última ventana de un segundo, como la cuota de Textract/Bedrock
+    """
+
+    def __init__(self, client, max_tps):
+        self.client = client
+        self.max_tps = max_tps
+        self.accepted = 0
+        self.throttled = 0
+        self._window = []
+        self._lock = threading.Lock()
+
+    def _admit(self, operation_name):
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.max_tps:
+                self.throttled += 1
+                raise ClientError(
+                    {'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}},
+                    operation_name
+                )
+            self._window.append(now)
+            self.accepted += 1
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            self._admit(name)
+            return attribute(*args, **kwargs)
+        return call
+
+
+class LatencyDistribution:
+    """
+    Latencia lognormal alrededor de `median` con una cola lenta: una fracción
+    `tail_fraction` de las llamadas tarda `tail_multiplier` veces la mediana
+    """
+
+    def __init__(self, median=0.0, sigma=0.3, tail_fraction=0.0, tail_multiplier=5.0, seed=None):
+        self.median = median
+        self.sigma = sigma
+        self.tail_fraction = tail_fraction
+        self.tail_multiplier = tail_multiplier
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self):
+        if self.median <= 0:
+            return 0.0
+        with self._lock:
+            if self.rng.random() < self.tail_fraction:
+                return self.median * self.tail_multiplier
+            return self.median * self.rng.lognormvariate(0, self.sigma)
+
+
+def client_error(code):
+    """Fábrica de errores de boto3 con el código indicado para FaultInjector"""
+    def build(operation_name):
+        return ClientError({'Error': {'Code': code, 'Message': 'Injected fault'}}, operation_name)
+    return build
+
+
+class FaultInjector:
+    """
+    Envuelve un fake (o una colección de mongomock): cada llamada espera una
+    muestra de `latency` y una fracción `error_rate` falla con error(operación)
+    """
+
+    def __init__(self, client, latency=None, error_rate=0.0, error=client_error('InternalServerError'), seed=None):
+        self.client = client
+        self.latency = latency or LatencyDistribution()
+        self.error_rate = error_rate
+        self.error = error
+        self.calls = 0
+        self.errors = 0
+        self.rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if not callable(attribute):
+            return attribute
+
+        def call(*args, **kwargs):
+            with self._lock:
+                self.calls += 1
+                failed = self.rng.random() < self.error_rate
+                if failed:
+                    self.errors += 1
+            time.sleep(self.latency.sample())
+            if failed:
+                raise self.error(name)
+            return attribute(*args, **kwargs)
+        return call
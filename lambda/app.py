@@ -1,18 +1,222 @@
+import os
 import json
 import base64
-import boto3
+import hashlib
 import logging
+import time
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pdf2image import convert_from_bytes
-from io import BytesIO
-from PIL import Image
 import uuid
+import itertools
 from botocore.exceptions import ClientError
+from aws_clients import get_client
+from extraction_cache import ExtractionCache, OcrResultStore, document_hash
+from llm_stream import read_json_text, chunk_text
+from prompt_builder import build_prompt_text, estimate_tokens
+from pre_extractor import pre_extract, RULES_VERSION as PRE_EXTRACT_RULES_VERSION
+from bulk_extraction import extract_bulk
+from rate_limiter import RateLimitedClient, ThrottledError, get_limiter, RATE_LIMITS
+from model_router import ModelRoute, ModelRouter
+from tracing import span, traced, annotate, propagate, traced_handler
+from image_prep import prepare_image, prepare_image_bytes, TEXTRACT_SYNC_MAX_BYTES, IMAGE_GRAYSCALE, IMAGE_PREP_MODE
+from image_prep import prepare_image_frames, count_image_frames
 
-s3 = boto3.client('s3')
-sqs = boto3.client('sqs')
+# Clientes creados una sola vez por contenedor, en la fase de init de Lambda
+BEDROCK_REGION = "us-east-1"
+s3 = get_client('s3')
+sqs = get_client('sqs')
+# Textract y Bedrock pasan por un limitador adaptativo compartido por todo el proceso
+textract = RateLimitedClient(get_client('textract'), get_limiter('textract'),
+                             ('detect_document_text', 'start_document_text_detection'))
+bedrock = RateLimitedClient(
+    get_client('bedrock-runtime', region_name=BEDROCK_REGION),
+    get_limiter('bedrock'),
+    ('invoke_model', 'invoke_model_with_response_stream')
+)
 S3_BUCKET = 'cv-preprocess-landing'
 QUEUE_URL = 'https://sqs.us-west-2.amazonaws.com/533267341537/LambdaCandidatesStep1'
+LITE_MODEL_ID = "us.amazon.nova-lite-v1:0"
+CLAUDE_FALLBACK_MODEL_ID = "us.anthropic.claude-3-haiku-20240307-v1:0"
+FUNCTION_REGION = os.environ.get('AWS_REGION', 'us-west-2')
+
+# Candidatos para la extracción, por orden de preferencia inicial. El router
+# aprende la latencia de cada uno y prefiere el más rápido que esté sano.
+# Se puede sustituir con MODEL_ROUTES (lista JSON de {name, model_id, region, format, max_tokens}).
+# max_tokens es opcional: por defecto, el máximo de salida del formato.
+DEFAULT_MODEL_ROUTES = [
+    {'name': 'nova-lite-us-east-1', 'model_id': LITE_MODEL_ID, 'region': BEDROCK_REGION, 'format': 'nova'},
+    {'name': f'nova-lite-{FUNCTION_REGION}', 'model_id': LITE_MODEL_ID, 'region': FUNCTION_REGION, 'format': 'nova'},
+    {'name': f'claude-haiku-{FUNCTION_REGION}', 'model_id': CLAUDE_FALLBACK_MODEL_ID, 'region': FUNCTION_REGION,
+     'format': 'claude'},
+]
+MODEL_ROUTES = json.loads(os.environ.get('MODEL_ROUTES') or 'null') or DEFAULT_MODEL_ROUTES
+
+BEDROCK_MAX_NEW_TOKENS = 5000
+# Máximo de tokens de salida que admite cada formato (Claude 3 Haiku se queda en 4096)
+MODEL_FORMAT_MAX_TOKENS = {'nova': BEDROCK_MAX_NEW_TOKENS, 'claude': 4096}
+
+# Extracciones de hasta este tamaño viajan en el propio mensaje de SQS (máximo 256 KiB);
+# 0 desactiva el envío en línea y siempre se sube antes a S3
+SQS_INLINE_MAX_BYTES = int(os.environ.get('SQS_INLINE_MAX_BYTES', str(200 * 1024)))
+
+# Modo masivo (backfill): varios CVs por llamada, limitados por la ventana de contexto
+BULK_MAX_INPUT_TOKENS = int(os.environ.get('BULK_MAX_INPUT_TOKENS', '100000'))
+BULK_OUTPUT_TOKENS_PER_DOCUMENT = int(os.environ.get('BULK_OUTPUT_TOKENS_PER_DOCUMENT', '120'))
+BULK_MAX_DOCUMENTS = int(os.environ.get('BULK_MAX_DOCUMENTS', '40'))
+BULK_MAX_RETRIES = int(os.environ.get('BULK_MAX_RETRIES', '2'))
+
+# Pre-extracción local con patrones: solo se pide a Bedrock lo que no supera el umbral
+PRE_EXTRACT_ENABLED = os.environ.get('PRE_EXTRACT_ENABLED', 'true').lower() == 'true'
+PRE_EXTRACT_MIN_CONFIDENCE = float(os.environ.get('PRE_EXTRACT_MIN_CONFIDENCE', '0.9'))
+
+# Presupuesto de tokens del texto enviado a Bedrock (0 = enviar todo el texto)
+PROMPT_TOKEN_BUDGET = int(os.environ.get('PROMPT_TOKEN_BUDGET', '600'))
+PROMPT_HEADER_REGION = float(os.environ.get('PROMPT_HEADER_REGION', '0.25'))
+
+# Streaming de Bedrock: se deja de leer en cuanto se cierra el objeto JSON
+BEDROCK_STREAMING = os.environ.get('BEDROCK_STREAMING', 'true').lower() == 'true'
+# Intervalo mínimo entre escrituras de resultados parciales de un trabajo asíncrono
+PARTIAL_RESULT_MIN_INTERVAL = float(os.environ.get('PARTIAL_RESULT_MIN_INTERVAL', '0.5'))
+
+# Modo asíncrono: subidas y resultados de trabajos en S3, trabajos en su propia cola
+JOBS_QUEUE_URL = os.environ.get('JOBS_QUEUE_URL', '')
+JOB_UPLOADS_PREFIX = 'cv_uploads'
+JOB_RESULTS_PREFIX = 'cv_extractions/jobs'
+JOB_STATUS_PENDING = 'pending'
+JOB_STATUS_RUNNING = 'running'
+JOB_STATUS_COMPLETED = 'completed'
+JOB_STATUS_FAILED = 'failed'
+# Errores de S3 al leer la subida que no se arreglan reintentando: el trabajo falla
+PERMANENT_S3_ERRORS = ('NoSuchKey', 'NoSuchBucket', 'AccessDenied', 'InvalidObjectState', '403', '404')
+# maxReceiveCount de la cola de trabajos: el último intento escribe el error en vez de relanzar
+JOB_MAX_RECEIVE_COUNT = int(os.environ.get('JOB_MAX_RECEIVE_COUNT', '3'))
+
+# Subida directa a S3 con URL prefirmada (sin base64 ni límite de payload de API Gateway)
+UPLOAD_URL_EXPIRATION = int(os.environ.get('UPLOAD_URL_EXPIRATION', '300'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+UPLOAD_CONTENT_TYPES = ('application/pdf', 'image/png', 'image/jpeg', 'image/tiff')
+
+# Renderizado de PDF: solo se rasteriza la primera página. La escala de grises es la
+# de image_prep (IMAGE_GRAYSCALE): Poppler ya rasteriza en grises si la preparación los usa
+PDF_RENDER_DPI = int(os.environ.get('PDF_RENDER_DPI', '200'))
+
+# Procesamiento multipágina: páginas máximas por CV y llamadas concurrentes a Textract
+MAX_PDF_PAGES = int(os.environ.get('MAX_PDF_PAGES', '5'))
+PAGE_CONCURRENCY = int(os.environ.get('PAGE_CONCURRENCY', '4'))
+
+# Atajo de capa de texto: mínimo de caracteres alfanuméricos para no pasar por OCR
+MIN_TEXT_LAYER_CHARS = int(os.environ.get('MIN_TEXT_LAYER_CHARS', '200'))
+PDFTOTEXT_TIMEOUT = int(os.environ.get('PDFTOTEXT_TIMEOUT', '10'))
+
+# Textract asíncrono (documento en S3): solo si el documento no cabe en la llamada
+# síncrona ni después de preparar las imágenes. Acepta PDF y TIFF de hasta 500 MB.
+# Solo lo usan el worker y el backfill: en la API no cabe en los 29 s de API Gateway
+# y se responde 413 para que el cliente reenvíe el documento con async=true.
+TEXTRACT_ASYNC_PREFIX = 'textract_async'
+# Por debajo del Timeout del worker (300 s), que después aún llama a Bedrock
+TEXTRACT_ASYNC_TIMEOUT = float(os.environ.get('TEXTRACT_ASYNC_TIMEOUT', '180'))
+TEXTRACT_ASYNC_POLL_INITIAL = 1.0
+TEXTRACT_ASYNC_POLL_MAX = 5.0
+
+# Camino usado para obtener el texto, se devuelve en cada respuesta
+EXTRACTION_PATH_TEXT_LAYER = 'text_layer'
+EXTRACTION_PATH_TEXTRACT_PDF = 'textract_pdf'
+EXTRACTION_PATH_TEXTRACT_IMAGES = 'textract_images'
+EXTRACTION_PATH_TEXTRACT_IMAGE = 'textract_image'
+EXTRACTION_PATH_TEXTRACT_ASYNC = 'textract_async'
+EXTRACTION_PATH_CACHE = 'cache'
+
+# Formatos de entrada reconocidos por sus bytes mágicos. Las imágenes van tal cual
+# a Textract, que las acepta en bytes sin rasterizar ni recodificar nada.
+DOCUMENT_FORMAT_PDF = 'pdf'
+DOCUMENT_FORMAT_PNG = 'png'
+DOCUMENT_FORMAT_JPEG = 'jpeg'
+DOCUMENT_FORMAT_TIFF = 'tiff'
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', DOCUMENT_FORMAT_PNG),
+    (b'\xff\xd8\xff', DOCUMENT_FORMAT_JPEG),
+    (b'II*\x00', DOCUMENT_FORMAT_TIFF),
+    (b'MM\x00*', DOCUMENT_FORMAT_TIFF),
+)
+# La cabecera %PDF puede ir precedida de basura; los lectores la buscan en el primer KiB
+PDF_HEADER_SEARCH_BYTES = 1024
+
+# Campos que devuelve la extracción y prompt de sistema para Bedrock
+REQUIRED_FIELDS = ['fullname', 'phone_number', 'address', 'email', 'zip_code']
+EXTRACTION_PROMPT = """You are a form field extractor. Extract specific information from the provided text. 
+                Return only a JSON object with the following keys: fullname, phone_number, address, email, zip_code.
+                Format the response exactly as shown below:
+                {
+                    "fullname": "extracted name",
+                    "phone_number": "extracted phone",
+                    "address": "extracted address",
+                    "email": "extracted email",
+                    "zip_code": "extracted zipcode"
+                }
+                Do not include any additional text or explanation."""
+
+# Descripción de cada campo para el prompt reducido de la pre-extracción
+FIELD_DESCRIPTIONS = {
+    'fullname': 'extracted name',
+    'phone_number': 'extracted phone',
+    'address': 'extracted address',
+    'email': 'extracted email',
+    'zip_code': 'extracted zipcode'
+}
+
+# Versión de la extracción: cambia sola si cambia el prompt, el esquema o lo que decide
+# qué llega al modelo (pre-extracción, sus reglas y el presupuesto del prompt),
+# invalidando el caché de resultados anteriores
+EXTRACTION_VERSION = os.environ.get(
+    'EXTRACTION_VERSION',
+    hashlib.sha256('|'.join([
+        EXTRACTION_PROMPT,
+        ','.join(REQUIRED_FIELDS),
+        f'pre_extract={PRE_EXTRACT_ENABLED}:{PRE_EXTRACT_MIN_CONFIDENCE}:{PRE_EXTRACT_RULES_VERSION}',
+        f'prompt={PROMPT_TOKEN_BUDGET}:{PROMPT_HEADER_REGION}'
+    ]).encode('utf-8')).hexdigest()[:12]
+)
+
+# Caché de extracciones por hash del documento (LRU del contenedor + S3)
+EXTRACTION_CACHE_ENABLED = os.environ.get('EXTRACTION_CACHE_ENABLED', 'true').lower() == 'true'
+EXTRACTION_CACHE_PREFIX = os.environ.get('EXTRACTION_CACHE_PREFIX', 'cv_extractions/cache')
+EXTRACTION_CACHE_TTL = int(os.environ.get('EXTRACTION_CACHE_TTL', str(30 * 24 * 3600)))
+EXTRACTION_CACHE_MAX_ENTRIES = int(os.environ.get('EXTRACTION_CACHE_MAX_ENTRIES', '256'))
+
+# Resultados de OCR por hash y modo de OCR, independientes del prompt
+OCR_STORE_ENABLED = os.environ.get('OCR_STORE_ENABLED', 'true').lower() == 'true'
+OCR_STORE_PREFIX = os.environ.get('OCR_STORE_PREFIX', 'cv_ocr')
+# Incluye la preparación de las imágenes: cambiar alto, codificación o calidad cambia el OCR
+OCR_MODE = f"detect-{PDF_RENDER_DPI}dpi-{MAX_PDF_PAGES}p-{IMAGE_PREP_MODE}"
+
+ocr_store = OcrResultStore(s3, S3_BUCKET, OCR_STORE_PREFIX, OCR_MODE)
+
+extraction_cache = ExtractionCache(
+    s3,
+    S3_BUCKET,
+    EXTRACTION_CACHE_PREFIX,
+    EXTRACTION_VERSION,
+    EXTRACTION_CACHE_TTL,
+    EXTRACTION_CACHE_MAX_ENTRIES
+)
+
+# Si la función corre en us-east-1 las dos rutas de Nova coinciden: se deduplican por nombre
+model_router = ModelRouter([
+    ModelRoute(route['name'], route['model_id'], route['region'], route.get('format', 'nova'),
+               route.get('max_tokens') or MODEL_FORMAT_MAX_TOKENS.get(route.get('format', 'nova'),
+                                                                      BEDROCK_MAX_NEW_TOKENS))
+    for route in {route['name']: route for route in MODEL_ROUTES}.values()
+])
+_bedrock_clients = {}
+
+# Hilos para la lectura del OCR guardado (solapada con el caché) y su escritura
+# (solapada con Bedrock). process_document las espera antes de responder.
+side_effect_executor = ThreadPoolExecutor(max_workers=8)
+
+class DocumentTooLargeError(Exception):
+    """El documento no cabe en Textract síncrono ni reducido; la API responde 413"""
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
@@ -26,28 +230,239 @@ def log_event(message, data=None, error=None):
     }
     logger.info(json.dumps(log_entry))
 
-def convert_pdf_to_image(pdf_bytes):
+def convert_from_bytes(pdf_bytes, **kwargs):
+    """
+    pdf2image.convert_from_bytes importado bajo demanda: pdf2image arrastra PIL y solo
+    lo necesitan los PDFs escaneados, no el arranque del contenedor ni la capa de texto
+    """
+    from pdf2image import convert_from_bytes as pdf2image_convert_from_bytes
+    return pdf2image_convert_from_bytes(pdf_bytes, **kwargs)
+
+def pdfinfo_from_bytes(pdf_bytes):
+    """pdfinfo de Poppler vía pdf2image, importado bajo demanda"""
+    from pdf2image import pdfinfo_from_bytes as pdf2image_pdfinfo_from_bytes
+    return pdf2image_pdfinfo_from_bytes(pdf_bytes)
+
+def convert_pdf_to_images(pdf_bytes, max_pages=MAX_PDF_PAGES, dpi=PDF_RENDER_DPI,
+                          grayscale=IMAGE_GRAYSCALE, thread_count=PAGE_CONCURRENCY):
     """
-    Convierte la primera página del PDF a imagen
+    Rasteriza las primeras max_pages páginas del PDF en paralelo.
+    Poppler escribe cada página en un directorio temporal y se devuelven las páginas
+    preparadas para Textract en orden (None para las que no caben en el límite síncrono).
     """
     try:
-        # Convertir PDF a imagen
-        images = convert_from_bytes(pdf_bytes)
-        if not images:
-            raise Exception("No images extracted from PDF")
-        
-        # Tomar la primera página
-        first_page = images[0]
-        
-        # Convertir a bytes
-        img_byte_arr = BytesIO()
-        first_page.save(img_byte_arr, format='PNG')
-        img_byte_arr = img_byte_arr.getvalue()
-        
-        return img_byte_arr
+        with tempfile.TemporaryDirectory() as output_folder:
+            images = convert_from_bytes(
+                pdf_bytes,
+                dpi=dpi,
+                first_page=1,
+                last_page=max_pages,
+                grayscale=grayscale,
+                fmt='png',
+                thread_count=thread_count,
+                output_folder=output_folder
+            )
+            if not images:
+                raise Exception("No images extracted from PDF")
+
+            pages = []
+            for image in images:
+                pages.append(prepare_image(image, grayscale=grayscale))
+                image.close()
+
+        return pages
+    except Exception as e:
+        log_event('Error converting PDF to images', error=e)
+        raise Exception(f"Failed to convert PDF to images: {str(e)}")
+
+def detect_text_pages(textract, pages, max_workers=PAGE_CONCURRENCY):
+    """
+    Envía cada página a Textract con un pool de hilos acotado.
+    Las respuestas se devuelven en el mismo orden que las páginas.
+    """
+    if len(pages) == 1:
+        return [textract.detect_document_text(Document={'Bytes': pages[0]})]
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pages)))) as executor:
+        return list(executor.map(
+            lambda page: textract.detect_document_text(Document={'Bytes': page}),
+            pages
+        ))
+
+def merge_textract_pages(responses):
+    """
+    Une los bloques LINE de varias respuestas de Textract respetando el orden de página
+    """
+    blocks = []
+    for page_number, response in enumerate(responses, start=1):
+        for block in response['Blocks']:
+            if block['BlockType'] == 'LINE':
+                blocks.append(dict(block, Page=page_number))
+    return {'Blocks': blocks}
+
+def extract_pdf_text_layer(pdf_bytes, max_pages=MAX_PDF_PAGES):
+    """
+    Extrae la capa de texto embebida del PDF con pdftotext (capa de Poppler).
+    Devuelve una cadena vacía si el PDF no tiene texto o pdftotext falla.
+    """
+    try:
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as pdf_file:
+            pdf_file.write(pdf_bytes)
+            pdf_file.flush()
+            result = subprocess.run(
+                ['pdftotext', '-layout', '-enc', 'UTF-8', '-f', '1', '-l', str(max_pages),
+                 pdf_file.name, '-'],
+                capture_output=True,
+                timeout=PDFTOTEXT_TIMEOUT,
+                check=True
+            )
+        return result.stdout.decode('utf-8', errors='replace')
     except Exception as e:
-        log_event('Error converting PDF to image', error=e)
-        raise Exception(f"Failed to convert PDF to image: {str(e)}")
+        log_event('pdftotext failed, falling back to OCR', error=e)
+        return ''
+
+def has_usable_text_layer(text, min_chars=MIN_TEXT_LAYER_CHARS):
+    """
+    Indica si la capa de texto tiene suficiente contenido para saltarse Textract
+    """
+    return sum(1 for char in text if char.isalnum()) >= min_chars
+
+def text_layer_to_blocks(text):
+    """
+    Convierte la salida de pdftotext en bloques LINE con la forma de Textract.
+    pdftotext separa las páginas con un salto de página (\\f).
+    """
+    blocks = []
+    for page_number, page_text in enumerate(text.split('\f'), start=1):
+        for line in page_text.splitlines():
+            line = ' '.join(line.split())
+            if line:
+                blocks.append({'BlockType': 'LINE', 'Text': line, 'Page': page_number})
+    return {'Blocks': blocks}
+
+def detect_document_format(document):
+    """
+    Identifica el formato del documento por sus bytes mágicos, sin fiarse de la
+    extensión ni del Content-Type. Lanza ValueError si no es PDF, PNG, JPEG ni TIFF.
+    """
+    for signature, document_format in IMAGE_SIGNATURES:
+        if document.startswith(signature):
+            return document_format
+    if b'%PDF' in document[:PDF_HEADER_SEARCH_BYTES]:
+        return DOCUMENT_FORMAT_PDF
+    raise ValueError('Unsupported document format: expected PDF, PNG, JPEG or TIFF')
+
+def detect_document_text_async(textract, document):
+    """
+    Último recurso para documentos que no caben en Textract síncrono: se suben a S3,
+    se lanza start_document_text_detection y se sondea con backoff hasta
+    TEXTRACT_ASYNC_TIMEOUT. Devuelve los bloques LINE de las primeras MAX_PDF_PAGES páginas.
+    """
+    upload_key = f"{TEXTRACT_ASYNC_PREFIX}/{uuid.uuid4()}"
+    s3.put_object(Bucket=S3_BUCKET, Key=upload_key, Body=document)
+    try:
+        job_id = textract.start_document_text_detection(
+            DocumentLocation={'S3Object': {'Bucket': S3_BUCKET, 'Name': upload_key}}
+        )['JobId']
+        deadline = time.monotonic() + TEXTRACT_ASYNC_TIMEOUT
+        delay = TEXTRACT_ASYNC_POLL_INITIAL
+        while True:
+            response = textract.get_document_text_detection(JobId=job_id)
+            if response['JobStatus'] in ('SUCCEEDED', 'PARTIAL_SUCCESS'):
+                break
+            if response['JobStatus'] == 'FAILED':
+                raise Exception(f"Textract job failed: {response.get('StatusMessage')}")
+            if time.monotonic() + delay > deadline:
+                raise Exception(f"Textract job {job_id} timed out")
+            time.sleep(delay)
+            delay = min(delay * 1.5, TEXTRACT_ASYNC_POLL_MAX)
+
+        # El resultado llega paginado; cada bloque ya trae su número de página
+        blocks = []
+        while True:
+            blocks.extend(
+                block for block in response['Blocks']
+                if block['BlockType'] == 'LINE' and block.get('Page', 1) <= MAX_PDF_PAGES
+            )
+            if not response.get('NextToken'):
+                return {'Blocks': blocks}
+            response = textract.get_document_text_detection(JobId=job_id, NextToken=response['NextToken'])
+    finally:
+        s3.delete_object(Bucket=S3_BUCKET, Key=upload_key)
+
+def require_async(allow_async):
+    """Lanza DocumentTooLargeError si el documento necesita Textract asíncrono y no se permite"""
+    if not allow_async:
+        raise DocumentTooLargeError(
+            'Document does not fit synchronous Textract: submit it with async=true'
+        )
+
+def extract_document_text(textract, pdf_bytes, document_format=DOCUMENT_FORMAT_PDF, allow_async=False):
+    """
+    Obtiene los bloques de texto del documento por el camino más barato posible:
+    imagen directa a Textract, capa de texto local, PDF directo a Textract
+    si es de una página, o rasterizado multipágina + Textract (también para un
+    TIFF de varias páginas, que Textract síncrono rechaza). Lo que no cabe
+    en el límite síncrono se reduce (ver prepare_image) y, si ni así cabe,
+    un PDF o TIFF pasa a Textract asíncrono con allow_async; sin él se lanza
+    DocumentTooLargeError.
+    Devuelve (textract_response, extraction_path).
+    """
+    if document_format != DOCUMENT_FORMAT_PDF:
+        # PNG/JPEG/TIFF: Textract los lee en bytes, no hay capa de texto ni nada que rasterizar
+        if document_format == DOCUMENT_FORMAT_TIFF and count_image_frames(pdf_bytes) > 1:
+            # Textract síncrono solo acepta TIFF de una página: se separan y van como las de un PDF
+            with span('image_prep', bytes_in=len(pdf_bytes)) as current:
+                pages = prepare_image_frames(pdf_bytes, MAX_PDF_PAGES)
+                current.set(bytes_out=sum(len(page) for page in pages if page), pages=len(pages))
+            if None in pages:
+                require_async(allow_async)
+                with span('textract_async', bytes_in=len(pdf_bytes)):
+                    return detect_document_text_async(textract, pdf_bytes), EXTRACTION_PATH_TEXTRACT_ASYNC
+            with span('textract', bytes_in=sum(map(len, pages)), pages=len(pages)):
+                responses = detect_text_pages(textract, pages)
+            return merge_textract_pages(responses), EXTRACTION_PATH_TEXTRACT_IMAGES
+        if len(pdf_bytes) > TEXTRACT_SYNC_MAX_BYTES:
+            with span('image_prep', bytes_in=len(pdf_bytes)) as current:
+                prepared = prepare_image_bytes(pdf_bytes)
+                current.set(bytes_out=len(prepared or b''))
+            if prepared is None:
+                if document_format != DOCUMENT_FORMAT_TIFF:
+                    # Textract asíncrono tiene el mismo límite de 10 MB para PNG y JPEG
+                    raise DocumentTooLargeError('Image too large for Textract even after downscaling')
+                require_async(allow_async)
+                with span('textract_async', bytes_in=len(pdf_bytes)):
+                    return detect_document_text_async(textract, pdf_bytes), EXTRACTION_PATH_TEXTRACT_ASYNC
+            pdf_bytes = prepared
+        with span('textract', bytes_in=len(pdf_bytes), pages=1):
+            response = textract.detect_document_text(Document={'Bytes': pdf_bytes})
+        return merge_textract_pages([response]), EXTRACTION_PATH_TEXTRACT_IMAGE
+
+    with span('text_layer', bytes_in=len(pdf_bytes)) as current:
+        text_layer = extract_pdf_text_layer(pdf_bytes)
+        current.set(bytes_out=len(text_layer.encode('utf-8')))
+    if has_usable_text_layer(text_layer):
+        return text_layer_to_blocks(text_layer), EXTRACTION_PATH_TEXT_LAYER
+
+    # PDF escaneado: Textract acepta PDFs de una página en bytes, sin pasar por PNG
+    with span('pdf_info'):
+        page_count = pdfinfo_from_bytes(pdf_bytes).get('Pages', 0)
+    if page_count == 1 and len(pdf_bytes) <= TEXTRACT_SYNC_MAX_BYTES:
+        with span('textract', bytes_in=len(pdf_bytes), pages=1):
+            response = textract.detect_document_text(Document={'Bytes': pdf_bytes})
+        return merge_textract_pages([response]), EXTRACTION_PATH_TEXTRACT_PDF
+
+    with span('render', bytes_in=len(pdf_bytes)) as current:
+        pages = convert_pdf_to_images(pdf_bytes)
+        current.set(bytes_out=sum(len(page) for page in pages if page), pages=len(pages))
+    if None in pages:
+        # Alguna página no cabe ni reducida al alto mínimo: el PDF entero va por S3
+        require_async(allow_async)
+        with span('textract_async', bytes_in=len(pdf_bytes)):
+            return detect_document_text_async(textract, pdf_bytes), EXTRACTION_PATH_TEXTRACT_ASYNC
+    with span('textract', bytes_in=sum(map(len, pages)), pages=len(pages)):
+        responses = detect_text_pages(textract, pages)
+    return merge_textract_pages(responses), EXTRACTION_PATH_TEXTRACT_IMAGES
 
 def clean_and_format_text(textract_response):
     """
@@ -66,206 +481,771 @@ def validate_extracted_info(info):
     """
     Valida y asegura que todos los campos requeridos estén presentes
     """
-    required_fields = ['fullname', 'phone_number', 'address', 'email', 'zip_code']
-    for field in required_fields:
+    for field in REQUIRED_FIELDS:
         if field not in info:
             info[field] = ''
     return info
 
-def lambda_handler(event, context):
-    textract = boto3.client('textract')
-    bedrock = boto3.client('bedrock-runtime', region_name="us-east-1")
-    LITE_MODEL_ID = "us.amazon.nova-lite-v1:0"
+def build_response(status_code, body, headers=None):
+    """
+    Crea una respuesta formateada para API Gateway
+    """
+    return {
+        'statusCode': status_code,
+        'headers': dict({
+            'Access-Control-Allow-Origin': '*',
+            'Content-Type': 'application/json'
+        }, **(headers or {})),
+        'body': json.dumps(body)
+    }
+
+def lookup_stored_ocr(doc_hash):
+    """
+    Lanza en segundo plano la lectura del OCR guardado y devuelve el Future,
+    para solaparla con la consulta al caché de extracciones
+    """
+    return side_effect_executor.submit(propagate(traced('ocr_store_get')(ocr_store.get)), doc_hash)
+
+def extract_text(document, doc_hash, document_format=DOCUMENT_FORMAT_PDF, ocr_lookup=None,
+                 allow_async=False, pending_writes=None):
+    """
+    Obtiene los bloques de texto del documento, reutilizando el OCR guardado si existe.
+    ocr_lookup es la lectura ya lanzada con lookup_stored_ocr; sin ella se lee aquí.
+    allow_async permite Textract asíncrono (ver extract_document_text).
+    Con pending_writes (una lista) el OCR nuevo se guarda en segundo plano y el Future
+    se añade a la lista: el llamador debe esperarlo antes de responder, porque Lambda
+    congela el contenedor al volver. Sin ella se guarda antes de devolver.
+    Devuelve (textract_response, extraction_path).
+    """
+    stored_ocr = None
+    if ocr_lookup is not None:
+        stored_ocr = ocr_lookup.result()
+    elif OCR_STORE_ENABLED:
+        with span('ocr_store_get'):
+            stored_ocr = ocr_store.get(doc_hash)
+    if stored_ocr:
+        log_event('OCR result reused', {
+            'document_hash': doc_hash,
+            'extraction_path': stored_ocr[1]
+        })
+        return stored_ocr
+
+    textract_response, extraction_path = extract_document_text(textract, document, document_format, allow_async)
+    if OCR_STORE_ENABLED:
+        ocr_store_put = traced('ocr_store_put')(ocr_store.put)
+        if pending_writes is None:
+            ocr_store_put(doc_hash, textract_response, extraction_path)
+        else:
+            pending_writes.append(side_effect_executor.submit(
+                propagate(ocr_store_put), doc_hash, textract_response, extraction_path
+            ))
+    return textract_response, extraction_path
+
+def build_extraction_prompt(fields):
+    """
+    Prompt de sistema para extraer solo los campos indicados
+    """
+    if list(fields) == REQUIRED_FIELDS:
+        return EXTRACTION_PROMPT
+
+    example = ',\n'.join(
+        f'                    "{field}": "{FIELD_DESCRIPTIONS.get(field, "extracted value")}"'
+        for field in fields
+    )
+    return f"""You are a form field extractor. Extract specific information from the provided text. 
+                Return only a JSON object with the following keys: {', '.join(fields)}.
+                Format the response exactly as shown below:
+                {{
+{example}
+                }}
+                Do not include any additional text or explanation."""
+
+def build_bedrock_request(formatted_text, fields=REQUIRED_FIELDS, system_prompt=None,
+                          max_new_tokens=None, model_format='nova'):
+    """
+    Cuerpo de la petición con el prompt de extracción, en el formato de Nova
+    o en el de Claude (Messages API de Anthropic). max_new_tokens no pasa del
+    máximo del formato.
+    """
+    system_text = system_prompt or build_extraction_prompt(fields)
+    format_max_tokens = MODEL_FORMAT_MAX_TOKENS.get(model_format, BEDROCK_MAX_NEW_TOKENS)
+    max_new_tokens = min(max_new_tokens or format_max_tokens, format_max_tokens)
+
+    if model_format == 'claude':
+        return {
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": max_new_tokens,
+            "system": system_text,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": [{"type": "text", "text": formatted_text}]
+                }
+            ],
+            "temperature": 0.1,
+            "top_k": 10
+        }
+
+    system_list = [
+        {
+            "text": system_text
+        }
+    ]
+    
+    message_list = [
+        {
+            "role": "user",
+            "content": [{"text": formatted_text}]
+        }
+    ]
     
+    request_body = {
+        "schemaVersion": "messages-v1",
+        "messages": message_list,
+        "system": system_list,
+        "inferenceConfig": {
+            "max_new_tokens": max_new_tokens,
+            "top_p": 0.1,
+            "top_k": 10,
+            "temperature": 0.1
+        }
+    }
+    return request_body
+
+def bedrock_limiter(region):
+    """Limitador de Bedrock para una región: 'bedrock' en la original, 'bedrock-<región>' en las demás"""
+    if region == BEDROCK_REGION:
+        return get_limiter('bedrock')
+    return get_limiter(f'bedrock-{region}', RATE_LIMITS['bedrock'])
+
+def bedrock_client(region):
+    """
+    Cliente de bedrock-runtime para la región de una ruta, con su propio limitador
+    (la cuota de Bedrock es por región). La región original usa el cliente del módulo.
+    """
+    if region == BEDROCK_REGION:
+        return bedrock
+    client = _bedrock_clients.get(region)
+    if client is None:
+        client = RateLimitedClient(
+            get_client('bedrock-runtime', region_name=region),
+            bedrock_limiter(region),
+            ('invoke_model', 'invoke_model_with_response_stream')
+        )
+        _bedrock_clients[region] = client
+    return client
+
+def route_max_tokens(route, max_new_tokens=None):
+    """max_new_tokens sin pasar del máximo de la ruta (sin él, el de la ruta)"""
+    limits = [limit for limit in (max_new_tokens, route.max_tokens) if limit]
+    return min(limits) if limits else None
+
+def response_text(response_json, model_format='nova'):
+    """Texto generado en la respuesta de invoke_model (Nova o Claude)"""
+    if model_format == 'claude':
+        content = response_json.get('content') or []
+    else:
+        content = response_json.get('output', {}).get('message', {}).get('content') or []
+    if not content or 'text' not in content[0]:
+        raise Exception("Invalid response structure from Bedrock")
+    return content[0]['text']
+
+def response_usage(response_json):
+    """(tokens de entrada, tokens de salida) de invoke_model; Nova y Claude usan claves distintas"""
+    usage = response_json.get('usage') or {}
+    return (usage.get('inputTokens', usage.get('input_tokens')),
+            usage.get('outputTokens', usage.get('output_tokens')))
+
+def call_bedrock(formatted_text, fields=REQUIRED_FIELDS, system_prompt=None,
+                 max_new_tokens=None, kind='invoke', hedging=None):
+    """
+    Envía el texto a Bedrock por la mejor ruta disponible (con cobertura y
+    fallback) y devuelve la respuesta del modelo sin marcadores de código.
+    kind separa la latencia aprendida por tipo de llamada; hedging=False
+    desactiva la cobertura.
+    """
+    def attempt(route):
+        request_body = build_bedrock_request(formatted_text, fields, system_prompt,
+                                             route_max_tokens(route, max_new_tokens), route.model_format)
+        response = bedrock_client(route.region).invoke_model(
+            modelId=route.model_id,
+            body=json.dumps(request_body)
+        )
+
+        response_body = response.get('body')
+        if not response_body:
+            raise Exception("Empty response from Bedrock")
+
+        response_json = json.loads(response_body.read().decode('utf-8'))
+        return response_text(response_json, route.model_format), response_usage(response_json)
+
     try:
-        # Decode document
-        document = base64.b64decode(json.loads(event['body'])['file'])
+        log_event('Calling Bedrock', {
+            'prompt_length': len(formatted_text)
+        })
+
+        with span('bedrock', bytes_in=len(formatted_text.encode('utf-8'))) as current:
+            (full_response, (input_tokens, output_tokens)), route = model_router.run(kind, attempt, hedging=hedging)
+            current.set(bytes_out=len(full_response.encode('utf-8')), route=route.name)
+            if input_tokens is not None:
+                current.set(input_tokens=input_tokens, output_tokens=output_tokens)
         
-        try:
-            # Convertir PDF a imagen
-            image_bytes = convert_pdf_to_image(document)
-            
-            # Extract text using Textract
-            textract_response = textract.detect_document_text(
-                Document={'Bytes': image_bytes}
+        # Limpiar los marcadores de código JSON si están presentes
+        full_response = full_response.replace('```json', '').replace('```', '').strip()
+        
+        log_event('Bedrock response processed', {
+            'route': route.name,
+            'model_id': route.model_id,
+            'response_length': len(full_response),
+            'response_preview': full_response[:200]
+        })
+        return full_response
+        
+    except ThrottledError:
+        raise
+    except Exception as e:
+        log_event('Bedrock call failed', {
+            'error_type': type(e).__name__,
+            'error_message': str(e)
+        })
+        raise Exception(f'Failed to process with Bedrock: {str(e)}')
+
+def close_event_stream(event_stream):
+    """Cerrar el stream libera la conexión aunque el modelo siga generando"""
+    if hasattr(event_stream, 'close'):
+        event_stream.close()
+
+def call_bedrock_stream(formatted_text, on_partial=None, fields=REQUIRED_FIELDS):
+    """
+    Variante en streaming de call_bedrock: parsea el JSON a medida que llega,
+    avisa de cada campo completo con on_partial y corta la lectura en cuanto
+    se recibe la llave de cierre del objeto.
+    La cobertura entre rutas se decide con el tiempo hasta el primer texto;
+    el stream que pierde se cierra.
+    """
+    def attempt(route):
+        request_body = build_bedrock_request(formatted_text, fields, max_new_tokens=route_max_tokens(route),
+                                             model_format=route.model_format)
+        response = bedrock_client(route.region).invoke_model_with_response_stream(
+            modelId=route.model_id,
+            body=json.dumps(request_body)
+        )
+
+        event_stream = response.get('body')
+        if not event_stream:
+            raise Exception("Empty response from Bedrock")
+
+        # Esperar al primer evento con texto para medir el tiempo hasta el primer token
+        events = iter(event_stream)
+        received = []
+        for event in events:
+            received.append(event)
+            if chunk_text(event):
+                break
+        return event_stream, itertools.chain(received, events)
+
+    try:
+        log_event('Calling Bedrock (streaming)', {
+            'prompt_length': len(formatted_text)
+        })
+
+        with span('bedrock', bytes_in=len(formatted_text.encode('utf-8')), streaming=True) as current:
+            (event_stream, events), route = model_router.run(
+                'stream', attempt, discard=lambda result: close_event_stream(result[0])
+            )
+
+            try:
+                full_response = read_json_text(events, on_partial)
+            finally:
+                close_event_stream(event_stream)
+
+            # El stream se corta al cerrar el JSON, antes del evento con el uso: tokens estimados
+            current.set(bytes_out=len(full_response.encode('utf-8')), route=route.name,
+                        input_tokens=estimate_tokens(formatted_text),
+                        output_tokens=estimate_tokens(full_response))
+
+        log_event('Bedrock response processed', {
+            'route': route.name,
+            'model_id': route.model_id,
+            'response_length': len(full_response),
+            'response_preview': full_response[:200]
+        })
+        return full_response
+
+    except ThrottledError:
+        raise
+    except Exception as e:
+        log_event('Bedrock call failed', {
+            'error_type': type(e).__name__,
+            'error_message': str(e)
+        })
+        raise Exception(f'Failed to process with Bedrock: {str(e)}')
+
+def build_extraction_content(extracted_info, formatted_text, extraction_path, doc_hash):
+    """Contenido JSON de una extracción, tal como se guarda en S3"""
+    return {
+        'extracted_info': extracted_info,
+        'raw_text': formatted_text,
+        'extraction_path': extraction_path,
+        'document_hash': doc_hash,
+        'extraction_version': EXTRACTION_VERSION,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+def build_extraction_record(extracted_info, formatted_text, extraction_path, doc_hash):
+    """
+    Genera el document_id, la clave de S3 y el contenido JSON de una extracción
+    """
+    # Generar ID único para el documento
+    document_id = str(uuid.uuid4())
+    
+    # Preparar contenido para S3
+    s3_key = f"cv_extractions/{datetime.utcnow().strftime('%Y/%m/%d')}/{document_id}.json"
+    
+    s3_content = build_extraction_content(extracted_info, formatted_text, extraction_path, doc_hash)
+    return document_id, s3_key, s3_content
+
+def save_extraction(document_id, s3_key, s3_content):
+    """
+    Encola la extracción en SQS para storeData. Si cabe en el mensaje va en línea
+    (storeData la archiva en S3 fuera del camino de la respuesta); si no, se sube
+    antes a S3 y el mensaje solo lleva la referencia.
+    Un fallo de guardado no falla la respuesta: devuelve False y se registra.
+    """
+    sqs_message = {
+        'document_id': document_id,
+        's3_bucket': S3_BUCKET,
+        's3_key': s3_key,
+        'timestamp': datetime.utcnow().isoformat()
+    }
+    inline_body = json.dumps(dict(sqs_message, cv_data=s3_content))
+    inline = 0 < len(inline_body.encode('utf-8')) <= SQS_INLINE_MAX_BYTES
+
+    try:
+        if not inline:
+            # Subir a S3
+            body = json.dumps(s3_content)
+            with span('s3_put', bytes_out=len(body)):
+                s3.put_object(
+                    Bucket=S3_BUCKET,
+                    Key=s3_key,
+                    Body=body
+                )
+        
+        message_body = inline_body if inline else json.dumps(sqs_message)
+        with span('sqs_send', bytes_out=len(message_body), inline=inline):
+            sqs.send_message(
+                QueueUrl=QUEUE_URL,
+                MessageBody=message_body
             )
-            
+        
+        log_event('Document sent to SQS', {
+            'document_id': document_id,
+            's3_key': s3_key,
+            'inline': inline
+        })
+        return True
+        
+    except ClientError as e:
+        log_event('Error saving to S3 or sending to SQS', error=e)
+        # No fallamos la respuesta principal si falla el guardado
+        return False
+
+def pre_extract_fields(textract_response):
+    """
+    Campos que los patrones locales resuelven con confianza suficiente.
+    Devuelve (valores confiables, campos que hay que pedir a Bedrock).
+    """
+    confident = {}
+    if PRE_EXTRACT_ENABLED:
+        values, confidences = pre_extract(textract_response, REQUIRED_FIELDS)
+        confident = {
+            field: values[field] for field in REQUIRED_FIELDS
+            if confidences[field] >= PRE_EXTRACT_MIN_CONFIDENCE
+        }
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in confident]
+    log_event('Pre-extraction finished', {
+        'pre_extracted_fields': sorted(confident),
+        'missing_fields': missing_fields
+    })
+    return confident, missing_fields
+
+def store_result(extracted_info, formatted_text, extraction_path, doc_hash):
+    """
+    Guarda la extracción (SQS, y S3 si no cabe en el mensaje) y, solo si el guardado
+    ha ido bien, la deja en el caché por contenido: si no, el caché devolvería durante
+    todo el TTL un document_id que nunca llegó a DocumentDB. El caché se escribe antes
+    de volver: Lambda congela el contenedor al responder y una escritura en segundo
+    plano quedaría a medias o se perdería.
+    """
+    document_id, s3_key, s3_content = build_extraction_record(
+        extracted_info, formatted_text, extraction_path, doc_hash
+    )
+
+    if save_extraction(document_id, s3_key, s3_content) and EXTRACTION_CACHE_ENABLED:
+        with span('cache_put'):
+            extraction_cache.put(doc_hash, {
+                'extracted_info': extracted_info,
+                'document_id': document_id,
+                'raw_text': formatted_text[:500]
+            })
+    return document_id
+
+def call_bedrock_bulk(documents):
+    """
+    Extrae los campos de varios textos (document_id, texto) agrupándolos en pocas llamadas.
+    Devuelve (extracted_info por document_id, ids que no se pudieron extraer).
+    Las llamadas masivas tardan mucho más que una extracción normal: llevan su
+    propio histograma y no se cubren (duplicar un lote duplica su coste).
+    Los lotes se dimensionan para la ruta con menos tokens de salida.
+    """
+    return extract_bulk(
+        documents,
+        lambda system_prompt, text, max_new_tokens: call_bedrock(
+            text, system_prompt=system_prompt, max_new_tokens=max_new_tokens, kind='bulk', hedging=False
+        ),
+        REQUIRED_FIELDS,
+        BULK_MAX_INPUT_TOKENS,
+        BULK_OUTPUT_TOKENS_PER_DOCUMENT,
+        min(route_max_tokens(route) or BEDROCK_MAX_NEW_TOKENS for route in model_router.routes),
+        BULK_MAX_DOCUMENTS,
+        BULK_MAX_RETRIES
+    )
+
+def process_document(document, refresh=False, on_partial=None, allow_async=False):
+    """
+    Pipeline completo para un documento: caché, OCR, Bedrock y guardado.
+    Devuelve el cuerpo de la respuesta; lanza excepción si falla OCR o Bedrock.
+    on_partial recibe los campos que ya ha devuelto el modelo en modo streaming.
+    Lanza ValueError si el documento no es PDF, PNG, JPEG ni TIFF y
+    DocumentTooLargeError si no cabe en Textract síncrono y no se permite allow_async.
+    """
+    # Fuera del bloque de OCR: un formato no soportado es un error del cliente (400), no de Textract
+    document_format = detect_document_format(document)
+
+    # Un documento idéntico ya procesado con el mismo prompt/esquema se devuelve del caché.
+    # El OCR guardado se lee a la vez: en un fallo de caché no se encadenan dos lecturas de S3.
+    doc_hash = document_hash(document)
+    ocr_lookup = lookup_stored_ocr(doc_hash) if OCR_STORE_ENABLED else None
+    cached = None
+    if EXTRACTION_CACHE_ENABLED and not refresh:
+        with span('cache_lookup'):
+            cached = extraction_cache.get(doc_hash)
+    annotate(cache_hit=bool(cached))
+    if cached:
+        log_event('Extraction cache hit', {
+            'document_hash': doc_hash,
+            'document_id': cached['document_id']
+        })
+        return {
+            'personalInfo': cached['extracted_info'],
+            'rawText': cached['raw_text'],
+            'document_id': cached['document_id'],
+            'extractionPath': EXTRACTION_PATH_CACHE
+        }
+
+    # El OCR nuevo se guarda mientras se llama a Bedrock; se espera antes de responder
+    pending_writes = []
+    try:
+        try:
+            # Reutilizar el OCR guardado si existe; si no, capa de texto del PDF o Textract
+            textract_response, extraction_path = extract_text(document, doc_hash, document_format, ocr_lookup,
+                                                              allow_async, pending_writes)
+            annotate(document_format=document_format, extraction_path=extraction_path)
+        
             formatted_text = clean_and_format_text(textract_response)
-            
+        
             log_event('Text extracted and formatted', {
+                'extraction_path': extraction_path,
                 'text_length': len(formatted_text),
                 'text_preview': formatted_text[:200] + '...'
             })
-            
+        
+        except (ThrottledError, DocumentTooLargeError):
+            raise
         except Exception as e:
             log_event('Textract text detection failed', error=e)
             raise Exception('Failed to detect text with Textract')
 
+        with span('pre_extract') as current:
+            confident, missing_fields = pre_extract_fields(textract_response)
+            current.set(missing_fields=len(missing_fields))
 
-        # Prepare Bedrock request
-        system_list = [
-            {
-                "text": """You are a form field extractor. Extract specific information from the provided text. 
-                Return only a JSON object with the following keys: fullname, phone_number, address, email, zip_code.
-                Format the response exactly as shown below:
-                {
-                    "fullname": "extracted name",
-                    "phone_number": "extracted phone",
-                    "address": "extracted address",
-                    "email": "extracted email",
-                    "zip_code": "extracted zipcode"
-                }
-                Do not include any additional text or explanation."""
-            }
-        ]
-        
-        message_list = [
-            {
-                "role": "user",
-                "content": [{"text": formatted_text}]
-            }
-        ]
-        
-        request_body = {
-            "schemaVersion": "messages-v1",
-            "messages": message_list,
-            "system": system_list,
-            "inferenceConfig": {
-                "max_new_tokens": 5000,
-                "top_p": 0.1,
-                "top_k": 10,
-                "temperature": 0.1
-            }
-        }
-
-
-        # Call Bedrock
-        try:
-            log_event('Calling Bedrock', {
-                'prompt_length': len(formatted_text),
-                'model_id': LITE_MODEL_ID
+        document_id = None
+        if missing_fields:
+            # Solo las líneas más relevantes para los campos de contacto, dentro del presupuesto
+            with span('prompt'):
+                prompt_text = build_prompt_text(textract_response, PROMPT_TOKEN_BUDGET, PROMPT_HEADER_REGION)
+            log_event('Prompt built', {
+                'text_tokens': estimate_tokens(formatted_text),
+                'prompt_tokens': estimate_tokens(prompt_text),
+                'token_budget': PROMPT_TOKEN_BUDGET
             })
-            
-            response = bedrock.invoke_model(
-                modelId=LITE_MODEL_ID,
-                body=json.dumps(request_body)
-            )
-            
-            response_body = response.get('body')
-            if not response_body:
-                raise Exception("Empty response from Bedrock")
-                
-            response_text = response_body.read().decode('utf-8')
-            response_json = json.loads(response_text)
-            
-            # Extraer el texto de la nueva estructura de respuesta
-            full_response = ''
-            if ('output' in response_json and 
-                'message' in response_json['output'] and 
-                'content' in response_json['output']['message'] and 
-                len(response_json['output']['message']['content']) > 0):
-                
-                full_response = response_json['output']['message']['content'][0]['text']
-                
-                # Limpiar los marcadores de código JSON si están presentes
-                full_response = full_response.replace('```json', '').replace('```', '').strip()
-                
-                log_event('Bedrock response processed', {
-                    'response_length': len(full_response),
-                    'response_preview': full_response[:200]
-                })
+
+            if BEDROCK_STREAMING:
+                partial_callback = None
+                if on_partial:
+                    partial_callback = lambda fields: on_partial(dict(fields, **confident))
+                full_response = call_bedrock_stream(prompt_text, partial_callback, missing_fields)
             else:
-                raise Exception("Invalid response structure from Bedrock")
-            
-        except Exception as e:
-            log_event('Bedrock call failed', {
-                'error_type': type(e).__name__,
-                'error_message': str(e)
-            })
-            raise Exception(f'Failed to process with Bedrock: {str(e)}')
+                full_response = call_bedrock(prompt_text, missing_fields)
+        else:
+            # Todos los campos resueltos localmente: no hace falta llamar a Bedrock
+            full_response = json.dumps(confident)
 
-        # Process response and extract JSON
         try:
             # El texto ya debería ser JSON, intentar parsearlo directamente
-            extracted_info = json.loads(full_response)
-            
+            extracted_info = dict(json.loads(full_response), **confident)
+        
             # Validar y completar campos faltantes
             extracted_info = validate_extracted_info(extracted_info)
-            
+        
             log_event('Successfully extracted information', {
                 'extracted_info': extracted_info
             })
-            
-            # Generar ID único para el documento
-            document_id = str(uuid.uuid4())
-            
-            # Preparar contenido para S3
-            s3_key = f"cv_extractions/{datetime.utcnow().strftime('%Y/%m/%d')}/{document_id}.json"
-            
-            s3_content = {
-                'extracted_info': extracted_info,
-                'raw_text': formatted_text,
-                'timestamp': datetime.utcnow().isoformat()
-            }
-
-
-            
-            try:
-                # Subir a S3
-                s3.put_object(
-                    Bucket=S3_BUCKET,
-                    Key=s3_key,
-                    Body=json.dumps(s3_content)
-                )
-                
-                # Preparar y enviar mensaje a SQS
-                sqs_message = {
-                    'document_id': document_id,
-                    's3_bucket': S3_BUCKET,
-                    's3_key': s3_key,
-                    'timestamp': datetime.utcnow().isoformat()
-                }
-                
-                sqs.send_message(
-                    QueueUrl=QUEUE_URL,
-                    MessageBody=json.dumps(sqs_message)
-                )
-                
-                log_event('Document saved to S3 and message sent to SQS', {
-                    'document_id': document_id,
-                    's3_key': s3_key
-                })
-                
-            except ClientError as e:
-                log_event('Error saving to S3 or sending to SQS', error=e)
-                # No fallamos la respuesta principal si falla el guardado
-            
+        
+            with span('store'):
+                document_id = store_result(extracted_info, formatted_text, extraction_path, doc_hash)
+        
         except Exception as e:
             log_event('Error processing Bedrock response', {
                 'error_type': type(e).__name__,
                 'error_message': str(e),
                 'full_response': full_response
             })
-            extracted_info = {
-                'fullname': '',
-                'phone_number': '',
-                'address': '',
-                'email': '',
-                'zip_code': ''
-            }
-        
+            extracted_info = validate_extracted_info(dict(confident))
+
         return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'personalInfo': extracted_info,
-                'rawText': formatted_text[:500],
-                'document_id': document_id if 'document_id' in locals() else None
-            })
+            'personalInfo': extracted_info,
+            'rawText': formatted_text[:500],
+            'document_id': document_id,
+            'extractionPath': extraction_path
         }
+    finally:
+        for write in pending_writes:
+            write.result()
+
+def create_upload_url(content_type='application/pdf'):
+    """
+    Genera una URL prefirmada de PUT en S3 para que el navegador suba el fichero directamente
+    """
+    if content_type not in UPLOAD_CONTENT_TYPES:
+        raise ValueError(f"Unsupported content type: {content_type}")
+    upload_key = f"{JOB_UPLOADS_PREFIX}/{uuid.uuid4()}"
+    upload_url = s3.generate_presigned_url(
+        'put_object',
+        Params={'Bucket': S3_BUCKET, 'Key': upload_key, 'ContentType': content_type},
+        ExpiresIn=UPLOAD_URL_EXPIRATION
+    )
+    log_event('Upload URL created', {'s3_key': upload_key})
+    return {'upload_url': upload_url, 's3_key': upload_key, 'expires_in': UPLOAD_URL_EXPIRATION}
+
+def store_upload(document):
+    """Guarda en S3 un documento recibido en base64 y devuelve su clave"""
+    upload_key = f"{JOB_UPLOADS_PREFIX}/{uuid.uuid4()}"
+    s3.put_object(Bucket=S3_BUCKET, Key=upload_key, Body=document)
+    return upload_key
+
+def validate_upload_key(upload_key):
+    """Solo se aceptan claves de subidas bajo cv_uploads/"""
+    if not upload_key.startswith(f"{JOB_UPLOADS_PREFIX}/") or '..' in upload_key:
+        raise ValueError(f"Invalid upload key: {upload_key}")
+
+def read_upload(upload_key):
+    """
+    Lee un documento subido con URL prefirmada
+    """
+    validate_upload_key(upload_key)
+
+    response = s3.get_object(Bucket=S3_BUCKET, Key=upload_key)
+    if response.get('ContentLength', 0) > MAX_UPLOAD_BYTES:
+        # Se cierra el stream sin leerlo: no se descarga el objeto
+        response['Body'].close()
+        raise ValueError(f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    # Lectura directa del stream: una sola copia del documento en memoria
+    return response['Body'].read()
+
+def load_document(body):
+    """
+    Obtiene los bytes del documento del cuerpo de la petición:
+    clave de S3 (subida prefirmada) o fichero en base64 (modo anterior)
+    """
+    if body.get('s3_key'):
+        return read_upload(body['s3_key'])
+    return base64.b64decode(body['file'])
+
+def submit_job(upload_key, refresh=False):
+    """
+    Modo asíncrono: encola el trabajo para un documento ya guardado en S3 y devuelve el job_id
+    """
+    job_id = str(uuid.uuid4())
+
+    sqs.send_message(
+        QueueUrl=JOBS_QUEUE_URL,
+        MessageBody=json.dumps({
+            'job_id': job_id,
+            's3_bucket': S3_BUCKET,
+            's3_key': upload_key,
+            'refresh': bool(refresh),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+    )
+
+    log_event('Job submitted', {'job_id': job_id, 's3_key': upload_key})
+    return job_id
+
+def get_job_result(job_id):
+    """
+    Lee el resultado que escribió el worker en cv_extractions/jobs/.
+    Devuelve None mientras el trabajo no ha terminado.
+    """
+    try:
+        response = s3.get_object(Bucket=S3_BUCKET, Key=f"{JOB_RESULTS_PREFIX}/{job_id}.json")
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') in ('NoSuchKey', '404'):
+            return None
+        raise
+    return json.loads(response['Body'].read().decode('utf-8'))
+
+def partial_result_writer(job_id):
+    """
+    Devuelve un callback on_partial que publica los campos ya extraídos en el
+    resultado del trabajo, para que el formulario se vaya rellenando al sondear
+    """
+    last_write = [0.0]
+
+    def write_partial(fields):
+        now = time.monotonic()
+        if now - last_write[0] < PARTIAL_RESULT_MIN_INTERVAL:
+            return
+        last_write[0] = now
+        try:
+            s3.put_object(
+                Bucket=S3_BUCKET,
+                Key=f"{JOB_RESULTS_PREFIX}/{job_id}.json",
+                Body=json.dumps({
+                    'job_id': job_id,
+                    'status': JOB_STATUS_RUNNING,
+                    'personalInfo': fields
+                })
+            )
+        except ClientError as e:
+            log_event('Error writing partial job result', error=e)
+
+    return write_partial
+
+def job_failure(job_id, error):
+    """Resultado de un trabajo fallido, para que el cliente deje de sondear"""
+    log_event('Job failed', {
+        'job_id': job_id,
+        'error_type': type(error).__name__,
+        'error_message': str(error)
+    })
+    return {
+        'status': JOB_STATUS_FAILED,
+        'error': str(error),
+        'message': 'Error processing document'
+    }
+
+@traced_handler('job-worker')
+def job_worker_handler(event, context):
+    """
+    Worker de la cola de trabajos: ejecuta el pipeline para cada documento subido
+    y guarda el resultado (o el error) para que lo consulte GET /process-cv/{id}
+    """
+    for record in event['Records']:
+        job = json.loads(record['body'])
+        job_id = job['job_id']
+
+        try:
+            # read_upload valida la clave y MAX_UPLOAD_BYTES antes de leer: la URL
+            # prefirmada de PUT no limita el tamaño de lo que se sube
+            document = read_upload(job['s3_key'])
+            # Sin el límite de API Gateway: lo que no cabe en Textract síncrono va por S3
+            result = dict(process_document(document, refresh=job.get('refresh', False),
+                                           on_partial=partial_result_writer(job_id), allow_async=True),
+                          status=JOB_STATUS_COMPLETED)
+        except (ClientError, ThrottledError) as e:
+            # Error transitorio de AWS o throttling persistente: se relanza para que SQS
+            # reintente más tarde, salvo errores permanentes o el último intento antes del DLQ
+            permanent = (isinstance(e, ClientError)
+                         and e.response.get('Error', {}).get('Code') in PERMANENT_S3_ERRORS)
+            receive_count = int(record.get('attributes', {}).get('ApproximateReceiveCount', '1'))
+            if not permanent and receive_count < JOB_MAX_RECEIVE_COUNT:
+                raise
+            result = job_failure(job_id, e)
+        except Exception as e:
+            result = job_failure(job_id, e)
+
+        s3.put_object(
+            Bucket=S3_BUCKET,
+            Key=f"{JOB_RESULTS_PREFIX}/{job_id}.json",
+            Body=json.dumps(dict(result, job_id=job_id, completed_at=datetime.utcnow().isoformat()))
+        )
+        log_event('Job finished', {'job_id': job_id, 'status': result['status']})
+
+@traced_handler('process-cv')
+def lambda_handler(event, context):
+    try:
+        # GET /process-cv/{id}: consultar el estado de un trabajo asíncrono
+        if event.get('httpMethod') == 'GET':
+            job_id = (event.get('pathParameters') or {}).get('id')
+            if not job_id:
+                return build_response(400, {'message': 'Missing job id'})
+            result = get_job_result(job_id)
+            if result is None:
+                return build_response(202, {'job_id': job_id, 'status': JOB_STATUS_PENDING})
+            if result.get('status') == JOB_STATUS_RUNNING:
+                # Resultado parcial: campos ya devueltos por el modelo
+                return build_response(202, result)
+            return build_response(200, result)
+
+        body = json.loads(event['body'] or '{}')
+
+        # POST /upload-url: URL prefirmada para subir el fichero directamente a S3
+        if event.get('resource') == '/upload-url':
+            return build_response(200, create_upload_url(body.get('content_type', 'application/pdf')))
+
+        if body.get('async'):
+            # Con subida prefirmada el documento ya está en S3 y no se vuelve a leer aquí
+            upload_key = body.get('s3_key')
+            if upload_key:
+                validate_upload_key(upload_key)
+            else:
+                upload_key = store_upload(base64.b64decode(body['file']))
+            job_id = submit_job(upload_key, refresh=body.get('refresh', False))
+            return build_response(202, {'job_id': job_id, 'status': JOB_STATUS_PENDING})
+
+        # Decode document
+        document = load_document(body)
+
+        return build_response(200, process_document(document, refresh=body.get('refresh', False)))
+
+    except ThrottledError as e:
+        # Cuota de Textract/Bedrock agotada tras los reintentos: el cliente puede reintentar
+        log_event('Request throttled', {
+            'service': e.service,
+            'rate': get_limiter(e.service).current_rate
+        }, error=e.cause)
+        return build_response(429, {
+            'error': str(e),
+            'message': 'Service busy, please retry'
+        }, {'Retry-After': str(e.retry_after)})
+
+    except DocumentTooLargeError as e:
+        log_event('Document too large for synchronous processing', error=e)
+        return build_response(413, {
+            'error': str(e),
+            'message': 'Document too large'
+        })
+
+    except ValueError as e:
+        log_event('Invalid request', error=e)
+        return build_response(400, {
+            'error': str(e),
+            'message': 'Invalid request'
+        })
         
     except Exception as e:
         log_event('Fatal error in handler', {
@@ -273,14 +1253,7 @@ def lambda_handler(event, context):
             'error_message': str(e)
         })
         
-        return {
-            'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Content-Type': 'application/json'
-            },
-            'body': json.dumps({
-                'error': str(e),
-                'message': 'Error processing document'
-            })
-        }
\ No newline at end of file
+        return build_response(500, {
+            'error': str(e),
+            'message': 'Error processing document'
+        })
@@ -0,0 +1,68 @@
+import os
+import threading
+import boto3
+from botocore.config import Config
+
+# Ajustes de conexión compartidos por todos los clientes del contenedor
+MAX_POOL_CONNECTIONS = int(os.environ.get('AWS_MAX_POOL_CONNECTIONS', '25'))
+CONNECT_TIMEOUT = int(os.environ.get('AWS_CONNECT_TIMEOUT', '3'))
+MAX_RETRY_ATTEMPTS = int(os.environ.get('AWS_MAX_RETRY_ATTEMPTS', '4'))
+
+# Timeout de lectura por servicio: Bedrock puede tardar bastante más que S3/SQS
+READ_TIMEOUTS = {
+    'bedrock-runtime': int(os.environ.get('BEDROCK_READ_TIMEOUT', '60')),
+    'textract': int(os.environ.get('TEXTRACT_READ_TIMEOUT', '30')),
+}
+DEFAULT_READ_TIMEOUT = int(os.environ.get('AWS_READ_TIMEOUT', '10'))
+
+# Servicios cuyos reintentos y ritmo controla rate_limiter: botocore no reintenta
+# para no tener dos controles de ritmo compitiendo
+LIMITER_MANAGED_SERVICES = {'textract', 'bedrock-runtime'}
+
+_clients = {}
+_lock = threading.Lock()
+
+def build_config(service_name):
+    """
+    Config de botocore con pool de conexiones, keep-alive y reintentos adaptativos
+    """
+    retries = {'mode': 'adaptive', 'max_attempts': MAX_RETRY_ATTEMPTS}
+    if service_name in LIMITER_MANAGED_SERVICES:
+        retries = {'mode': 'standard', 'max_attempts': 1}
+    return Config(
+        max_pool_connections=MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=CONNECT_TIMEOUT,
+        read_timeout=READ_TIMEOUTS.get(service_name, DEFAULT_READ_TIMEOUT),
+        retries=retries
+    )
+
+def get_client(service_name, region_name=None, endpoint_url=None):
+    """
+    Devuelve un cliente boto3 reutilizado durante toda la vida del contenedor.
+    Se crea una sola vez por (servicio, región, endpoint); las invocaciones en
+    caliente reutilizan credenciales, endpoint y conexiones TLS abiertas.
+    """
+    key = (service_name, region_name, endpoint_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            client = boto3.client(
+                service_name,
+                region_name=region_name,
+                endpoint_url=endpoint_url,
+                config=build_config(service_name)
+            )
+            _clients[key] = client
+    return client
+
+def reset_clients():
+    """
+    Descarta los clientes cacheados (útil en benchmarks para simular un arranque en frío)
+    """
+    with _lock:
+        _clients.clear()
@@ -0,0 +1,157 @@
+import json
+import logging
+from datetime import datetime
+from prompt_builder import estimate_tokens
+
+logger = logging.getLogger()
+
+# Separador de cada documento dentro del texto de un lote
+DOCUMENT_HEADER = '### DOCUMENT {document_id}'
+
+def log_event(message, data=None, error=None):
+    log_entry = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'message': message,
+        'data': data,
+        'error': str(error) if error else None
+    }
+    logger.info(json.dumps(log_entry))
+
+def build_bulk_prompt(fields):
+    """
+    Prompt de sistema para extraer los campos de varios CVs en una sola llamada
+    """
+    example = ', '.join(f'"{field}": "extracted value"' for field in fields)
+    return f"""You are a form field extractor. The user message contains several documents, each one starting with a line "### DOCUMENT <id>".
+                For every document extract the following keys: {', '.join(fields)}.
+                Return only a JSON array with one object per document, in the same order, formatted exactly as:
+                [
+                    {{"document_id": "<id>", {example}}}
+                ]
+                Use an empty string for any value that is not present. Do not include any additional text or explanation."""
+
+def build_bulk_text(batch):
+    """Texto de usuario con los documentos del lote separados por su cabecera"""
+    return '\n\n'.join(
+        f"{DOCUMENT_HEADER.format(document_id=document_id)}\n{text}"
+        for document_id, text in batch
+    )
+
+def pack_documents(documents, max_input_tokens, output_tokens_per_document, max_output_tokens, max_documents):
+    """
+    Agrupa (document_id, texto) en lotes que caben en la ventana de contexto del modelo:
+    la suma de tokens de entrada no supera max_input_tokens y la respuesta esperada
+    (output_tokens_per_document por documento) no supera max_output_tokens.
+    Un documento que no cabe con otros va solo en su lote.
+    """
+    max_by_output = max(1, max_output_tokens // max(output_tokens_per_document, 1))
+    max_per_batch = max(1, min(max_documents, max_by_output))
+
+    batches = []
+    batch = []
+    batch_tokens = 0
+    for document_id, text in documents:
+        tokens = estimate_tokens(DOCUMENT_HEADER.format(document_id=document_id)) + estimate_tokens(text)
+        if batch and (batch_tokens + tokens > max_input_tokens or len(batch) >= max_per_batch):
+            batches.append(batch)
+            batch = []
+            batch_tokens = 0
+        batch.append((document_id, text))
+        batch_tokens += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+def iter_array_objects(text):
+    """
+    Objetos JSON completos del primer array del texto. Un elemento mal formado se
+    salta hasta el siguiente '{' y, si la respuesta se cortó (límite de tokens),
+    se devuelven los objetos anteriores al corte.
+    """
+    start = text.find('[')
+    if start == -1:
+        return
+    decoder = json.JSONDecoder()
+    position = start + 1
+    while position < len(text):
+        char = text[position]
+        if char in ' \t\r\n,':
+            position += 1
+            continue
+        if char == ']':
+            return
+        try:
+            item, position = decoder.raw_decode(text, position)
+        except ValueError:
+            position = text.find('{', position + 1)
+            if position == -1:
+                return
+            continue
+        yield item
+
+def parse_bulk_response(response_text, document_ids, fields):
+    """
+    Separa la respuesta del lote en un extracted_info por documento.
+    Devuelve (resultados por document_id, ids sin resultado válido).
+    """
+    expected = set(document_ids)
+    results = {}
+    for item in iter_array_objects(response_text.replace('```json', '').replace('```', '')):
+        if not isinstance(item, dict):
+            continue
+        document_id = str(item.get('document_id', ''))
+        if document_id not in expected or document_id in results:
+            continue
+        results[document_id] = {
+            field: item[field] if isinstance(item.get(field), str) else ''
+            for field in fields
+        }
+    failed = [document_id for document_id in document_ids if document_id not in results]
+    return results, failed
+
+def extract_bulk(documents, invoke, fields, max_input_tokens, output_tokens_per_document,
+                 max_output_tokens, max_documents, max_retries=2):
+    """
+    Extrae los campos de muchos documentos con pocas llamadas al modelo.
+    invoke(system_prompt, texto, max_new_tokens) devuelve el texto de la respuesta.
+    Solo se reintentan los documentos que faltan o no se pudieron parsear, en lotes
+    cada vez más pequeños. Devuelve (resultados por document_id, ids fallidos).
+    """
+    system_prompt = build_bulk_prompt(fields)
+    texts = dict(documents)
+    pending = [document_id for document_id, _ in documents]
+    results = {}
+
+    for attempt in range(max_retries + 1):
+        if not pending:
+            break
+        batch_limit = max(1, max_documents >> attempt)
+        batches = pack_documents(
+            [(document_id, texts[document_id]) for document_id in pending],
+            max_input_tokens, output_tokens_per_document, max_output_tokens, batch_limit
+        )
+        failed = []
+        for batch in batches:
+            document_ids = [document_id for document_id, _ in batch]
+            max_new_tokens = min(max_output_tokens, output_tokens_per_document * len(batch))
+            try:
+                response_text = invoke(system_prompt, build_bulk_text(batch), max_new_tokens)
+                batch_results, batch_failed = parse_bulk_response(response_text, document_ids, fields)
+            except Exception as e:
+                log_event('Bulk extraction batch failed', {
+                    'attempt': attempt,
+                    'documents': len(batch)
+                }, error=e)
+                batch_results, batch_failed = {}, document_ids
+            results.update(batch_results)
+            failed.extend(batch_failed)
+
+        log_event('Bulk extraction attempt finished', {
+            'attempt': attempt,
+            'batches': len(batches),
+            'extracted': len(pending) - len(failed),
+            'failed': len(failed)
+        })
+        pending = failed
+
+    return results, pending
@@ -0,0 +1,161 @@
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from botocore.exceptions import ClientError, BotoCoreError
+
+logger = logging.getLogger()
+
+def log_event(message, data=None, error=None):
+    log_entry = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'message': message,
+        'data': data,
+        'error': str(error) if error else None
+    }
+    logger.info(json.dumps(log_entry))
+
+def document_hash(document_bytes):
+    """SHA-256 del documento decodificado, clave del caché por contenido"""
+    return hashlib.sha256(document_bytes).hexdigest()
+
+class ExtractionCache:
+    """
+    Caché de extracciones por contenido con dos niveles:
+    un LRU en memoria del contenedor y un nivel persistente en S3.
+    La versión (prompt + esquema) forma parte de la clave, así que al
+    cambiar el prompt o los campos las entradas antiguas dejan de usarse.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, version, ttl_seconds, max_entries):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/')
+        self.version = version
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _s3_key(self, doc_hash):
+        return f"{self.prefix}/{self.version}/{doc_hash}.json"
+
+    def _expired(self, entry):
+        return time.time() - entry['stored_at'] > self.ttl_seconds
+
+    def get(self, doc_hash):
+        """
+        Devuelve el valor cacheado o None. Un acierto en S3 se promueve al LRU.
+        """
+        with self._lock:
+            entry = self._entries.get(doc_hash)
+            if entry is not None:
+                if not self._expired(entry):
+                    self._entries.move_to_end(doc_hash)
+                    return entry['value']
+                del self._entries[doc_hash]
+
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._s3_key(doc_hash))
+            entry = json.loads(response['Body'].read().decode('utf-8'))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                log_event('Error reading extraction cache', error=e)
+            return None
+        except (BotoCoreError, ValueError) as e:
+            log_event('Error reading extraction cache', error=e)
+            return None
+
+        if self._expired(entry):
+            return None
+
+        self._remember(doc_hash, entry)
+        return entry['value']
+
+    def put(self, doc_hash, value):
+        """
+        Guarda el valor en ambos niveles. Un fallo de S3 no afecta a la respuesta.
+        """
+        entry = {'stored_at': time.time(), 'version': self.version, 'value': value}
+        self._remember(doc_hash, entry)
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(doc_hash),
+                Body=json.dumps(entry)
+            )
+        except (ClientError, BotoCoreError) as e:
+            log_event('Error writing extraction cache', error=e)
+
+    def invalidate(self, doc_hash):
+        """Elimina la entrada de ambos niveles"""
+        with self._lock:
+            self._entries.pop(doc_hash, None)
+        try:
+            self.s3.delete_object(Bucket=self.bucket, Key=self._s3_key(doc_hash))
+        except (ClientError, BotoCoreError) as e:
+            log_event('Error invalidating extraction cache', error=e)
+
+    def _remember(self, doc_hash, entry):
+        with self._lock:
+            self._entries[doc_hash] = entry
+            self._entries.move_to_end(doc_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+class OcrResultStore:
+    """
+    Almacén persistente de resultados de OCR (bloques de Textract) comprimidos
+    con gzip y guardados en S3 por hash del documento y modo de OCR.
+    Es independiente de la versión del prompt: al cambiar el prompt o el esquema
+    se puede volver a extraer con Bedrock sin volver a pagar Textract.
+    """
+
+    def __init__(self, s3_client, bucket, prefix, ocr_mode):
+        self.s3 = s3_client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip('/')
+        self.ocr_mode = ocr_mode
+
+    def _s3_key(self, doc_hash):
+        return f"{self.prefix}/{self.ocr_mode}/{doc_hash}.json.gz"
+
+    def get(self, doc_hash):
+        """
+        Devuelve (textract_response, extraction_path) o None si no hay resultado guardado
+        """
+        try:
+            response = self.s3.get_object(Bucket=self.bucket, Key=self._s3_key(doc_hash))
+            entry = json.loads(gzip.decompress(response['Body'].read()).decode('utf-8'))
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('NoSuchKey', '404'):
+                log_event('Error reading OCR result', error=e)
+            return None
+        except (BotoCoreError, ValueError, OSError) as e:
+            log_event('Error reading OCR result', error=e)
+            return None
+
+        return {'Blocks': entry['blocks']}, entry['extraction_path']
+
+    def put(self, doc_hash, textract_response, extraction_path):
+        """Guarda los bloques comprimidos. Un fallo de S3 no afecta a la respuesta."""
+        entry = {
+            'blocks': textract_response['Blocks'],
+            'extraction_path': extraction_path,
+            'ocr_mode': self.ocr_mode,
+            'stored_at': time.time()
+        }
+        try:
+            self.s3.put_object(
+                Bucket=self.bucket,
+                Key=self._s3_key(doc_hash),
+                Body=gzip.compress(json.dumps(entry).encode('utf-8')),
+                ContentEncoding='gzip',
+                ContentType='application/json'
+            )
+        except (ClientError, BotoCoreError) as e:
+            log_event('Error writing OCR result', error=e)
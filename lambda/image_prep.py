@@ -0,0 +1,106 @@
+import os
+import itertools
+from io import BytesIO
+
+# Límite de Textract síncrono (detect_document_text) para un documento en bytes
+TEXTRACT_SYNC_MAX_BYTES = int(os.environ.get('TEXTRACT_SYNC_MAX_BYTES', str(10 * 1024 * 1024)))
+# Textract rechaza imágenes con algún lado mayor que esto
+TEXTRACT_MAX_DIMENSION = 10000
+
+# Alto objetivo de una página (~A4 a 200 dpi): más resolución no mejora el OCR de
+# un CV y solo engorda el payload. Si no cabe se reduce por pasos hasta el mínimo,
+# ~A4 a 150 dpi, donde un texto de 8 pt mide unos 15 px, el mínimo que lee Textract.
+IMAGE_TARGET_HEIGHT = int(os.environ.get('IMAGE_TARGET_HEIGHT', '2339'))
+IMAGE_MIN_HEIGHT = int(os.environ.get('IMAGE_MIN_HEIGHT', '1754'))
+IMAGE_DOWNSCALE_STEP = 0.8
+IMAGE_GRAYSCALE = os.environ.get('IMAGE_GRAYSCALE', 'true').lower() == 'true'
+
+# Codificaciones candidatas: se envía la más pequeña. PNG sin pérdida gana en páginas
+# limpias; en escaneos con ruido JPEG ocupa una fracción y se codifica ~30 veces más rápido.
+# optimize=True en PNG ahorra ~3% a cambio de ~6 veces más CPU, así que no se usa.
+IMAGE_ENCODINGS = tuple(os.environ.get('IMAGE_ENCODINGS', 'png,jpeg').split(','))
+IMAGE_JPEG_QUALITY = int(os.environ.get('IMAGE_JPEG_QUALITY', '85'))
+# Entropía del histograma (bits) por encima de la cual no se prueba PNG: una página
+# limpia ronda 1 bit, un escaneo o una foto más de 5, y ahí el PNG nunca gana
+IMAGE_PNG_MAX_ENTROPY = float(os.environ.get('IMAGE_PNG_MAX_ENTROPY', '3.0'))
+
+# Parámetros que cambian la imagen que llega a Textract: forman parte de la clave del OCR guardado
+IMAGE_PREP_MODE = (
+    f"{'gray' if IMAGE_GRAYSCALE else 'color'}-h{IMAGE_TARGET_HEIGHT}-{IMAGE_MIN_HEIGHT}"
+    f"-{'+'.join(IMAGE_ENCODINGS)}-q{IMAGE_JPEG_QUALITY}-e{IMAGE_PNG_MAX_ENTROPY:g}"
+    f"-{TEXTRACT_SYNC_MAX_BYTES}b"
+)
+
+def encode_image(image, encoding, jpeg_quality=IMAGE_JPEG_QUALITY):
+    buffer = BytesIO()
+    if encoding == 'png':
+        image.save(buffer, format='PNG')
+    elif encoding == 'jpeg':
+        image.save(buffer, format='JPEG', quality=jpeg_quality)
+    else:
+        raise ValueError(f"Unsupported image encoding: {encoding}")
+    return buffer.getvalue()
+
+def resize_to_height(image, height):
+    """Reduce la imagen a height píxeles de alto (sin ampliar) y dentro del límite de Textract"""
+    from PIL import Image
+
+    scale = min(1.0, height / image.height, TEXTRACT_MAX_DIMENSION / max(image.size))
+    if scale >= 1.0:
+        return image
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    # reducing_gap reduce primero por un factor entero (rápido) y termina con LANCZOS
+    return image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+def prepare_image(image, max_bytes=TEXTRACT_SYNC_MAX_BYTES, target_height=IMAGE_TARGET_HEIGHT,
+                  min_height=IMAGE_MIN_HEIGHT, grayscale=IMAGE_GRAYSCALE, encodings=IMAGE_ENCODINGS):
+    """
+    Prepara una página para Textract síncrono: escala de grises, alto objetivo y la
+    codificación más pequeña de las candidatas. Si no cabe en max_bytes se reduce por
+    pasos hasta min_height. Devuelve los bytes, o None si ni así cabe.
+    """
+    if grayscale:
+        image = image.convert('L')
+    elif image.mode not in ('L', 'RGB'):
+        image = image.convert('RGB')
+
+    height = min(image.height, target_height)
+    resized = resize_to_height(image, height)
+    if len(encodings) > 1 and 'png' in encodings and resized.entropy() > IMAGE_PNG_MAX_ENTROPY:
+        # Con ruido el PNG es varias veces mayor y es la codificación más lenta
+        encodings = tuple(encoding for encoding in encodings if encoding != 'png')
+    while True:
+        payload = min((encode_image(resized, encoding) for encoding in encodings), key=len)
+        if len(payload) <= max_bytes:
+            return payload
+        if height <= min_height:
+            return None
+        height = max(min_height, int(height * IMAGE_DOWNSCALE_STEP))
+        resized = resize_to_height(image, height)
+
+def prepare_image_bytes(document, **kwargs):
+    """prepare_image para una imagen subida (PNG, JPEG o TIFF); solo la primera página de un TIFF"""
+    from PIL import Image
+
+    with Image.open(BytesIO(document)) as image:
+        return prepare_image(image, **kwargs)
+
+def count_image_frames(document):
+    """Número de páginas de una imagen subida (un TIFF de escáner puede traer varias)"""
+    from PIL import Image
+
+    with Image.open(BytesIO(document)) as image:
+        return getattr(image, 'n_frames', 1)
+
+def prepare_image_frames(document, max_pages, **kwargs):
+    """
+    prepare_image para cada una de las primeras max_pages páginas de un TIFF multipágina
+    (None para las que no caben en el límite síncrono)
+    """
+    from PIL import Image, ImageSequence
+
+    with Image.open(BytesIO(document)) as image:
+        return [
+            prepare_image(frame, **kwargs)
+            for frame in itertools.islice(ImageSequence.Iterator(image), max_pages)
+        ]
@@ -0,0 +1,109 @@
+import re
+import json
+
+# Pares "campo": "valor" ya cerrados dentro del objeto que se está recibiendo
+COMPLETED_FIELD_PATTERN = re.compile(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def chunk_text(event):
+    """
+    Extrae el texto de un evento de invoke_model_with_response_stream.
+    Soporta el formato de Nova (contentBlockDelta) y el de Claude (content_block_delta).
+    """
+    chunk = event.get('chunk')
+    if not chunk:
+        return ''
+    payload = json.loads(chunk['bytes'])
+
+    if 'contentBlockDelta' in payload:
+        return payload['contentBlockDelta'].get('delta', {}).get('text', '')
+    if payload.get('type') == 'content_block_delta':
+        return payload.get('delta', {}).get('text', '')
+    return ''
+
+class StreamingJsonObject:
+    """
+    Parser incremental del primer objeto JSON de una respuesta en streaming.
+    Ignora el texto previo (p. ej. marcadores ```json), sigue la profundidad de
+    llaves respetando cadenas y escapes, y avisa en cuanto se cierra el objeto.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.start = None
+        self.end = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._scanned = 0
+
+    @property
+    def complete(self):
+        return self.end is not None
+
+    def feed(self, text):
+        """Añade texto; devuelve True cuando el objeto JSON está completo"""
+        if self.complete:
+            return True
+
+        self.buffer += text
+        for position in range(self._scanned, len(self.buffer)):
+            char = self.buffer[position]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"' and self.start is not None:
+                self._in_string = True
+            elif char == '{':
+                if self.start is None:
+                    self.start = position
+                self._depth += 1
+            elif char == '}' and self.start is not None:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.end = position
+                    break
+        self._scanned = len(self.buffer)
+        return self.complete
+
+    def partial_fields(self):
+        """Campos de texto ya cerrados, aunque el objeto todavía no haya terminado"""
+        if self.start is None:
+            return {}
+        text = self.buffer[self.start:self.end + 1 if self.complete else None]
+        return {
+            key: json.loads(f'"{value}"')
+            for key, value in COMPLETED_FIELD_PATTERN.findall(text)
+        }
+
+    def result(self):
+        """Objeto JSON completo parseado"""
+        if not self.complete:
+            raise ValueError("Incomplete JSON object in streamed response")
+        return json.loads(self.buffer[self.start:self.end + 1])
+
+def read_json_text(event_stream, on_partial=None):
+    """
+    Lee eventos del stream hasta que se cierra el objeto JSON esperado y deja de leer.
+    on_partial(campos) se llama cada vez que aparece un campo nuevo completo.
+    Devuelve el texto del objeto, o todo el texto recibido si el objeto no llegó a cerrarse.
+    """
+    parser = StreamingJsonObject()
+    reported = 0
+
+    for event in event_stream:
+        parser.feed(chunk_text(event))
+        if on_partial:
+            fields = parser.partial_fields()
+            if len(fields) > reported:
+                reported = len(fields)
+                on_partial(fields)
+        if parser.complete:
+            break
+
+    if parser.complete:
+        return parser.buffer[parser.start:parser.end + 1]
+    return parser.buffer
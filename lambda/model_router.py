@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import bisect
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+from rate_limiter import ThrottledError
+
+logger = logging.getLogger()
+
+# Cuantil de latencia de la ruta principal a partir del cual se lanza la petición de cobertura
+HEDGE_QUANTILE = float(os.environ.get('MODEL_HEDGE_QUANTILE', '0.95'))
+# Espera antes de cubrir mientras una ruta no tiene muestras suficientes
+HEDGE_DEFAULT_DELAY = float(os.environ.get('MODEL_HEDGE_DEFAULT_DELAY', '5.0'))
+HEDGE_MIN_DELAY = float(os.environ.get('MODEL_HEDGE_MIN_DELAY', '0.5'))
+HEDGING_ENABLED = os.environ.get('MODEL_HEDGING_ENABLED', 'true').lower() == 'true'
+MIN_SAMPLES = int(os.environ.get('MODEL_ROUTE_MIN_SAMPLES', '5'))
+
+# Fallos seguidos tras los que una ruta se aparta durante ROUTE_COOLDOWN segundos
+FAILURE_THRESHOLD = int(os.environ.get('MODEL_ROUTE_FAILURE_THRESHOLD', '3'))
+ROUTE_COOLDOWN = float(os.environ.get('MODEL_ROUTE_COOLDOWN', '30'))
+
+# Límites de los buckets del histograma: de 50 ms a ~100 s en escala logarítmica
+HISTOGRAM_BOUNDS = [0.05 * 1.25 ** i for i in range(35)]
+# Al llegar a este número de muestras se dividen los contadores a la mitad (peso a lo reciente)
+HISTOGRAM_MAX_SAMPLES = 1000
+
+# Hilos compartidos por todas las invocaciones: la petición perdedora termina en segundo plano
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('MODEL_ROUTER_WORKERS', '8')))
+
+def log_event(message, data=None, error=None):
+    log_entry = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'message': message,
+        'data': data,
+        'error': str(error) if error else None
+    }
+    logger.info(json.dumps(log_entry))
+
+class LatencyHistogram:
+    """
+    Histograma de latencias con buckets logarítmicos fijos. Ocupa lo mismo
+    tenga las muestras que tenga y va olvidando las antiguas.
+    """
+
+    def __init__(self, bounds=HISTOGRAM_BOUNDS, max_samples=HISTOGRAM_MAX_SAMPLES):
+        self.bounds = bounds
+        self.max_samples = max_samples
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+            self.count += 1
+            if self.count >= self.max_samples:
+                self.counts = [c // 2 for c in self.counts]
+                self.count = sum(self.counts)
+
+    def quantile(self, q):
+        """Límite superior del bucket que contiene el cuantil q (None si no hay muestras)"""
+        with self._lock:
+            if not self.count:
+                return None
+            target = q * self.count
+            seen = 0
+            for index, count in enumerate(self.counts):
+                seen += count
+                if seen >= target and count:
+                    return self.bounds[min(index, len(self.bounds) - 1)]
+            return self.bounds[-1]
+
+class ModelRoute:
+    """
+    Candidato para la extracción: modelo (o perfil de inferencia), región del
+    endpoint de bedrock-runtime, formato del cuerpo de la petición (nova o claude)
+    y máximo de tokens de salida que admite el modelo
+    """
+
+    def __init__(self, name, model_id, region, model_format='nova', max_tokens=None):
+        self.name = name
+        self.model_id = model_id
+        self.region = region
+        self.model_format = model_format
+        self.max_tokens = max_tokens
+        self.histograms = {}
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    def histogram(self, kind):
+        with self._lock:
+            return self.histograms.setdefault(kind, LatencyHistogram())
+
+    def healthy(self):
+        return time.monotonic() >= self.unhealthy_until
+
+    def record_success(self, kind, seconds):
+        self.histogram(kind).record(seconds)
+        with self._lock:
+            self.consecutive_failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= FAILURE_THRESHOLD:
+                self.unhealthy_until = time.monotonic() + ROUTE_COOLDOWN
+
+    def stats(self, kind):
+        histogram = self.histogram(kind)
+        return {
+            'route': self.name,
+            'samples': histogram.count,
+            'p50': histogram.quantile(0.5),
+            'p95': histogram.quantile(0.95),
+            'healthy': self.healthy()
+        }
+
+class ModelRouter:
+    """
+    Enruta cada invocación al candidato sano más rápido (p50 por tipo de llamada).
+    Si no responde antes de su p95 se lanza una petición de cobertura al siguiente
+    candidato y gana la primera respuesta; si falla se pasa al siguiente (fallback).
+    """
+
+    def __init__(self, routes, hedging=HEDGING_ENABLED, hedge_quantile=HEDGE_QUANTILE,
+                 default_delay=HEDGE_DEFAULT_DELAY, min_delay=HEDGE_MIN_DELAY):
+        self.routes = routes
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+
+    def ranked_routes(self, kind):
+        """Rutas sanas con muestras por p50, luego las que no tienen muestras (en orden de configuración) y al final las apartadas"""
+        def score(indexed):
+            index, route = indexed
+            histogram = route.histogram(kind)
+            p50 = histogram.quantile(0.5) if histogram.count >= MIN_SAMPLES else None
+            return (not route.healthy(), p50 is None, p50 or 0.0, index)
+        return [route for _, route in sorted(enumerate(self.routes), key=score)]
+
+    def hedge_delay(self, route, kind):
+        histogram = route.histogram(kind)
+        if histogram.count < MIN_SAMPLES:
+            return self.default_delay
+        return max(self.min_delay, histogram.quantile(self.hedge_quantile))
+
+    def _timed(self, route, kind, attempt):
+        start = time.monotonic()
+        try:
+            result = attempt(route)
+        except Exception:
+            route.record_failure()
+            raise
+        route.record_success(kind, time.monotonic() - start)
+        return result
+
+    def run(self, kind, attempt, discard=None, hedging=None):
+        """
+        Ejecuta attempt(route) con cobertura y fallback. kind separa los histogramas
+        (p. ej. 'invoke' y 'stream'); discard(resultado) libera la respuesta perdedora.
+        hedging=False desactiva la cobertura para esta llamada (el fallback se mantiene).
+        Devuelve (resultado, ruta ganadora).
+        """
+        hedging = self.hedging if hedging is None else hedging
+        routes = self.ranked_routes(kind)
+        pending = {}
+        errors = []
+        next_route = 0
+        hedged = False
+
+        def launch():
+            nonlocal next_route
+            route = routes[next_route]
+            next_route += 1
+            pending[_executor.submit(self._timed, route, kind, attempt)] = route
+            return route
+
+        primary = launch()
+        deadline = time.monotonic() + self.hedge_delay(primary, kind)
+
+        while pending:
+            timeout = None
+            if hedging and not hedged and next_route < len(routes):
+                timeout = max(0.0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+
+            if not done:
+                # La ruta principal no respondió a tiempo: petición de cobertura
+                log_event('Hedging model request', {
+                    'kind': kind,
+                    'slow_route': primary.name,
+                    'hedge_route': routes[next_route].name
+                })
+                hedged = True
+                launch()
+                continue
+
+            for future in done:
+                route = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    errors.append(e)
+                    log_event('Model route failed', {'route': route.name, 'kind': kind}, error=e)
+                    continue
+
+                for loser in pending:
+                    if not loser.cancel() and discard:
+                        loser.add_done_callback(lambda f: f.exception() is None and discard(f.result()))
+                return result, route
+
+            # Todas las terminadas fallaron y no queda ninguna en curso: siguiente ruta
+            if not pending and next_route < len(routes):
+                primary = launch()
+                deadline = time.monotonic() + self.hedge_delay(primary, kind)
+
+        throttled = [e for e in errors if isinstance(e, ThrottledError)]
+        raise throttled[-1] if throttled else errors[-1]
@@ -0,0 +1,152 @@
+import re
+import unicodedata
+from prompt_builder import EMAIL_PATTERN, PHONE_PATTERN, ZIP_PATTERN, ADDRESS_PATTERN, MIN_PHONE_DIGITS
+
+# DNI (8 dígitos + letra de control), NIE (X/Y/Z + 7 dígitos + letra) y pasaporte español
+DNI_PATTERN = re.compile(r'\b(\d{8})[\s-]?([A-Z])\b')
+NIE_PATTERN = re.compile(r'\b([XYZ])[\s-]?(\d{7})[\s-]?([A-Z])\b')
+PASSPORT_PATTERN = re.compile(r'\b(?:pasaporte|passport)\b\D{0,20}([A-Z]{3}\d{6})\b', re.IGNORECASE)
+DNI_LETTERS = 'TRWAGMYFPDXBNJZSQVHLCKE'
+
+FULLNAME_PATTERN = re.compile(r"^[A-ZÁÉÍÓÚÑ][\w'ÁÉÍÓÚÑáéíóúñ-]+(?:\s+[A-ZÁÉÍÓÚÑ][\w'ÁÉÍÓÚÑáéíóúñ-]+){1,3}$")
+ADDRESS_LABEL_PATTERN = re.compile(r'^\s*(?:address|direcci[oó]n|domicilio)\s*:\s*', re.IGNORECASE)
+NON_NAME_HEADINGS = {'curriculum vitae', 'curriculum', 'resume', 'cv', 'hoja de vida', 'datos personales'}
+
+# Confianza de cada regla: los patrones inequívocos quedan por encima del umbral
+# por defecto y los heurísticos (nombre, dirección) por debajo, salvo que otro
+# dato del CV los corrobore (el nombre en el email, la dirección junto al código postal)
+CONFIDENCE_UNIQUE = 0.95
+CONFIDENCE_AMBIGUOUS = 0.6
+CONFIDENCE_HEURISTIC = 0.85
+CONFIDENCE_CORROBORATED = 0.95
+
+# Versión de las reglas: forma parte de EXTRACTION_VERSION en app.py. Se sube al cambiar
+# patrones o confianzas, para que el caché no sirva extracciones de las reglas anteriores
+RULES_VERSION = '2'
+
+def _distinct(values):
+    return list(dict.fromkeys(values))
+
+def _unique_or_first(values):
+    """Valor y confianza: un único candidato distinto es fiable; varios, ambiguo"""
+    values = _distinct(values)
+    if not values:
+        return '', 0.0
+    return values[0], CONFIDENCE_UNIQUE if len(values) == 1 else CONFIDENCE_AMBIGUOUS
+
+def _fold(text):
+    """Minúsculas y sin tildes, para comparar nombres con la parte local del email"""
+    return ''.join(
+        char for char in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(char)
+    )
+
+def _digit_count(text):
+    return sum(char.isdigit() for char in text)
+
+def _phone_matches(line):
+    # Filtro barato antes del patrón: una línea con menos de 9 dígitos no tiene teléfono
+    if _digit_count(line) < MIN_PHONE_DIGITS:
+        return []
+    return [match for match in PHONE_PATTERN.findall(line) if _digit_count(match) >= MIN_PHONE_DIGITS]
+
+def extract_email(text, lines):
+    return _unique_or_first(
+        match.lower() for line in lines if '@' in line for match in EMAIL_PATTERN.findall(line)
+    )
+
+def extract_phone(text, lines):
+    phones = [' '.join(match.split()) for line in lines for match in _phone_matches(line)]
+    # El mismo número escrito con otro formato no es ambigüedad
+    by_digits = {}
+    for phone in phones:
+        by_digits.setdefault(''.join(char for char in phone if char.isdigit())[-9:], phone)
+    return _unique_or_first(by_digits.values())
+
+def extract_zip_code(text, lines):
+    # Se ignoran las líneas de teléfono, donde cualquier grupo de 5 dígitos es falso positivo
+    candidates = [
+        match for line in lines
+        if not _phone_matches(line)
+        for match in ZIP_PATTERN.findall(line)
+    ]
+    return _unique_or_first(candidates)
+
+def extract_document_number(text, lines):
+    numbers = []
+    for digits, letter in DNI_PATTERN.findall(text):
+        if DNI_LETTERS[int(digits) % 23] == letter:
+            numbers.append(digits + letter)
+    for prefix, digits, letter in NIE_PATTERN.findall(text):
+        if DNI_LETTERS[int(str('XYZ'.index(prefix)) + digits) % 23] == letter:
+            numbers.append(prefix + digits + letter)
+    numbers.extend(match.upper() for match in PASSPORT_PATTERN.findall(text))
+    return _unique_or_first(numbers)
+
+def extract_fullname(text, lines):
+    """
+    Primera línea de la cabecera con forma de nombre propio (2-4 palabras capitalizadas).
+    Es fiable si alguna de sus palabras aparece en la parte local de un email del CV.
+    """
+    for line in lines[:3]:
+        candidate = line.strip()
+        if candidate.lower() in NON_NAME_HEADINGS:
+            continue
+        if FULLNAME_PATTERN.match(candidate):
+            local_parts = [
+                _fold(email.split('@')[0]) for line in lines if '@' in line for email in EMAIL_PATTERN.findall(line)
+            ]
+            words = [_fold(word) for word in candidate.split() if len(word) > 2]
+            if any(word in local_part for word in words for local_part in local_parts):
+                return candidate, CONFIDENCE_CORROBORATED
+            return candidate, CONFIDENCE_HEURISTIC
+        break
+    return '', 0.0
+
+def extract_address(text, lines):
+    """
+    Primera línea con una vía y un número (Calle Mayor 12, 5th Avenue 10...).
+    Es fiable si es la única candidata y va etiquetada o junto a la línea del código postal.
+    """
+    candidates = [
+        index for index, line in enumerate(lines)
+        if ADDRESS_PATTERN.search(line) and any(char.isdigit() for char in line) and '@' not in line
+    ]
+    if not candidates:
+        return '', 0.0
+    index = candidates[0]
+    line = lines[index]
+    confidence = CONFIDENCE_HEURISTIC
+    if len(candidates) == 1:
+        neighbours = lines[max(0, index - 1):index + 2]
+        if ADDRESS_LABEL_PATTERN.match(line) or any(
+            ZIP_PATTERN.search(neighbour) and not _phone_matches(neighbour) for neighbour in neighbours
+        ):
+            confidence = CONFIDENCE_CORROBORATED
+    return ADDRESS_LABEL_PATTERN.sub('', line).strip(), confidence
+
+FIELD_EXTRACTORS = {
+    'email': extract_email,
+    'phone_number': extract_phone,
+    'zip_code': extract_zip_code,
+    'document_number': extract_document_number,
+    'fullname': extract_fullname,
+    'address': extract_address,
+}
+
+def pre_extract(textract_response, fields):
+    """
+    Extrae localmente los campos pedidos a partir de los bloques LINE.
+    Devuelve (valores, confianzas); los campos sin extractor quedan vacíos con confianza 0.
+    """
+    lines = [
+        block['Text'].strip() for block in textract_response['Blocks']
+        if block['BlockType'] == 'LINE' and block.get('Text', '').strip()
+    ]
+    text = '\n'.join(lines)
+
+    values = {}
+    confidences = {}
+    for field in fields:
+        extractor = FIELD_EXTRACTORS.get(field)
+        values[field], confidences[field] = extractor(text, lines) if extractor else ('', 0.0)
+    return values, confidences
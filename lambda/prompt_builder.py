@@ -0,0 +1,118 @@
+import re
+
+# Patrones de los campos de contacto que buscamos en el CV
+EMAIL_PATTERN = re.compile(r'[\w.+-]+@[\w-]+(?:\.[\w-]+)+')
+PHONE_PATTERN = re.compile(r'(?:\+\d{1,3}[\s.-]?)?(?:\(?\d{2,4}\)?[\s.-]?){2,4}\d{2,4}')
+ZIP_PATTERN = re.compile(r'\b(?:\d{5}(?:-\d{4})?|[A-Z]{1,2}\d[A-Z\d]?\s?\d[A-Z]{2})\b')
+ADDRESS_PATTERN = re.compile(
+    r'\b(?:calle|c/|avda\.?|avenida|plaza|paseo|street|st\.|road|rd\.|avenue|ave\.|address|direcci[oó]n)\b',
+    re.IGNORECASE
+)
+
+MIN_PHONE_DIGITS = 9
+
+def has_phone(text):
+    """Teléfono con al menos 9 dígitos (evita confundir rangos de fechas como 2015-2019)"""
+    return any(
+        sum(char.isdigit() for char in match) >= MIN_PHONE_DIGITS
+        for match in PHONE_PATTERN.findall(text)
+    )
+
+# Pesos de la puntuación de cada línea
+PATTERN_WEIGHTS = (
+    (EMAIL_PATTERN.search, 10.0),
+    (has_phone, 8.0),
+    (ZIP_PATTERN.search, 6.0),
+    (ADDRESS_PATTERN.search, 6.0),
+)
+HEADER_WEIGHT = 5.0
+FIRST_PAGE_WEIGHT = 1.0
+PROXIMITY_WEIGHT = 3.0
+PROXIMITY_WINDOW = 2
+
+def estimate_tokens(text, chars_per_token=4):
+    """Estimación barata de tokens (~4 caracteres por token en Nova/Claude)"""
+    return len(text) // chars_per_token + 1
+
+def _line_position(block, index, page_sizes):
+    """
+    Posición vertical relativa de la línea en su página (0 arriba, 1 abajo).
+    Usa la geometría de Textract y, si no existe (capa de texto), el orden de la línea.
+    """
+    box = block.get('Geometry', {}).get('BoundingBox')
+    if box:
+        return box.get('Top', 0.0)
+    page_lines = page_sizes.get(block.get('Page', 1), 1)
+    return index / max(page_lines, 1)
+
+def score_lines(blocks, header_region=0.25):
+    """
+    Puntúa cada línea por su probabilidad de contener datos de contacto:
+    coincidencias de email/teléfono/código postal/dirección, cabecera de la
+    primera página y cercanía a líneas con coincidencias
+    """
+    page_sizes = {}
+    page_index = []
+    for block in blocks:
+        page = block.get('Page', 1)
+        page_index.append(page_sizes.get(page, 0))
+        page_sizes[page] = page_index[-1] + 1
+
+    scores = []
+    hits = []
+    for block, index in zip(blocks, page_index):
+        text = block['Text']
+        score = 0.0
+        hit = False
+        for matches, weight in PATTERN_WEIGHTS:
+            if matches(text):
+                score += weight
+                hit = True
+        page = block.get('Page', 1)
+        if page == 1:
+            score += FIRST_PAGE_WEIGHT
+            if _line_position(block, index, page_sizes) <= header_region:
+                score += HEADER_WEIGHT
+        scores.append(score)
+        hits.append(hit)
+
+    # Las líneas vecinas de una coincidencia suelen completar el dato (nombre, dirección partida)
+    for position, hit in enumerate(hits):
+        if not hit:
+            continue
+        for offset in range(1, PROXIMITY_WINDOW + 1):
+            bonus = PROXIMITY_WEIGHT / offset
+            for neighbour in (position - offset, position + offset):
+                if 0 <= neighbour < len(scores):
+                    scores[neighbour] += bonus
+
+    return scores
+
+def build_prompt_text(textract_response, token_budget, header_region=0.25):
+    """
+    Texto para Bedrock limitado a token_budget tokens: se eligen las líneas con
+    mayor puntuación y se devuelven en su orden original. Si todo el texto cabe
+    en el presupuesto se devuelve completo.
+    """
+    blocks = [
+        block for block in textract_response['Blocks']
+        if block['BlockType'] == 'LINE' and block.get('Text', '').strip()
+    ]
+    lines = [block['Text'].strip() for block in blocks]
+
+    if not token_budget or estimate_tokens('\n'.join(lines)) <= token_budget:
+        return '\n'.join(lines)
+
+    scores = score_lines(blocks, header_region)
+    ranked = sorted(range(len(lines)), key=lambda i: (-scores[i], i))
+
+    selected = set()
+    used = 0
+    for i in ranked:
+        cost = estimate_tokens(lines[i])
+        if used + cost > token_budget:
+            continue
+        selected.add(i)
+        used += cost
+
+    return '\n'.join(lines[i] for i in sorted(selected))
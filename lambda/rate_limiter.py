@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import random
+import logging
+import threading
+from datetime import datetime
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError
+
+logger = logging.getLogger()
+
+# Errores de cuota: se reduce el ritmo y se reintenta
+THROTTLING_ERROR_CODES = {
+    'ThrottlingException',
+    'ProvisionedThroughputExceededException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'LimitExceededException',
+    'SlowDown',
+}
+# Errores transitorios del servicio: se reintenta sin tocar el ritmo
+TRANSIENT_ERROR_CODES = {
+    'InternalServerError',
+    'InternalServerException',
+    'ServiceUnavailableException',
+    'ModelNotReadyException',
+}
+
+# Límite por servicio (peticiones/s por proceso) configurable por entorno
+RATE_LIMITS = {
+    'textract': float(os.environ.get('TEXTRACT_MAX_TPS', '10')),
+    'bedrock': float(os.environ.get('BEDROCK_MAX_TPS', '5')),
+}
+MIN_RATE = float(os.environ.get('RATE_LIMIT_MIN_TPS', '0.5'))
+MAX_ATTEMPTS = int(os.environ.get('RATE_LIMIT_MAX_ATTEMPTS', '5'))
+
+_limiters = {}
+_lock = threading.Lock()
+
+def log_event(message, data=None, error=None):
+    log_entry = {
+        'timestamp': datetime.utcnow().isoformat(),
+        'message': message,
+        'data': data,
+        'error': str(error) if error else None
+    }
+    logger.info(json.dumps(log_entry))
+
+def error_code(error):
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code')
+    return None
+
+def is_throttling_error(error):
+    return error_code(error) in THROTTLING_ERROR_CODES
+
+def is_transient_error(error):
+    return error_code(error) in TRANSIENT_ERROR_CODES or isinstance(error, BotoConnectionError)
+
+class ThrottledError(Exception):
+    """El servicio siguió limitando tras agotar los reintentos"""
+
+    def __init__(self, service, retry_after, cause):
+        super().__init__(f"{service} throttled after retries: {cause}")
+        self.service = service
+        self.retry_after = retry_after
+        self.cause = cause
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket con ritmo AIMD, compartido por todos los hilos del proceso.
+    Los éxitos suben el ritmo de forma aditiva (unas `increase` peticiones/s por
+    segundo de tráfico) hasta max_rate y el throttling lo multiplica por decrease,
+    como mucho una vez por `cooldown` segundos para que una ráfaga de rechazos
+    simultáneos no lo hunda de golpe.
+    """
+
+    def __init__(self, name, max_rate, min_rate=MIN_RATE, burst=1.0, increase=1.0, decrease=0.5, cooldown=1.0,
+                 max_attempts=MAX_ATTEMPTS, base_delay=0.2, max_delay=5.0):
+        self.name = name
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.burst = burst
+        self.increase = increase
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.throttled = 0
+        self._rate = max_rate
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._last_decrease = float('-inf')
+        self._lock = threading.Lock()
+
+    @property
+    def current_rate(self):
+        """Ritmo actual en peticiones/s"""
+        return self._rate
+
+    def configure(self, max_rate):
+        """Cambia el techo del ritmo (p. ej. al repartir una cuota entre procesos)"""
+        with self._lock:
+            self.max_rate = max_rate
+            self.min_rate = min(self.min_rate, max_rate)
+            self._rate = min(self._rate, max_rate)
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Espera a que haya un token con el ritmo actual. No se reservan tokens por
+        adelantado: si el ritmo baja mientras se espera, la espera se alarga.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_time = (1 - self._tokens) / self._rate
+            time.sleep(wait_time)
+
+    def on_success(self):
+        with self._lock:
+            self._rate = min(self.max_rate, self._rate + self.increase / self._rate)
+
+    def on_throttle(self):
+        with self._lock:
+            now = time.monotonic()
+            self.throttled += 1
+            if now - self._last_decrease < self.cooldown:
+                return
+            self._refill(now)
+            self._rate = max(self.min_rate, self._rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            self._last_decrease = now
+        log_event('Rate limiter backing off', {'limiter': self.name, 'rate': round(self._rate, 3)})
+
+    def backoff(self, attempt):
+        """Espera exponencial con jitter completo"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def call(self, function, *args, **kwargs):
+        """
+        Ejecuta function respetando el ritmo. Reintenta el throttling (bajando el
+        ritmo) y los errores transitorios; si el throttling persiste lanza ThrottledError.
+        """
+        for attempt in range(self.max_attempts):
+            self.acquire()
+            try:
+                result = function(*args, **kwargs)
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                if not throttled and not is_transient_error(e):
+                    raise
+                if throttled:
+                    self.on_throttle()
+                if attempt == self.max_attempts - 1:
+                    if throttled:
+                        raise ThrottledError(self.name, max(1, round(1.0 / self._rate)), e) from e
+                    raise
+                time.sleep(self.backoff(attempt))
+                continue
+            self.on_success()
+            return result
+
+class RateLimitedClient:
+    """
+    Envuelve un cliente de boto3 para que las operaciones indicadas (o todas si
+    methods es None) pasen por el limitador. El resto de atributos se delegan tal cual.
+    """
+
+    def __init__(self, client, limiter, methods=None):
+        self._client = client
+        self._limiter = limiter
+        self._methods = set(methods) if methods else None
+
+    @property
+    def limiter(self):
+        return self._limiter
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute) or name in ('get_paginator', 'generate_presigned_url'):
+            return attribute
+        if self._methods is not None and name not in self._methods:
+            return attribute
+
+        def call(*args, **kwargs):
+            return self._limiter.call(attribute, *args, **kwargs)
+        return call
+
+def get_limiter(name, max_rate=None):
+    """
+    Limitador compartido del proceso para un servicio (API, worker y backfill
+    usan el mismo objeto, también desde los hilos de las páginas de un PDF)
+    """
+    limiter = _limiters.get(name)
+    if limiter is not None:
+        return limiter
+    with _lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveRateLimiter(name, max_rate or RATE_LIMITS.get(name, 10.0))
+            _limiters[name] = limiter
+    return limiter
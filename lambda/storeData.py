@@ -1,27 +1,96 @@
+import os
 import json
-import boto3
+import time
 import pymongo
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from botocore.exceptions import ClientError
-from pymongo.errors import PyMongoError
+from botocore.exceptions import ClientError, BotoCoreError
+from pymongo import ReplaceOne
+from pymongo.errors import PyMongoError, BulkWriteError, OperationFailure, WriteError
+from aws_clients import get_client
+from tracing import span, traced_handler
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 # Configuración
-MONGO_URI = "tu_uri_de_documentdb"
+MONGO_URI = os.environ.get('MONGO_URI', "tu_uri_de_documentdb")
 DB_NAME = "candidates_db"
 COLLECTION_NAME = "cv_extractions"
 
-def get_mongo_client():
+# Pool de conexiones de DocumentDB reutilizado entre invocaciones del contenedor
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '10'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '1'))
+MONGO_MAX_IDLE_TIME_MS = int(os.environ.get('MONGO_MAX_IDLE_TIME_MS', '60000'))
+# Segundos sin usar la conexión tras los que se hace ping antes de reutilizarla
+# (cubre el caso de un contenedor congelado y descongelado por Lambda)
+MONGO_HEALTHCHECK_INTERVAL = int(os.environ.get('MONGO_HEALTHCHECK_INTERVAL', '30'))
+
+# Escritura en lote: un único bulk_write desordenado por lote de SQS
+BULK_WRITE_ENABLED = os.environ.get('BULK_WRITE_ENABLED', 'true').lower() == 'true'
+
+# Descargas concurrentes de S3 dentro de un lote de SQS
+S3_FETCH_CONCURRENCY = int(os.environ.get('S3_FETCH_CONCURRENCY', '16'))
+
+# Cola de mensajes fallidos para errores permanentes (no tiene sentido reintentarlos)
+DLQ_URL = os.environ.get('DLQ_URL', '')
+
+# Códigos de error de S3 que no se arreglan reintentando
+PERMANENT_S3_ERROR_CODES = {'NoSuchKey', 'NoSuchBucket', 'AccessDenied', 'InvalidObjectState'}
+# Duplicate key, documento inválido, BadValue
+PERMANENT_MONGO_ERROR_CODES = {11000, 121, 2}
+
+# Clientes compartidos entre invocaciones del mismo contenedor
+s3 = get_client('s3')
+sqs = get_client('sqs')
+
+_mongo_client = None
+_mongo_last_used = 0.0
+
+def create_mongo_client():
     return pymongo.MongoClient(
         MONGO_URI,
         serverSelectionTimeoutMS=5000,  # 5 segundos de timeout
         connectTimeoutMS=5000,
+        maxPoolSize=MONGO_MAX_POOL_SIZE,
+        minPoolSize=MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=MONGO_MAX_IDLE_TIME_MS,
         retryWrites=False  # Importante para DocumentDB
     )
 
+def reset_mongo_client():
+    """Cierra y descarta el cliente cacheado; el siguiente uso abre uno nuevo"""
+    global _mongo_client
+    if _mongo_client is not None:
+        try:
+            _mongo_client.close()
+        except Exception as e:
+            log_event('Error closing MongoDB connection', error=e)
+    _mongo_client = None
+
+def get_mongo_client():
+    """
+    Devuelve el cliente de DocumentDB del contenedor, creándolo la primera vez.
+    Si lleva más de MONGO_HEALTHCHECK_INTERVAL segundos sin usarse se comprueba
+    con un ping y, si la conexión quedó obsoleta, se reconecta.
+    """
+    global _mongo_client, _mongo_last_used
+    now = time.monotonic()
+
+    if _mongo_client is not None and now - _mongo_last_used > MONGO_HEALTHCHECK_INTERVAL:
+        try:
+            _mongo_client.admin.command('ping')
+        except PyMongoError as e:
+            log_event('Stale MongoDB connection, reconnecting', error=e)
+            reset_mongo_client()
+
+    if _mongo_client is None:
+        _mongo_client = create_mongo_client()
+
+    _mongo_last_used = now
+    return _mongo_client
+
 def log_event(message, data=None, error=None):
     log_entry = {
         'timestamp': datetime.utcnow().isoformat(),
@@ -38,11 +107,177 @@ def validate_message(message_body):
         if field not in message_body:
             raise ValueError(f"Missing required field: {field}")
 
+def build_document(message_body, cv_data, processing_metadata):
+    """
+    Documento de DocumentDB a partir del mensaje (document_id y referencia de S3)
+    y del JSON de la extracción
+    """
+    return {
+        '_id': message_body['document_id'],
+        'extracted_info': cv_data['extracted_info'],
+        'raw_text': cv_data['raw_text'],
+        'created_at': cv_data['timestamp'],
+        'updated_at': datetime.utcnow().isoformat(),
+        's3_reference': {
+            'bucket': message_body['s3_bucket'],
+            'key': message_body['s3_key']
+        },
+        'processing_metadata': dict(processing_metadata, processed_at=datetime.utcnow().isoformat())
+    }
+
+def bulk_upsert_documents(collection, pending):
+    """
+    Escribe todos los documentos del lote con un único bulk_write desordenado,
+    haciendo upsert por document_id. pending es una lista de (message_id, document).
+    Devuelve una lista de (message_id, excepción) con los documentos que fallaron.
+    """
+    if not pending:
+        return []
+
+    operations = [
+        ReplaceOne({'_id': document['_id']}, document, upsert=True)
+        for _, document in pending
+    ]
+
+    try:
+        result = collection.bulk_write(operations, ordered=False)
+        log_event('Bulk write completed', {
+            'documents': len(operations),
+            'upserted': result.upserted_count,
+            'modified': result.modified_count
+        })
+        return []
+    except BulkWriteError as e:
+        # Cada writeError trae el índice de la operación: se traduce a su mensaje SQS
+        failures = [
+            (pending[write_error['index']][0],
+             WriteError(write_error.get('errmsg'), write_error.get('code'), write_error))
+            for write_error in e.details.get('writeErrors', [])
+        ]
+        log_event('Bulk write partially failed', {
+            'documents': len(operations),
+            'failed_message_ids': [message_id for message_id, _ in failures]
+        }, error=e)
+        return failures
+    except PyMongoError as e:
+        # Fallo de todo el lote (p. ej. timeout): todos los mensajes quedan fallidos
+        log_event('Bulk write failed', {'documents': len(operations)}, error=e)
+        return [(message_id, e) for message_id, _ in pending]
+
+def fetch_cv_data(message_body):
+    """
+    Devuelve el JSON de la extracción. Si viene en el propio mensaje se archiva
+    en S3 (en la clave indicada) en lugar de descargarlo; si no, se descarga de S3.
+    """
+    if 'cv_data' in message_body:
+        try:
+            s3.put_object(
+                Bucket=message_body['s3_bucket'],
+                Key=message_body['s3_key'],
+                Body=json.dumps(message_body['cv_data'])
+            )
+        except ClientError as e:
+            log_event('Error archiving inline extraction to S3', error=e)
+            raise
+        return message_body['cv_data']
+
+    try:
+        s3_response = s3.get_object(
+            Bucket=message_body['s3_bucket'],
+            Key=message_body['s3_key']
+        )
+        return json.loads(s3_response['Body'].read().decode('utf-8'))
+    except ClientError as e:
+        log_event('Error retrieving from S3', error=e)
+        raise
+
+def fetch_cv_batch(message_bodies, max_workers=S3_FETCH_CONCURRENCY):
+    """
+    Obtiene los datos de todos los mensajes del lote (descarga o archivado en S3)
+    con un pool de hilos acotado.
+    Devuelve una lista en el mismo orden con el cv_data o la excepción de cada mensaje.
+    """
+    def fetch(message_body):
+        try:
+            return fetch_cv_data(message_body)
+        except Exception as e:
+            return e
+
+    if len(message_bodies) <= 1 or max_workers <= 1:
+        return [fetch(message_body) for message_body in message_bodies]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(message_bodies))) as executor:
+        return list(executor.map(fetch, message_bodies))
+
+def is_permanent_error(error):
+    """
+    Clasifica un error de procesamiento: True si reintentar no lo va a arreglar
+    (mensaje inválido, objeto inexistente, documento rechazado) y False si es
+    transitorio (throttling de S3, timeouts de DB, errores de red)
+    """
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in PERMANENT_S3_ERROR_CODES
+    if isinstance(error, OperationFailure):
+        return error.code in PERMANENT_MONGO_ERROR_CODES
+    if isinstance(error, (PyMongoError, BotoCoreError)):
+        return False
+    # validate_message, JSON mal formado y estructura de CV inválida
+    return isinstance(error, (ValueError, KeyError, TypeError))
+
+def send_to_dlq(record, error):
+    """
+    Envía el mensaje original a la DLQ con el motivo del fallo.
+    Devuelve False si no hay DLQ configurada o el envío falla.
+    """
+    if not DLQ_URL:
+        return False
+    try:
+        sqs.send_message(
+            QueueUrl=DLQ_URL,
+            MessageBody=record.get('body', ''),
+            MessageAttributes={
+                'error_type': {'DataType': 'String', 'StringValue': type(error).__name__},
+                'error_message': {'DataType': 'String', 'StringValue': str(error)[:1000] or 'unknown'},
+                'source_message_id': {'DataType': 'String', 'StringValue': record.get('messageId', 'unknown')}
+            }
+        )
+        return True
+    except (ClientError, BotoCoreError) as e:
+        log_event('Error sending message to DLQ', {
+            'record_id': record.get('messageId')
+        }, error=e)
+        return False
+
+def build_batch_response(failures, records_by_id):
+    """
+    Construye la respuesta de ReportBatchItemFailures: los errores transitorios
+    se devuelven a SQS para que reentregue solo esos mensajes; los permanentes
+    van directamente a la DLQ en lugar de gastar reintentos.
+    """
+    batch_item_failures = []
+    for message_id, error in failures:
+        permanent = is_permanent_error(error)
+        log_event('Error processing record', {
+            'record_id': message_id,
+            'permanent': permanent
+        }, error=error)
+
+        if permanent and send_to_dlq(records_by_id.get(message_id, {}), error):
+            continue
+        batch_item_failures.append({'itemIdentifier': message_id})
+
+    return {'batchItemFailures': batch_item_failures}
+
+@traced_handler('store-data')
 def lambda_handler(event, context):
-    s3 = boto3.client('s3')
-    client = None
-    
     try:
+        # Conexión compartida por todos los registros del lote y por invocaciones en caliente
+        collection = get_mongo_client()[DB_NAME][COLLECTION_NAME]
+        pending = []
+        failures = []
+        records_by_id = {record.get('messageId'): record for record in event['Records']}
+
+        messages = []
         for record in event['Records']:
             try:
                 message_body = json.loads(record['body'])
@@ -52,44 +287,33 @@ def lambda_handler(event, context):
                     'document_id': message_body['document_id'],
                     's3_key': message_body['s3_key']
                 })
+                messages.append((record, message_body))
+            except Exception as e:
+                # Se registra el fallo y se continúa con los siguientes mensajes
+                failures.append((record.get('messageId'), e))
 
-                # Obtener datos de S3
-                try:
-                    s3_response = s3.get_object(
-                        Bucket=message_body['s3_bucket'],
-                        Key=message_body['s3_key']
-                    )
-                    cv_data = json.loads(s3_response['Body'].read().decode('utf-8'))
-                except ClientError as e:
-                    log_event('Error retrieving from S3', error=e)
-                    raise
+        # Obtener (o archivar) los datos de S3 de todo el lote en paralelo
+        with span('s3_fetch', messages=len(messages)):
+            cv_batch = fetch_cv_batch([message_body for _, message_body in messages])
+
+        for (record, message_body), cv_data in zip(messages, cv_batch):
+            try:
+                if isinstance(cv_data, Exception):
+                    raise cv_data
 
                 # Validar datos de CV
                 if 'extracted_info' not in cv_data or 'raw_text' not in cv_data:
                     raise ValueError("Invalid CV data structure")
 
-                # Conectar a DocumentDB
-                client = get_mongo_client()
-                db = client[DB_NAME]
-                collection = db[COLLECTION_NAME]
-
                 # Preparar documento
-                document = {
-                    '_id': message_body['document_id'],
-                    'extracted_info': cv_data['extracted_info'],
-                    'raw_text': cv_data['raw_text'],
-                    'created_at': cv_data['timestamp'],
-                    'updated_at': datetime.utcnow().isoformat(),
-                    's3_reference': {
-                        'bucket': message_body['s3_bucket'],
-                        'key': message_body['s3_key']
-                    },
-                    'processing_metadata': {
-                        'processed_at': datetime.utcnow().isoformat(),
-                        'sqs_message_id': record.get('messageId'),
-                        'aws_request_id': context.aws_request_id
-                    }
-                }
+                document = build_document(message_body, cv_data, {
+                    'sqs_message_id': record.get('messageId'),
+                    'aws_request_id': context.aws_request_id
+                })
+
+                if BULK_WRITE_ENABLED:
+                    pending.append((record.get('messageId'), document))
+                    continue
 
                 # Insertar en DocumentDB
                 try:
@@ -102,25 +326,16 @@ def lambda_handler(event, context):
                     raise
 
             except Exception as e:
-                log_event('Error processing record', {
-                    'record_id': record.get('messageId')
-                }, error=e)
-                # No reintentamos el mensaje individual, pero continuamos con los siguientes
+                # Se registra el fallo y se continúa con los siguientes mensajes
+                failures.append((record.get('messageId'), e))
                 continue
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps('Successfully processed all messages')
-        }
+        # Insertar en DocumentDB todos los documentos válidos del lote de una vez
+        with span('bulk_write', documents=len(pending)):
+            failures.extend(bulk_upsert_documents(collection, pending))
+
+        return build_batch_response(failures, records_by_id)
 
     except Exception as e:
         log_event('Fatal error in handler', error=e)
         raise
-
-    finally:
-        # Cerrar conexión MongoDB si está abierta
-        if client:
-            try:
-                client.close()
-            except Exception as e:
-                log_event('Error closing MongoDB connection', error=e)
\ No newline at end of file
@@ -0,0 +1,203 @@
+import os
+import sys
+import json
+import time
+import functools
+import threading
+import contextvars
+
+# Espacio de nombres de las métricas en CloudWatch
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'CVProcessing')
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', 'true').lower() == 'true'
+
+# Atributos de un span que se publican como métrica (el resto solo va en el registro)
+METRIC_UNITS = {
+    'bytes_in': 'Bytes',
+    'bytes_out': 'Bytes',
+    'input_tokens': 'Count',
+    'output_tokens': 'Count',
+}
+# Duraciones en microsegundos enteros: serializar floats en JSON cuesta varias veces más
+DURATION_UNIT = 'Microseconds'
+# Límite de EMF de valores por métrica en un mismo registro
+EMF_MAX_VALUES = 100
+
+_current_trace = contextvars.ContextVar('trace', default=None)
+# Directivas _aws ya serializadas, por combinación de métricas
+_directives = {}
+# (span, atributo) -> (clave en el registro, unidad o None): se calcula una vez por etapa
+_keys = {}
+# El registro es un dict plano recién construido: no puede tener ciclos y se omite la comprobación
+_record_encoder = json.JSONEncoder(default=str, check_circular=False)
+
+class Span:
+    """
+    Una etapa dentro de la traza de una invocación: tiempo de pared y atributos
+    (bytes de entrada/salida, tokens...). Se usa como context manager.
+    """
+
+    __slots__ = ('name', 'attributes', 'start', 'duration', '_trace')
+
+    def __init__(self, name, trace, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.start = 0.0
+        self.duration = 0.0
+        self._trace = trace
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self.start
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self._trace.add(self)
+        return False
+
+class _NoopSpan:
+    """Span que no registra nada: fuera de una traza o con la traza desactivada"""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+NOOP_SPAN = _NoopSpan()
+
+class Trace:
+    """
+    Spans de una invocación de un handler. Al terminar se escribe un único
+    registro en CloudWatch Embedded Metric Format con una métrica por etapa.
+    """
+
+    def __init__(self, name, request_id=None):
+        self.name = name
+        self.request_id = request_id
+        self.properties = {}
+        self.spans = []
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def emf_line(self, duration):
+        """
+        Registro EMF serializado. Cada etapa aporta `<span>.duration` y sus atributos
+        `<span>.<atributo>`: los de METRIC_UNITS se declaran como métricas y el resto
+        queda como propiedad consultable en Logs Insights. Si una etapa se repite
+        (p. ej. varias llamadas a Bedrock) el valor es la lista de todas.
+        """
+        record = {'Function': self.name, 'request_id': self.request_id, 'handler.duration': int(duration * 1e6)}
+        record.update(self.properties)
+        units = [('handler.duration', DURATION_UNIT)]
+        repeated = set()
+        for span in self.spans:
+            for attribute, value in (('duration', int(span.duration * 1e6)), *span.attributes.items()):
+                entry = _keys.get((span.name, attribute))
+                if entry is None:
+                    unit = DURATION_UNIT if attribute == 'duration' else METRIC_UNITS.get(attribute)
+                    entry = _keys[span.name, attribute] = (span.name + '.' + attribute, unit)
+                key, unit = entry
+                if key not in record:
+                    record[key] = value
+                    if unit:
+                        units.append(entry)
+                elif key in repeated:
+                    record[key].append(value)
+                else:
+                    record[key] = [record[key], value]
+                    repeated.add(key)
+        for key in repeated:
+            del record[key][EMF_MAX_VALUES:]
+
+        # La directiva solo depende de las métricas presentes: se serializa una vez por combinación
+        metric_units = tuple(units)
+        directive = _directives.get(metric_units)
+        if directive is None:
+            directive = json.dumps([{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [['Function']],
+                'Metrics': [{'Name': name, 'Unit': unit} for name, unit in metric_units]
+            }])
+            _directives[metric_units] = directive
+        return '{"_aws": {"Timestamp": %d, "CloudWatchMetrics": %s}, %s' % (
+            time.time() * 1000, directive, _record_encoder.encode(record)[1:])
+
+    def emit(self):
+        # Directamente a stdout: EMF necesita la línea JSON sin el prefijo del handler de logging
+        sys.stdout.write(self.emf_line(time.perf_counter() - self.start) + '\n')
+        sys.stdout.flush()
+
+def span(name, **attributes):
+    """
+    Mide una etapa de la invocación en curso:
+        with span('textract', bytes_in=len(document)) as current:
+            ...
+            current.set(bytes_out=...)
+    Fuera de una traza no registra nada.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return NOOP_SPAN
+    return Span(name, trace, attributes)
+
+def traced(name):
+    """Decorador: cada llamada a la función es un span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def annotate(**properties):
+    """Añade propiedades (no métricas) al registro de la traza en curso"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.properties.update(properties)
+
+def propagate(function):
+    """
+    Envuelve function para que, ejecutada en otro hilo (p. ej. un ThreadPoolExecutor),
+    sus spans se añadan a la traza actual
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        return context.run(function, *args, **kwargs)
+    return wrapper
+
+def traced_handler(name):
+    """
+    Decorador para el handler de una Lambda: abre la traza de la invocación
+    y escribe el registro EMF al terminar, también si el handler lanza excepción
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(event, context):
+            if not TRACING_ENABLED:
+                return function(event, context)
+            trace = Trace(name, getattr(context, 'aws_request_id', None))
+            token = _current_trace.set(trace)
+            try:
+                return function(event, context)
+            finally:
+                _current_trace.reset(token)
+                trace.emit()
+        return wrapper
+    return decorator
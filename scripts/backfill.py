@@ -0,0 +1,404 @@
+"""
+Reprocesado masivo de CVs históricos.
+
+Fuentes: extracciones ya guardadas (s3://bucket/cv_extractions/AAAA/MM/DD/),
+documentos en S3 (s3://bucket/cv_uploads/) o directorios/ficheros locales de
+PDFs e imágenes (PNG, JPEG, TIFF).
+
+Modos:
+    reextract  vuelve a extraer los campos: reutiliza el OCR guardado (o el
+               raw_text de la extracción), aplica la pre-extracción local y envía
+               a Bedrock en modo masivo solo lo que falte. Guarda el JSON en S3.
+    reindex    vuelve a escribir en DocumentDB las extracciones guardadas, sin modelo.
+
+En ambos modos los documentos se escriben en DocumentDB con el bulk writer de
+storeData. El trabajo se reparte por lotes en un pool de procesos, con límite de
+peticiones por segundo para cada servicio, y el progreso se guarda en un fichero
+de checkpoint para poder reanudar.
+
+Uso:
+    python scripts/backfill.py s3://cv-preprocess-landing/cv_extractions/2025/03/ --mode reindex
+    python scripts/backfill.py ./cvs/ --workers 8 --bedrock-rate 4 --textract-rate 5
+"""
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import argparse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda'))
+
+import app
+from extraction_cache import document_hash
+from prompt_builder import build_prompt_text
+from rate_limiter import AdaptiveRateLimiter, RateLimitedClient, get_limiter
+
+MODE_REEXTRACT = 'reextract'
+MODE_REINDEX = 'reindex'
+
+STATUS_OK = 'ok'
+STATUS_CACHED = 'cached'
+STATUS_FAILED = 'failed'
+
+# Ficheros que se recogen al recorrer un directorio local
+SOURCE_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.tif', '.tiff')
+# Bajo cv_extractions/ también están el caché (cache/) y los resultados de trabajos
+# (jobs/): de ese prefijo solo son extracciones las claves con fecha
+EXTRACTIONS_PREFIX = 'cv_extractions/'
+EXTRACTION_KEY_PATTERN = re.compile(r'cv_extractions/\d{4}/\d{2}/\d{2}/[^/]+\.json$')
+
+
+def init_worker(rates, workers):
+    """
+    Inicializa cada proceso del pool: reparte el límite de cada servicio entre
+    los procesos. Textract y Bedrock usan los limitadores adaptativos de app.py
+    (Bedrock, uno por región de las rutas de modelo); S3 se envuelve con uno propio.
+    """
+    if rates.get('textract', 0) > 0:
+        get_limiter('textract').configure(rates['textract'] / workers)
+    if rates.get('bedrock', 0) > 0:
+        for region in {route.region for route in app.model_router.routes}:
+            app.bedrock_limiter(region).configure(rates['bedrock'] / workers)
+    if rates.get('s3', 0) > 0:
+        app.s3 = RateLimitedClient(app.s3, AdaptiveRateLimiter('s3', rates['s3'] / workers))
+        app.extraction_cache.s3 = app.s3
+        app.ocr_store.s3 = app.s3
+
+
+def list_sources(source):
+    """Nombres de los documentos de una ruta local o un prefijo s3://"""
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        paginator = app.s3.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get('Contents', []):
+                key = item['Key']
+                if key.endswith('/'):
+                    continue
+                if key.startswith(EXTRACTIONS_PREFIX) and not EXTRACTION_KEY_PATTERN.match(key):
+                    continue
+                yield f"s3://{bucket}/{key}"
+        return
+
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(SOURCE_EXTENSIONS):
+                    yield os.path.join(root, name)
+        return
+
+    yield source
+
+
+def read_source(name):
+    """Bytes del documento (PDF, imagen o JSON de extracción)"""
+    if name.startswith('s3://'):
+        bucket, _, key = name[len('s3://'):].partition('/')
+        return app.s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    with open(name, 'rb') as f:
+        return f.read()
+
+
+def load_extraction_record(name):
+    """Extracción guardada en cv_extractions: (document_id, contenido JSON)"""
+    record = json.loads(read_source(name).decode('utf-8'))
+    document_id = os.path.splitext(os.path.basename(name))[0]
+    return document_id, record
+
+
+def prepare_source(name, refresh):
+    """
+    OCR (reutilizando el guardado) y pre-extracción de un documento.
+    Devuelve un dict con lo necesario para completar la extracción, o None si ya
+    está en el caché de extracciones.
+    """
+    if name.endswith('.json'):
+        # Extracción previa: OCR guardado por hash o, si no existe, su raw_text.
+        # Se sobrescribe en su sitio, con el mismo document_id y clave de S3.
+        document_id, record = load_extraction_record(name)
+        # Sin document_hash (extracciones antiguas) no hay hash del documento original
+        doc_hash = record.get('document_hash')
+        stored = app.ocr_store.get(doc_hash) if app.OCR_STORE_ENABLED and doc_hash else None
+        if stored:
+            textract_response, extraction_path = stored
+        else:
+            textract_response = app.text_layer_to_blocks(record['raw_text'])
+            extraction_path = record.get('extraction_path', app.EXTRACTION_PATH_TEXT_LAYER)
+        target = {'document_id': document_id}
+        if name.startswith('s3://'):
+            target['s3_bucket'], _, target['s3_key'] = name[len('s3://'):].partition('/')
+    else:
+        document = read_source(name)
+        doc_hash = document_hash(document)
+        target = {}
+        if not refresh and app.EXTRACTION_CACHE_ENABLED and app.extraction_cache.get(doc_hash):
+            return None
+        # Sin límite de tiempo de API Gateway: lo que no cabe en Textract síncrono va por S3
+        textract_response, extraction_path = app.extract_text(document, doc_hash, app.detect_document_format(document),
+                                                              allow_async=True)
+
+    confident, missing_fields = app.pre_extract_fields(textract_response)
+    return {
+        'doc_hash': doc_hash,
+        'target': target,
+        'formatted_text': app.clean_and_format_text(textract_response),
+        'prompt_text': build_prompt_text(textract_response, app.PROMPT_TOKEN_BUDGET, app.PROMPT_HEADER_REGION),
+        'extraction_path': extraction_path,
+        'confident': confident,
+        'missing_fields': missing_fields
+    }
+
+
+def write_extraction(extracted_info, item):
+    """
+    Guarda la extracción en S3 y en el caché; devuelve (mensaje, cv_data) para storeData.
+    Una extracción previa conserva su document_id (y su clave si venía de S3), así
+    que DocumentDB la reemplaza en vez de duplicarla.
+    """
+    target = item['target']
+    if 'document_id' in target:
+        document_id = target['document_id']
+        s3_content = app.build_extraction_content(
+            extracted_info, item['formatted_text'], item['extraction_path'], item['doc_hash']
+        )
+        s3_key = target.get('s3_key') or f"cv_extractions/{datetime.utcnow().strftime('%Y/%m/%d')}/{document_id}.json"
+    else:
+        document_id, s3_key, s3_content = app.build_extraction_record(
+            extracted_info, item['formatted_text'], item['extraction_path'], item['doc_hash']
+        )
+    s3_bucket = target.get('s3_bucket', app.S3_BUCKET)
+    app.s3.put_object(Bucket=s3_bucket, Key=s3_key, Body=json.dumps(s3_content))
+    # El caché va por hash del documento original; sin él no hay clave válida
+    if app.EXTRACTION_CACHE_ENABLED and item['doc_hash']:
+        app.extraction_cache.put(item['doc_hash'], {
+            'extracted_info': extracted_info,
+            'document_id': document_id,
+            'raw_text': item['formatted_text'][:500]
+        })
+    message = {'document_id': document_id, 's3_bucket': s3_bucket, 's3_key': s3_key}
+    return message, s3_content
+
+
+def reextract_chunk(names, refresh):
+    """Vuelve a extraer un lote de documentos con una extracción masiva en Bedrock"""
+    results = []
+    prepared = []
+    for name in names:
+        try:
+            item = prepare_source(name, refresh)
+        except Exception as e:
+            results.append({'source': name, 'status': STATUS_FAILED, 'stage': 'ocr', 'error': str(e)})
+            continue
+        if item is None:
+            results.append({'source': name, 'status': STATUS_CACHED})
+            continue
+        prepared.append((name, item))
+
+    needs_model = [
+        (str(index), item['prompt_text'])
+        for index, (_, item) in enumerate(prepared) if item['missing_fields']
+    ]
+    extracted, failed_ids = app.call_bedrock_bulk(needs_model) if needs_model else ({}, [])
+    failed_ids = set(failed_ids)
+
+    for index, (name, item) in enumerate(prepared):
+        if str(index) in failed_ids:
+            results.append({'source': name, 'status': STATUS_FAILED, 'stage': 'bedrock',
+                            'error': 'No valid extraction in bulk response'})
+            continue
+        extracted_info = dict(extracted.get(str(index), {}), **item['confident'])
+        extracted_info = app.validate_extracted_info(extracted_info)
+        try:
+            message, cv_data = write_extraction(extracted_info, item)
+        except Exception as e:
+            results.append({'source': name, 'status': STATUS_FAILED, 'stage': 's3', 'error': str(e)})
+            continue
+        results.append({'source': name, 'status': STATUS_OK, 'message': message, 'cv_data': cv_data})
+    return results
+
+
+def reindex_chunk(names):
+    """Lee las extracciones guardadas para volver a escribirlas en DocumentDB"""
+    results = []
+    for name in names:
+        try:
+            if not name.startswith('s3://') or not name.endswith('.json'):
+                raise ValueError('reindex only accepts s3:// extraction JSON objects')
+            document_id, cv_data = load_extraction_record(name)
+            if 'extracted_info' not in cv_data or 'raw_text' not in cv_data:
+                raise ValueError('Invalid CV data structure')
+            bucket, _, key = name[len('s3://'):].partition('/')
+            message = {'document_id': document_id, 's3_bucket': bucket, 's3_key': key}
+        except Exception as e:
+            results.append({'source': name, 'status': STATUS_FAILED, 'stage': 's3', 'error': str(e)})
+            continue
+        results.append({'source': name, 'status': STATUS_OK, 'message': message, 'cv_data': cv_data})
+    return results
+
+
+def process_chunk(names, mode, refresh):
+    """Unidad de trabajo de cada proceso del pool"""
+    if mode == MODE_REINDEX:
+        return reindex_chunk(names)
+    return reextract_chunk(names, refresh)
+
+
+def load_checkpoint(path):
+    """Documentos ya terminados en ejecuciones anteriores"""
+    done = set()
+    if not path or not os.path.exists(path):
+        return done
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if entry.get('status') in (STATUS_OK, STATUS_CACHED):
+                done.add(entry['source'])
+    return done
+
+
+class Progress:
+    """Contadores del backfill con informe periódico de documentos/s y errores por etapa"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.counts = {STATUS_OK: 0, STATUS_CACHED: 0, STATUS_FAILED: 0, 'skipped': 0}
+        self.errors = {}
+
+    def add(self, result):
+        self.counts[result['status']] += 1
+        if result['status'] == STATUS_FAILED:
+            self.errors[result['stage']] = self.errors.get(result['stage'], 0) + 1
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        done = self.counts[STATUS_OK] + self.counts[STATUS_CACHED] + self.counts[STATUS_FAILED]
+        errors = ' '.join(f"{stage}={count}" for stage, count in sorted(self.errors.items())) or '-'
+        print(f"[{elapsed:7.1f}s] done {done}  ok {self.counts[STATUS_OK]}  "
+              f"cached {self.counts[STATUS_CACHED]}  failed {self.counts[STATUS_FAILED]}  "
+              f"skipped {self.counts['skipped']}  {done / elapsed:.2f} docs/s  errors {errors}",
+              file=sys.stderr, flush=True)
+
+
+def chunked(names, size):
+    chunk = []
+    for name in names:
+        chunk.append(name)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('sources', nargs='+', help='Ficheros o directorios locales, o prefijos s3://bucket/prefijo')
+    parser.add_argument('--mode', choices=[MODE_REEXTRACT, MODE_REINDEX], default=MODE_REEXTRACT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help='Procesos del pool')
+    parser.add_argument('--chunk', type=int, default=app.BULK_MAX_DOCUMENTS,
+                        help='Documentos por unidad de trabajo (y por extracción masiva)')
+    parser.add_argument('--textract-rate', type=float, default=5.0,
+                        help='Techo de llamadas/s a Textract (0 = el del entorno, TEXTRACT_MAX_TPS)')
+    parser.add_argument('--bedrock-rate', type=float, default=2.0,
+                        help='Techo de llamadas/s a Bedrock (0 = el del entorno, BEDROCK_MAX_TPS)')
+    parser.add_argument('--s3-rate', type=float, default=100.0, help='Peticiones/s a S3 (0 = sin límite)')
+    parser.add_argument('--mongo-rate', type=float, default=5.0, help='bulk_write/s a DocumentDB (0 = sin límite)')
+    parser.add_argument('--checkpoint', default='backfill.checkpoint.jsonl',
+                        help='Fichero de checkpoint para reanudar (vacío para desactivar)')
+    parser.add_argument('--no-db', action='store_true', help='No escribir en DocumentDB')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Reprocesar también los documentos que ya están en el caché de extracciones')
+    parser.add_argument('--progress-interval', type=float, default=5.0)
+    args = parser.parse_args()
+
+    done = load_checkpoint(args.checkpoint)
+    progress = Progress(args.progress_interval)
+
+    collection = None
+    if not args.no_db:
+        import storeData
+        collection = storeData.get_mongo_client()[storeData.DB_NAME][storeData.COLLECTION_NAME]
+    mongo_limiter = AdaptiveRateLimiter('documentdb', args.mongo_rate) if args.mongo_rate > 0 else None
+    run_id = str(uuid.uuid4())
+
+    def pending_names():
+        for source in args.sources:
+            for name in list_sources(source):
+                if name in done:
+                    progress.counts['skipped'] += 1
+                    continue
+                yield name
+
+    rates = {'textract': args.textract_rate, 'bedrock': args.bedrock_rate, 's3': args.s3_rate}
+    checkpoint = open(args.checkpoint, 'a') if args.checkpoint else None
+
+    def finish(results):
+        # Las extracciones correctas del lote van a DocumentDB con un único bulk_write
+        written = [result for result in results if result['status'] == STATUS_OK]
+        if collection is not None and written:
+            import storeData
+            pending = [
+                (result['source'], storeData.build_document(result['message'], result['cv_data'], {
+                    'backfill_run_id': run_id,
+                    'backfill_mode': args.mode
+                }))
+                for result in written
+            ]
+            if mongo_limiter:
+                mongo_limiter.acquire()
+            failures = dict(storeData.bulk_upsert_documents(collection, pending))
+            for result in written:
+                if result['source'] in failures:
+                    result.update(status=STATUS_FAILED, stage='documentdb', error=str(failures[result['source']]))
+
+        for result in results:
+            progress.add(result)
+            if checkpoint:
+                entry = {'source': result['source'], 'status': result['status']}
+                if result['status'] == STATUS_OK:
+                    entry['document_id'] = result['message']['document_id']
+                elif result['status'] == STATUS_FAILED:
+                    entry.update(stage=result['stage'], error=result['error'])
+                checkpoint.write(json.dumps(entry) + '\n')
+        if checkpoint:
+            checkpoint.flush()
+        progress.report()
+
+    # spawn: cada proceso crea sus propios clientes de boto3 (no se heredan sockets)
+    context = multiprocessing.get_context('spawn')
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers, mp_context=context,
+                                 initializer=init_worker, initargs=(rates, args.workers)) as executor:
+            in_flight = set()
+            for chunk in chunked(pending_names(), args.chunk):
+                in_flight.add(executor.submit(process_chunk, chunk, args.mode, args.refresh))
+                if len(in_flight) >= args.workers * 2:
+                    completed, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in completed:
+                        finish(future.result())
+            for future in in_flight:
+                finish(future.result())
+    finally:
+        if checkpoint:
+            checkpoint.close()
+
+    progress.report(force=True)
+    sys.exit(1 if progress.counts[STATUS_FAILED] else 0)
+
+
+if __name__ == '__main__':
+    main()
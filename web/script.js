@@ -2,6 +2,16 @@
 
 // Configuración
 const API_ENDPOINT = 'https://zr0u3ubrzl.execute-api.us-west-2.amazonaws.com/prod/process-cv'; // Reemplazar con tu URL de API Gateway
+const UPLOAD_URL_ENDPOINT = API_ENDPOINT.replace(/process-cv$/, 'upload-url');
+
+// Sondeo de trabajos asíncronos: espera inicial, factor de backoff, espera máxima y tiempo total
+const POLL_INITIAL_DELAY_MS = 1000;
+const POLL_BACKOFF_FACTOR = 1.5;
+const POLL_MAX_DELAY_MS = 8000;
+const POLL_TIMEOUT_MS = 5 * 60 * 1000;
+
+// Formatos aceptados: el backend manda las imágenes tal cual a Textract
+const ALLOWED_FILE_TYPES = ['application/pdf', 'image/png', 'image/jpeg', 'image/tiff'];
 
 // Elementos del DOM
 const elements = {
@@ -46,11 +56,11 @@ function handleDrop(event) {
     dropZone.classList.remove('dragover');
     
     const file = event.dataTransfer.files[0];
-    if (file && file.type === 'application/pdf') {
+    if (file && ALLOWED_FILE_TYPES.includes(file.type)) {
         elements.pdfInput.files = event.dataTransfer.files;
         updateFileSelection(file);
     } else {
-        showError('Please upload a PDF file');
+        showError('Please upload a PDF, PNG, JPEG or TIFF file');
     }
 }
 
@@ -63,8 +73,8 @@ function updateFileSelection(file) {
         return;
     }
 
-    if (file.type !== 'application/pdf') {
-        showError('Please select a valid PDF file');
+    if (!ALLOWED_FILE_TYPES.includes(file.type)) {
+        showError('Please select a valid PDF, PNG, JPEG or TIFF file');
         resetForm();
         return;
     }
@@ -82,26 +92,25 @@ function updateFileSelection(file) {
 
 async function processPDF() {
     if (!selectedFile) {
-        showError('Please select a PDF file first');
+        showError('Please select a file first');
         return;
     }
 
     try {
         showLoading(true);
         
-        // Convertir PDF a base64
-        const base64Data = await convertToBase64(selectedFile);
-        // Extraer solo la parte de datos base64 (eliminar el prefijo data:application/pdf;base64,)
-        const base64Clean = base64Data.split(',')[1];
+        // Subir el fichero directamente a S3 con una URL prefirmada (sin base64)
+        const s3Key = await uploadToS3(selectedFile);
         
-        // Llamar a la API
+        // Llamar a la API en modo asíncrono: devuelve un job_id al instante
         const response = await fetch(API_ENDPOINT, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                file: base64Clean // Cambiar base64_pdf por file
+                s3_key: s3Key,
+                async: true
             })
         });
 
@@ -110,7 +119,8 @@ async function processPDF() {
             throw new Error(`Error: ${errorData.message || response.statusText}`);
         }
 
-        const data = await response.json();
+        const job = await response.json();
+        const data = await pollJobResult(job.job_id);
         
         // Verificar que data.personalInfo existe
         if (!data.personalInfo) {
@@ -129,6 +139,39 @@ async function processPDF() {
     }
 }
 
+async function pollJobResult(jobId) {
+    // Consultar GET /process-cv/{id} con backoff exponencial hasta que el worker termine
+    const deadline = Date.now() + POLL_TIMEOUT_MS;
+    let delay = POLL_INITIAL_DELAY_MS;
+
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, delay));
+
+        const response = await fetch(`${API_ENDPOINT}/${encodeURIComponent(jobId)}`);
+        if (response.status === 200) {
+            const result = await response.json();
+            if (result.status === 'failed') {
+                throw new Error(result.error || result.message || 'Processing failed');
+            }
+            return result;
+        }
+        if (response.status !== 202) {
+            const errorData = await response.json().catch(() => ({}));
+            throw new Error(`Error: ${errorData.message || response.statusText}`);
+        }
+
+        // Mientras el modelo responde, rellenar los campos que ya han llegado
+        const progress = await response.json().catch(() => ({}));
+        if (progress.personalInfo) {
+            updateForm(progress.personalInfo);
+        }
+
+        delay = Math.min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY_MS);
+    }
+
+    throw new Error('Timed out waiting for the CV to be processed');
+}
+
 function updateForm(personalInfo) {
     // Mapear los campos del formulario con la información extraída
     const fieldMappings = {
@@ -151,13 +194,38 @@ function updateForm(personalInfo) {
     });
 }
 
-function convertToBase64(file) {
-    return new Promise((resolve, reject) => {
-        const reader = new FileReader();
-        reader.onload = () => resolve(reader.result);
-        reader.onerror = error => reject(error);
-        reader.readAsDataURL(file);
+async function uploadToS3(file) {
+    // Pedir la URL prefirmada y subir los bytes del fichero tal cual
+    const response = await fetch(UPLOAD_URL_ENDPOINT, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            content_type: file.type
+        })
     });
+
+    if (!response.ok) {
+        const errorData = await response.json().catch(() => ({}));
+        throw new Error(`Error: ${errorData.message || response.statusText}`);
+    }
+
+    const { upload_url: uploadUrl, s3_key: s3Key } = await response.json();
+
+    const upload = await fetch(uploadUrl, {
+        method: 'PUT',
+        headers: {
+            'Content-Type': file.type,
+        },
+        body: file
+    });
+
+    if (!upload.ok) {
+        throw new Error(`Upload failed: ${upload.statusText}`);
+    }
+
+    return s3Key;
 }
 
 function showLoading(show) {